@@ -0,0 +1,279 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from utils.array_store import (
+    MANIFEST_FILE,
+    directory_size,
+    load_array,
+    load_manifest,
+    save_arrays,
+)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes SQL text so that formatting differences map to the same cache key.
+
+    Runs of whitespace are collapsed and trailing semicolons are removed.
+
+    :param query: The SQL query.
+    :return: The normalized query text.
+    """
+    return re.sub(r"\s+", " ", query).strip().rstrip(";").strip()
+
+
+def frame_to_arrays(df: pd.DataFrame) -> Tuple[Dict[str, np.ndarray], List[dict]]:
+    """
+    Splits a DataFrame into flat per-column arrays plus column metadata.
+
+    Numeric, boolean and datetime columns become plain NumPy arrays that can be
+    memory-mapped. Categorical columns are stored as codes plus categories and
+    pandas nullable columns as values plus a missing-value mask.
+
+    :param df: The DataFrame to encode.
+    :return: A tuple of the arrays keyed by file stem and the column metadata
+        needed by `arrays_to_frame`.
+    """
+    arrays = {}
+    columns = []
+
+    for i, name in enumerate(df.columns):
+        col = df.iloc[:, i]
+        stem = "c{}".format(i)
+        if isinstance(name, np.generic):
+            name = name.item()
+        meta = {"name": name, "file": stem, "dtype": str(col.dtype)}
+
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            meta["kind"] = "category"
+            meta["ordered"] = bool(col.cat.ordered)
+            arrays[stem] = col.cat.codes.to_numpy()
+            arrays[stem + "_categories"] = col.cat.categories.to_numpy()
+        elif isinstance(col.dtype, pd.DatetimeTZDtype):
+            meta["kind"] = "datetimetz"
+            meta["tz"] = str(col.dt.tz)
+            arrays[stem] = col.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy()
+        elif isinstance(col.dtype, pd.api.extensions.ExtensionDtype) and hasattr(
+            col.dtype, "numpy_dtype"
+        ):
+            meta["kind"] = "masked"
+            mask = col.isna().to_numpy()
+            numpy_dtype = col.dtype.numpy_dtype
+            arrays[stem] = col.to_numpy(dtype=numpy_dtype, na_value=numpy_dtype.type(0))
+            arrays[stem + "_mask"] = mask
+        elif col.dtype == object or isinstance(
+            col.dtype, pd.api.extensions.ExtensionDtype
+        ):
+            meta["kind"] = "object"
+            arrays[stem] = col.to_numpy(dtype=object)
+        else:
+            meta["kind"] = "numpy"
+            arrays[stem] = col.to_numpy()
+
+        columns.append(meta)
+
+    return arrays, columns
+
+
+def arrays_to_frame(
+    directory: Union[str, Path], columns: List[dict], mmap: bool = True
+) -> pd.DataFrame:
+    """
+    Rebuilds a DataFrame from a directory written with `frame_to_arrays` output.
+
+    Plain NumPy columns are memory-mapped and wrapped without copying.
+
+    :param directory: Directory containing the per-column `.npy` files.
+    :param columns: Column metadata returned by `frame_to_arrays`.
+    :param mmap: Whether to memory-map the column files. Default is True.
+    :return: The rebuilt DataFrame.
+    """
+    data = {}
+
+    for meta in columns:
+        values = load_array(directory, meta["file"], mmap=mmap)
+        kind = meta["kind"]
+
+        if kind == "category":
+            categories = load_array(directory, meta["file"] + "_categories", mmap=False)
+            data[meta["name"]] = pd.Categorical.from_codes(
+                np.asarray(values), categories=categories, ordered=meta["ordered"]
+            )
+        elif kind == "datetimetz":
+            data[meta["name"]] = (
+                pd.DatetimeIndex(values).tz_localize("UTC").tz_convert(meta["tz"])
+            )
+        elif kind == "masked":
+            mask = load_array(directory, meta["file"] + "_mask", mmap=False)
+            array = pd.array(np.asarray(values), dtype=meta["dtype"])
+            array[mask] = pd.NA
+            data[meta["name"]] = array
+        else:
+            # A plain ndarray view keeps sharing the mapped pages
+            data[meta["name"]] = np.asarray(values)
+
+    return pd.DataFrame(data, columns=[meta["name"] for meta in columns], copy=False)
+
+
+class QueryCache:
+    """
+    An on-disk, content-addressed cache of query results.
+
+    Each result is stored as a directory of per-column `.npy` files keyed by a
+    hash of the normalized query text, the schema and a user-supplied data
+    version. Cached results are memory-mapped on read and the least recently
+    used entries are evicted once the cache exceeds `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path],
+        data_version: str = "",
+        schema: Optional[str] = None,
+        max_bytes: int = 2 * 1024**3,
+    ):
+        """
+        :param cache_dir: Directory holding the cache entries. Created if missing.
+        :param data_version: Label of the underlying data, e.g. the MIMIC release
+            and concept build. Changing it invalidates all keys. Default is ''.
+        :param schema: Schema the queries run against, part of the key.
+            Default is None.
+        :param max_bytes: Size limit of the cache in bytes. Default is 2 GiB.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.data_version = data_version
+        self.schema = schema
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, query: str, variant: str = "") -> str:
+        """
+        Computes the cache key of a query.
+
+        :param query: The SQL query.
+        :param variant: Label of a post-processed form of the result, e.g.
+            'compact' for compacted dtypes. Default is '' (the raw result).
+        :return: A hex SHA-256 digest.
+        """
+        payload = "\x1f".join(
+            [normalize_query(query), self.schema or "", self.data_version, variant]
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, query: str, variant: str = "") -> Path:
+        return self.cache_dir / self.key(query, variant)
+
+    def get(self, query: str, variant: str = "") -> Optional[pd.DataFrame]:
+        """
+        Returns the cached result of a query, or None on a cache miss.
+
+        :param query: The SQL query.
+        :param variant: Label of the stored form of the result. Default is ''.
+        :return: The memory-mapped result as a DataFrame, or None.
+        """
+        entry = self._entry_dir(query, variant)
+        try:
+            manifest = load_manifest(entry)
+            df = arrays_to_frame(entry, manifest["columns"])
+        except (FileNotFoundError, KeyError, ValueError):
+            return None
+
+        # Mark the entry as recently used for LRU eviction
+        os.utime(entry / MANIFEST_FILE)
+        return df
+
+    def put(self, query: str, df: pd.DataFrame, variant: str = "") -> Path:
+        """
+        Stores the result of a query and evicts old entries if needed.
+
+        :param query: The SQL query.
+        :param df: The query result.
+        :param variant: Label of the stored form of the result. Default is ''.
+        :return: The path of the cache entry.
+        """
+        arrays, columns = frame_to_arrays(df)
+        manifest = {
+            "key": self.key(query, variant),
+            "query": normalize_query(query),
+            "schema": self.schema,
+            "data_version": self.data_version,
+            "variant": variant,
+            "n_rows": len(df),
+            "created": time.time(),
+            "columns": columns,
+        }
+        entry = save_arrays(self._entry_dir(query, variant), arrays, manifest)
+        self.evict()
+        return entry
+
+    def invalidate(self, query: str) -> bool:
+        """
+        Removes every cached form of a query's result.
+
+        :param query: The SQL query.
+        :return: True if an entry was removed.
+        """
+        normalized = normalize_query(query)
+        removed = False
+        for entry in self._entries():
+            manifest = load_manifest(entry)
+            if (
+                manifest.get("query") == normalized
+                and manifest.get("schema") == self.schema
+                and manifest.get("data_version") == self.data_version
+            ):
+                shutil.rmtree(entry, ignore_errors=True)
+                removed = True
+        return removed
+
+    def clear(self) -> None:
+        """Removes every cache entry."""
+        for entry in self._entries():
+            shutil.rmtree(entry, ignore_errors=True)
+
+    def _entries(self) -> List[Path]:
+        return [
+            path
+            for path in self.cache_dir.iterdir()
+            if path.is_dir() and (path / MANIFEST_FILE).exists()
+        ]
+
+    def size(self) -> int:
+        """
+        Returns the total size of the cache in bytes.
+
+        :return: Size in bytes.
+        """
+        return sum(directory_size(entry) for entry in self._entries())
+
+    def evict(self) -> List[Path]:
+        """
+        Removes least recently used entries until the cache fits `max_bytes`.
+
+        :return: The removed entry directories.
+        """
+        with self._lock:
+            entries = [
+                (entry, (entry / MANIFEST_FILE).stat().st_mtime, directory_size(entry))
+                for entry in self._entries()
+            ]
+            total = sum(size for _, _, size in entries)
+
+            removed = []
+            for entry, _, size in sorted(entries, key=lambda item: item[1]):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+                removed.append(entry)
+
+        return removed
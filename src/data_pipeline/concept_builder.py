@@ -0,0 +1,452 @@
+import argparse
+import hashlib
+import json
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Set, Union
+from utils.db_connection import get_connection_pool
+
+# Folders of the concepts tree that hold example queries rather than concepts
+EXCLUDED_DIRS = ("cookbook", "functions", "other-languages")
+
+# Top-level scripts of the PostgreSQL concepts that are not concepts: the
+# psql drivers including the concepts and the helper functions they call
+SCRIPT_PATTERN = "postgres-*.sql"
+DRIVER_SCRIPT = "postgres-make-concepts.sql"
+FUNCTIONS_SCRIPT = "postgres-functions.sql"
+
+STATE_FILE = ".concept_build_state.json"
+
+_INCLUDE_RE = re.compile(r"^\\i\s+(\S+)", re.MULTILINE)
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_TABLE_REF_RE = re.compile(
+    r"\b(?:from|join)\s+`?(?:[\w-]+\.)*([A-Za-z_]\w*)`?", re.IGNORECASE
+)
+_CTE_RE = re.compile(r"\b([A-Za-z_]\w*)\s+as\s*\(", re.IGNORECASE)
+_CREATES_TABLE_RE = re.compile(
+    r"\bcreate\s+(?:table|materialized\s+view|view)\b", re.IGNORECASE
+)
+
+
+def driver_includes(concept_dir: Union[str, Path]) -> List[Path]:
+    """
+    Lists the concept files the psql driver script includes with `\\i`.
+
+    :param concept_dir: Root of the concepts tree.
+    :return: The included files inside the tree, in driver order, or an empty
+        list if there is no driver script.
+    """
+    concept_dir = Path(concept_dir)
+    driver = concept_dir / DRIVER_SCRIPT
+    if not driver.exists():
+        return []
+    included = []
+    for include in _INCLUDE_RE.findall(driver.read_text()):
+        path = (concept_dir / include).resolve()
+        if path.is_file():
+            included.append(path)
+    return included
+
+
+def discover_concepts(
+    concept_dir: Union[str, Path], exclude_dirs: Sequence[str] = EXCLUDED_DIRS
+) -> Dict[str, Path]:
+    """
+    Finds the concept SQL files below a concepts directory.
+
+    The concept name is the file stem, which is also the name of the table
+    the concept is materialized into. The top-level driver and function
+    scripts are skipped. If several files share a name, the one included by
+    the driver script, see `driver_includes`, defines the concept.
+
+    :param concept_dir: Root of the concepts tree, e.g. the converted
+        `concepts_postgres` folder.
+    :param exclude_dirs: Top-level folders to skip. Default is EXCLUDED_DIRS.
+    :return: Mapping of concept name to SQL file.
+    :raises ValueError: If two files define the same concept name and the
+        driver script does not include exactly one of them.
+    """
+    concept_dir = Path(concept_dir)
+    scripts = set(concept_dir.glob(SCRIPT_PATTERN))
+    included = set(driver_includes(concept_dir))
+    candidates: Dict[str, List[Path]] = {}
+
+    for path in sorted(concept_dir.rglob("*.sql")):
+        relative = path.relative_to(concept_dir)
+        if relative.parts[0] in exclude_dirs or path in scripts:
+            continue
+        candidates.setdefault(path.stem, []).append(path)
+
+    concepts = {}
+    for name, paths in candidates.items():
+        if len(paths) > 1:
+            paths = [path for path in paths if path.resolve() in included]
+            if len(paths) != 1:
+                raise ValueError(
+                    "concept '{}' is defined in {}".format(
+                        name, " and ".join(str(path) for path in candidates[name])
+                    )
+                )
+        concepts[name] = paths[0]
+
+    return concepts
+
+
+def parse_dependencies(sql: str, known_concepts: Set[str]) -> Set[str]:
+    """
+    Lists the concepts a SQL script reads from.
+
+    Table references after FROM and JOIN are matched against the known concept
+    names, ignoring schema/project prefixes, comments and the script's own
+    common table expressions.
+
+    :param sql: The SQL script.
+    :param known_concepts: Names of all concepts.
+    :return: Names of the concepts the script depends on.
+    """
+    sql = _COMMENT_RE.sub(" ", sql)
+    ctes = {name.lower() for name in _CTE_RE.findall(sql)}
+    references = {name.lower() for name in _TABLE_REF_RE.findall(sql)}
+    known = {name.lower(): name for name in known_concepts}
+
+    return {known[name] for name in references - ctes if name in known}
+
+
+def file_hash(path: Union[str, Path]) -> str:
+    """
+    Hashes the content of a SQL file.
+
+    :param path: Path of the file.
+    :return: A hex SHA-256 digest.
+    """
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def build_statement(name: str, sql: str) -> str:
+    """
+    Turns a concept script into a statement that (re)materializes it.
+
+    Scripts that already create their table, like the converted PostgreSQL
+    concepts, are used unchanged. Plain SELECT scripts are wrapped into
+    `DROP TABLE IF EXISTS ...; CREATE TABLE ... AS`.
+
+    :param name: Concept name, used as the table name.
+    :param sql: The concept script.
+    :return: The SQL statement to execute.
+    """
+    if _CREATES_TABLE_RE.search(_COMMENT_RE.sub(" ", sql)):
+        return sql
+    body = sql.strip().rstrip(";")
+    return "DROP TABLE IF EXISTS {0}; CREATE TABLE {0} AS\n{1};".format(name, body)
+
+
+def _execute_on_pool(name: str, statement: str) -> None:
+    """Runs a build statement on a pooled connection and commits it."""
+    with get_connection_pool().connection() as con:
+        with con.cursor() as cur:
+            cur.execute(statement)
+        con.commit()
+
+
+class ConceptBuilder:
+    """
+    Incrementally materializes the MIMIC-III concepts.
+
+    Each concept file is hashed and its dependencies on other concepts are
+    parsed from the SQL. A concept is rebuilt when its file changed since the
+    last successful build or when a concept it depends on is rebuilt.
+    Independent concepts are built in parallel and every build is timed. The
+    helper functions the concepts call are (re)created first.
+    """
+
+    def __init__(
+        self,
+        concept_dir: Union[str, Path],
+        state_file: Optional[Union[str, Path]] = None,
+        execute: Optional[Callable[[str, str], None]] = None,
+        exclude_dirs: Sequence[str] = EXCLUDED_DIRS,
+    ):
+        """
+        :param concept_dir: Root of the concepts tree.
+        :param state_file: JSON file recording the hashes and timings of the
+            last successful builds. Default is None
+            (`.concept_build_state.json` inside `concept_dir`).
+        :param execute: Callable running a build statement for a concept name.
+            Default is None (execute on the shared connection pool).
+        :param exclude_dirs: Top-level folders to skip. Default is EXCLUDED_DIRS.
+        """
+        self.concept_dir = Path(concept_dir)
+        self.state_file = (
+            Path(state_file) if state_file else self.concept_dir / STATE_FILE
+        )
+        self.execute = execute or _execute_on_pool
+        functions_script = self.concept_dir / FUNCTIONS_SCRIPT
+        self.functions_script = functions_script if functions_script.exists() else None
+
+        self.concepts = discover_concepts(self.concept_dir, exclude_dirs)
+        names = set(self.concepts)
+        self.dependencies = {
+            name: parse_dependencies(path.read_text(), names) - {name}
+            for name, path in self.concepts.items()
+        }
+        self.hashes = {name: file_hash(path) for name, path in self.concepts.items()}
+        self._check_acyclic()
+        self.build_hashes = self._build_hashes()
+
+    def _build_hashes(self) -> Dict[str, str]:
+        """
+        Hashes every concept together with the build hashes of its
+        dependencies, so a change anywhere upstream changes the hash.
+        """
+        build_hashes: Dict[str, str] = {}
+        for name in self._build_order(None):
+            digest = hashlib.sha256(self.hashes[name].encode("ascii"))
+            for dependency in sorted(self.dependencies[name]):
+                digest.update(
+                    "{}={}".format(dependency, build_hashes[dependency]).encode()
+                )
+            build_hashes[name] = digest.hexdigest()
+        return build_hashes
+
+    def _dependency_hashes(self, name: str) -> Dict[str, str]:
+        return {
+            dependency: self.build_hashes[dependency]
+            for dependency in sorted(self.dependencies[name])
+        }
+
+    def _check_acyclic(self) -> None:
+        """Raises ValueError if the dependency graph has a cycle."""
+        visiting, done = set(), set()
+
+        def visit(name: str, path: List[str]) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                cycle = path[path.index(name) :] + [name]
+                raise ValueError("dependency cycle: {}".format(" -> ".join(cycle)))
+            visiting.add(name)
+            for dependency in self.dependencies[name]:
+                visit(dependency, path + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.concepts:
+            visit(name, [])
+
+    def load_state(self) -> Dict[str, dict]:
+        """
+        Reads the record of the last successful builds.
+
+        :return: Mapping of concept name to its recorded hash, the build hashes
+            of its dependencies and its timing.
+        """
+        if not self.state_file.exists():
+            return {}
+        with open(self.state_file, "r") as f:
+            return json.load(f)
+
+    def _save_state(self, state: Dict[str, dict]) -> None:
+        tmp_file = self.state_file.with_suffix(".tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        tmp_file.replace(self.state_file)
+
+    def stale_concepts(self, targets: Optional[Sequence[str]] = None) -> List[str]:
+        """
+        Lists the concepts that need rebuilding, in a valid build order.
+
+        A concept is stale when its file or any concept upstream of it changed
+        since it was last built successfully, or when it depends on a stale
+        concept.
+
+        :param targets: Only consider these concepts and their dependencies.
+            Default is None (all concepts).
+        :return: Names of the stale concepts, dependencies first.
+        """
+        state = self.load_state()
+        order = self._build_order(targets)
+
+        stale: Set[str] = set()
+        for name in order:
+            entry = state.get(name, {})
+            changed = entry.get("hash") != self.hashes[name] or entry.get(
+                "dependencies"
+            ) != self._dependency_hashes(name)
+            if changed or self.dependencies[name] & stale:
+                stale.add(name)
+
+        return [name for name in order if name in stale]
+
+    def _build_order(self, targets: Optional[Sequence[str]]) -> List[str]:
+        """Topologically sorts the targets and everything they depend on."""
+        order: List[str] = []
+        seen: Set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in seen:
+                return
+            seen.add(name)
+            for dependency in sorted(self.dependencies[name]):
+                visit(dependency)
+            order.append(name)
+
+        for name in sorted(targets if targets is not None else self.concepts):
+            if name not in self.concepts:
+                raise KeyError("unknown concept '{}'".format(name))
+            visit(name)
+
+        return order
+
+    def build(
+        self,
+        targets: Optional[Sequence[str]] = None,
+        max_workers: int = 4,
+        force: bool = False,
+    ) -> List[dict]:
+        """
+        Rebuilds the stale concepts, running independent ones in parallel.
+
+        A concept starts as soon as all of its stale dependencies are built.
+        If a build fails, the concepts depending on it are skipped. Failed and
+        skipped concepts lose their recorded build, so they stay stale for the
+        next run. The functions script runs before the first concept; if it
+        fails, its error is raised and no concept is built.
+
+        :param targets: Only build these concepts and their dependencies.
+            Default is None (all concepts).
+        :param max_workers: Number of concepts built at once. Default is 4.
+        :param force: Whether to rebuild every selected concept regardless of
+            its recorded hash. Default is False.
+        :return: One report entry per concept with its name, status
+            ('built', 'failed' or 'skipped'), build seconds and error message,
+            sorted by descending build time.
+        """
+        pending = self._build_order(targets) if force else self.stale_concepts(targets)
+        pending_set = set(pending)
+        waiting_on = {name: self.dependencies[name] & pending_set for name in pending}
+
+        if pending and self.functions_script is not None:
+            self.execute(self.functions_script.stem, self.functions_script.read_text())
+
+        state = self.load_state()
+        report: Dict[str, dict] = {}
+
+        def run(name: str) -> float:
+            statement = build_statement(name, self.concepts[name].read_text())
+            start = time.perf_counter()
+            self.execute(name, statement)
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            running = {}
+            ready = [name for name in pending if not waiting_on[name]]
+
+            while ready or running:
+                for name in ready:
+                    running[executor.submit(run, name)] = name
+                ready = []
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        seconds = future.result()
+                        report[name] = {
+                            "name": name,
+                            "status": "built",
+                            "seconds": seconds,
+                            "error": None,
+                        }
+                        state[name] = {
+                            "hash": self.hashes[name],
+                            "dependencies": self._dependency_hashes(name),
+                            "seconds": seconds,
+                            "built_at": time.time(),
+                        }
+                        self._save_state(state)
+                    else:
+                        report[name] = {
+                            "name": name,
+                            "status": "failed",
+                            "seconds": None,
+                            "error": str(error),
+                        }
+                        self._skip_dependents(name, pending, waiting_on, report)
+                        for entry in report.values():
+                            if entry["status"] != "built":
+                                state.pop(entry["name"], None)
+                        self._save_state(state)
+
+                    for other in pending:
+                        if name in waiting_on.get(other, ()):
+                            waiting_on[other].discard(name)
+                            if not waiting_on[other] and other not in report:
+                                ready.append(other)
+
+        return sorted(report.values(), key=lambda entry: -(entry["seconds"] or 0))
+
+    def _skip_dependents(
+        self,
+        failed: str,
+        pending: List[str],
+        waiting_on: Dict[str, Set[str]],
+        report: Dict[str, dict],
+    ) -> None:
+        """Marks every pending concept depending on a failed one as skipped."""
+        blocked = {failed}
+        for name in pending:
+            if name not in report and self.dependencies[name] & blocked:
+                blocked.add(name)
+                report[name] = {
+                    "name": name,
+                    "status": "skipped",
+                    "seconds": None,
+                    "error": "depends on failed concept '{}'".format(failed),
+                }
+                waiting_on[name] = set()
+
+
+def format_report(report: List[dict]) -> str:
+    """
+    Formats a build report as a plain-text table.
+
+    :param report: Report entries returned by `ConceptBuilder.build`.
+    :return: One line per concept with its build time and status.
+    """
+    lines = []
+    for entry in report:
+        seconds = "{:10.2f}s".format(entry["seconds"]) if entry["seconds"] else " " * 11
+        line = "{} {:8} {}".format(seconds, entry["status"], entry["name"])
+        if entry["error"]:
+            line += "  ({})".format(entry["error"])
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command line entry point of the incremental concept build."""
+    parser = argparse.ArgumentParser(
+        description="Rebuild the stale MIMIC-III concepts on the local Postgres."
+    )
+    parser.add_argument("concept_dir", help="root of the (PostgreSQL) concepts tree")
+    parser.add_argument("targets", nargs="*", help="concepts to build (default: all)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    builder = ConceptBuilder(args.concept_dir)
+    targets = args.targets or None
+
+    if args.dry_run:
+        print("\n".join(builder.stale_concepts(targets)))
+        return
+
+    print(format_report(builder.build(targets, args.workers, args.force)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,197 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from typing import Optional
+from typing import Any, Dict, Iterator, Optional, Sequence
 from pathlib import Path
 import sys
-from utils.db_connection import create_connection
+from utils.db_connection import get_connection_pool
+from data_pipeline.cache import QueryCache
+from data_pipeline.schema import compact_dtypes
+from data_pipeline.transformer import CONCEPT_KEYS, join_on_keys
 
 sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
 
 
-def execute_query(query: str, con: Optional[object] = None) -> pd.DataFrame:
+def execute_query(
+    query: str,
+    con: Optional[object] = None,
+    cache: Optional[QueryCache] = None,
+    compact: bool = False,
+) -> pd.DataFrame:
     """
     Executes a SQL query and returns the result as a pandas DataFrame.
 
-    If a database connection is not provided, it will use the default connection by
-    calling `create_connection`.
+    If a database connection is not provided, a connection is borrowed from the
+    shared pool returned by `get_connection_pool` and handed back afterwards.
+
+    If a cache is provided, a cached result is returned without touching the
+    database, and fresh results are stored in the cache.
 
     :param query: The SQL query to be executed.
     :type query: str
-    :param con: The database connection object. If None, the default connection is used.
+    :param con: The database connection object. If None, a pooled connection is used.
     :type con: Optional[object]
+    :param cache: Optional on-disk result cache. Default is None.
+    :type cache: Optional[QueryCache]
+    :param compact: Whether to convert the result to the compact dtypes declared
+        in `data_pipeline.schema` (float32 measurements, small nullable integer
+        scores and flags, categorical demographics). Default is False.
+    :type compact: bool
     :return: The result of the query as a pandas DataFrame.
     :rtype: pd.DataFrame
     """
+    variant = "compact" if compact else ""
+
+    if cache is not None:
+        cached_df = cache.get(query, variant)
+        if cached_df is not None:
+            return cached_df
+
     if con is None:
-        con, _ = create_connection()
+        with get_connection_pool().connection() as pooled_con:
+            result_df = pd.read_sql_query(query, pooled_con)
+    else:
+        result_df = pd.read_sql_query(query, con)
+
+    if compact:
+        result_df = compact_dtypes(result_df)
+
+    if cache is not None:
+        cache.put(query, result_df, variant)
 
-    result_df = pd.read_sql_query(query, con)
     return result_df
+
+
+def execute_queries(
+    queries: Dict[str, str],
+    max_workers: Optional[int] = None,
+    cache: Optional[QueryCache] = None,
+    compact: bool = False,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Executes several independent SQL queries concurrently.
+
+    Each query runs in its own thread on its own pooled connection, so the total
+    wall time approaches that of the slowest query rather than the sum of all.
+
+    :param queries: Mapping of a name to the SQL query, e.g.
+        {'sapsii': 'SELECT * FROM sapsii'}.
+    :param max_workers: Number of queries run at once. Default is None (one per
+        query, capped at the size of the shared connection pool).
+    :param cache: Optional on-disk result cache passed to `execute_query`.
+        Default is None.
+    :param compact: Whether to convert every result to compact dtypes.
+        Default is False.
+    :return: Mapping of the same names to the query results.
+    """
+    if not queries:
+        return {}
+    if max_workers is None:
+        max_workers = min(len(queries), get_connection_pool().max_size)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            name: executor.submit(execute_query, query, cache=cache, compact=compact)
+            for name, query in queries.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
+def extract_concept_tables(
+    queries: Dict[str, str],
+    keys: Sequence[str] = CONCEPT_KEYS,
+    how: str = "left",
+    max_workers: Optional[int] = None,
+    cache: Optional[QueryCache] = None,
+    compact: bool = False,
+) -> pd.DataFrame:
+    """
+    Extracts several concept tables concurrently and joins them on their keys.
+
+    The first query is the base table; the others are joined onto it in order
+    on the keys they share with it (see `join_on_keys`).
+
+    :param queries: Mapping of a table name to its SQL query, e.g.
+        {'sapsii': 'SELECT * FROM sapsii', 'vitals': 'SELECT * FROM vitals_first_day'}.
+    :param keys: Candidate join keys. Default is subject_id, hadm_id, icustay_id.
+    :param how: Join type passed to pandas. Default is 'left'.
+    :param max_workers: Number of queries run at once. Default is None.
+    :param cache: Optional on-disk result cache. Default is None.
+    :param compact: Whether to convert every table to compact dtypes.
+        Default is False.
+    :return: The joined modeling table.
+    """
+    frames = execute_queries(
+        queries, max_workers=max_workers, cache=cache, compact=compact
+    )
+    return join_on_keys(frames, keys=keys, how=how)
+
+
+def execute_query_in_chunks(
+    query: str,
+    chunk_size: int = 10000,
+    con: Optional[object] = None,
+    dtypes: Optional[Dict[str, Any]] = None,
+    compact: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """
+    Executes a SQL query through a server-side cursor and yields the result in
+    fixed-size chunks.
+
+    Only one chunk is held in memory at a time, so peak memory is bounded by
+    `chunk_size` rather than by the size of the result. Each chunk is built
+    column-wise with numeric columns converted to NumPy dtypes.
+
+    :param query: The SQL query to be executed.
+    :param chunk_size: Number of rows per chunk. Default is 10000.
+    :param con: The database connection object. If None, a pooled connection is
+        borrowed for as long as the generator is being consumed.
+    :param dtypes: Optional mapping of column name to dtype applied to every
+        chunk, so that all chunks share the same dtypes even when a chunk
+        happens to contain no NULLs. Default is None.
+    :param compact: Whether to convert every chunk to the compact dtypes
+        declared in `data_pipeline.schema`. Undeclared string columns are left
+        as objects so that all chunks share the same dtypes. Default is False.
+    :return: An iterator of pandas DataFrames with at most `chunk_size` rows.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    if con is None:
+        with get_connection_pool().connection() as pooled_con:
+            yield from _stream_query(query, pooled_con, chunk_size, dtypes, compact)
+        return
+
+    yield from _stream_query(query, con, chunk_size, dtypes, compact)
+
+
+def _stream_query(
+    query: str,
+    con: Any,
+    chunk_size: int,
+    dtypes: Optional[Dict[str, Any]],
+    compact: bool,
+) -> Iterator[pd.DataFrame]:
+    """Fetch a query through a named (server-side) cursor chunk by chunk."""
+    cursor_name = "chunked_{}".format(uuid.uuid4().hex)
+
+    with con.cursor(name=cursor_name) as cur:
+        cur.itersize = chunk_size
+        cur.execute(query)
+
+        columns = None
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            if columns is None:
+                columns = [column[0] for column in cur.description]
+
+            chunk = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+            if compact:
+                chunk = compact_dtypes(chunk, categorize=False)
+            if dtypes:
+                chunk = chunk.astype(
+                    {col: dtype for col, dtype in dtypes.items() if col in chunk}
+                )
+            yield chunk
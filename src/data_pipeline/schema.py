@@ -0,0 +1,177 @@
+from typing import Any, Dict, Optional
+import numpy as np
+import pandas as pd
+
+# Declared dtypes of MIMIC-III columns whose compact type cannot be derived
+# from the column name suffix alone.
+MIMIC_DTYPES: Dict[str, Any] = {
+    # Identifiers (nullable because of LEFT JOINs)
+    "subject_id": "Int32",
+    "hadm_id": "Int32",
+    "icustay_id": "Int32",
+    # Outcomes and flags
+    "mortality": "Int8",
+    "hospital_expire_flag": "Int8",
+    "expire_flag": "Int8",
+    # Severity score totals
+    "sapsii": "Int16",
+    "apsiii": "Int16",
+    "saps": "Int16",
+    "sofa": "Int16",
+    "oasis": "Int16",
+    "lods": "Int16",
+    "sirs": "Int16",
+    "qsofa": "Int16",
+    # Demographics and admission details
+    "gender": pd.CategoricalDtype(["F", "M"]),
+    "admission_type": pd.CategoricalDtype(
+        ["ELECTIVE", "EMERGENCY", "NEWBORN", "URGENT"]
+    ),
+    "ethnicity": "category",
+    "ethnicity_grouped": "category",
+    "insurance": "category",
+    "marital_status": "category",
+    "religion": "category",
+    "language": "category",
+    "admission_location": "category",
+    "discharge_location": "category",
+    "first_careunit": "category",
+    "last_careunit": "category",
+}
+
+# Column name suffixes mapped to compact dtypes
+SUFFIX_DTYPES: Dict[str, Any] = {
+    "_score": "Int16",
+    "_flag": "Int8",
+}
+
+
+def _is_integral(values: np.ndarray) -> bool:
+    """Checks that a float array only holds whole numbers or NaN."""
+    finite = values[~np.isnan(values)]
+    return bool(np.all(finite == np.round(finite)))
+
+
+def _is_category(dtype: Any) -> bool:
+    """Checks whether a declared dtype is categorical."""
+    return isinstance(dtype, pd.CategoricalDtype) or str(dtype) == "category"
+
+
+def _target_dtype(col: pd.Series, declared: Any, categorize: bool) -> Any:
+    """Chooses the compact dtype of a single column, or None to keep it."""
+    if declared is not None:
+        if str(declared) == "category" and not categorize:
+            return None
+        if pd.api.types.is_integer_dtype(declared) and pd.api.types.is_float_dtype(
+            col.dtype
+        ):
+            # Integer-coded columns holding fractions stay floating point
+            if not _is_integral(col.to_numpy(dtype=np.float64)):
+                return "float32"
+        return declared
+
+    if pd.api.types.is_bool_dtype(col.dtype):
+        return "boolean"
+    if pd.api.types.is_float_dtype(col.dtype):
+        return "float32"
+    if pd.api.types.is_integer_dtype(col.dtype):
+        info = np.iinfo(np.int32)
+        if col.empty or (col.min() >= info.min and col.max() <= info.max):
+            return "Int32"
+        return None
+    if categorize and col.dtype == object and col.dropna().map(type).eq(str).all():
+        return "category"
+    return None
+
+
+def _as_numeric(col: pd.Series) -> pd.Series:
+    """
+    Converts an object column to numbers if every non-null value is numeric,
+    e.g. NUMERIC values returned by psycopg2 as Decimal objects.
+    """
+    non_null = col.notna()
+    if not non_null.any():
+        return col
+    numeric = pd.to_numeric(col, errors="coerce")
+    if numeric.notna().sum() != non_null.sum():
+        return col
+    return numeric
+
+
+def compact_dtypes(
+    df: pd.DataFrame,
+    dtypes: Optional[Dict[str, Any]] = None,
+    categorize: bool = True,
+) -> pd.DataFrame:
+    """
+    Converts an extracted frame to compact dtypes.
+
+    Declared columns get their declared dtype, `*_score` columns become Int16,
+    `*_flag` columns Int8, remaining floats float32 and remaining integers
+    Int32. Integer-like columns use pandas nullable dtypes, so missing values
+    are kept as a mask instead of forcing float64 or object columns. Object
+    columns holding Decimal values become numeric, and string columns become
+    categoricals.
+
+    :param df: The extracted frame.
+    :param dtypes: Declared dtypes by column name, taking precedence over the
+        suffix rules. Default is None (use MIMIC_DTYPES).
+    :param categorize: Whether to turn undeclared string columns and columns
+        declared as plain 'category' into categoricals. Disable it for chunked
+        extraction, where each chunk would get its own categories.
+        Default is True.
+    :return: A new frame with compact dtypes.
+    """
+    if dtypes is None:
+        dtypes = MIMIC_DTYPES
+
+    df = df.copy(deep=False)
+    for name in df.columns:
+        declared = dtypes.get(name)
+        if declared is None and isinstance(name, str):
+            declared = next(
+                (
+                    dtype
+                    for suffix, dtype in SUFFIX_DTYPES.items()
+                    if name.endswith(suffix)
+                ),
+                None,
+            )
+
+        original = df[name]
+        col = original
+        if col.dtype == object and not _is_category(declared):
+            col = _as_numeric(col)
+
+        target = _target_dtype(col, declared, categorize)
+        if target is not None and col.dtype != target:
+            col = col.astype(target)
+        if col is not original:
+            df[name] = col
+
+    return df
+
+
+def fill_missing(df: pd.DataFrame, value: Any = 0) -> pd.DataFrame:
+    """
+    Replaces missing values like `df.fillna(value)`, also in compact frames.
+
+    `fillna` refuses values that are not a category of a categorical column,
+    so `value` is first added to the categories of every categorical column
+    that has missing values. Use this instead of `fillna` on frames returned
+    by `compact_dtypes`.
+
+    :param df: A frame, e.g. with compact dtypes.
+    :param value: Replacement of missing values. Default is 0.
+    :return: A new frame without missing values.
+    """
+    df = df.copy(deep=False)
+    for name in df.columns:
+        col = df[name]
+        if (
+            isinstance(col.dtype, pd.CategoricalDtype)
+            and value not in col.cat.categories
+            and col.isna().any()
+        ):
+            df[name] = col.cat.add_categories([value])
+    return df.fillna(value)
@@ -0,0 +1,112 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from data_pipeline.schema import fill_missing
+
+# Keys shared by the MIMIC-III concept tables
+CONCEPT_KEYS = ("subject_id", "hadm_id", "icustay_id")
+
+
+def join_on_keys(
+    frames: Dict[str, pd.DataFrame],
+    keys: Sequence[str] = CONCEPT_KEYS,
+    how: str = "left",
+) -> pd.DataFrame:
+    """
+    Joins several tables on the identifier keys they have in common.
+
+    The first table is the base and the others are joined onto it in order.
+    Each join uses the keys present in both sides and is done on sorted key
+    indexes. Non-key columns that clash with earlier ones are suffixed with the
+    table name, e.g. `heartrate_mean_vitals`.
+
+    :param frames: Mapping of table name to DataFrame, in join order.
+    :param keys: Candidate join keys. Default is subject_id, hadm_id, icustay_id.
+    :param how: Join type passed to pandas. Default is 'left'.
+    :return: The joined DataFrame with the keys as regular columns.
+    :raises ValueError: If a table shares no key with the tables before it.
+    """
+    names = list(frames)
+    if not names:
+        raise ValueError("at least one table is required")
+
+    result = frames[names[0]]
+    for name in names[1:]:
+        right = frames[name]
+        on = [key for key in keys if key in result.columns and key in right.columns]
+        if not on:
+            raise ValueError("table '{}' shares no join key".format(name))
+
+        overlap = (set(right.columns) & set(result.columns)) - set(on)
+        right = right.rename(
+            columns={col: "{}_{}".format(col, name) for col in overlap}
+        )
+
+        left_indexed = result.set_index(on).sort_index()
+        right_indexed = right.set_index(on).sort_index()
+        result = left_indexed.join(right_indexed, how=how).reset_index()
+
+    return result
+
+
+def prepare_chunks(
+    chunks: Iterable[pd.DataFrame],
+    drop_columns: Optional[List[str]] = None,
+    fill_value: float = 0,
+) -> Iterator[pd.DataFrame]:
+    """
+    Applies the column drops and NaN filling used before modeling to each chunk
+    of a streamed extraction.
+
+    :param chunks: Chunks as yielded by `execute_query_in_chunks`.
+    :param drop_columns: Columns to drop from every chunk, e.g. identifiers and
+        the raw severity score. Missing columns are ignored. Default is None.
+    :param fill_value: Value used to replace NaNs, also in categorical columns
+        of compact chunks. Default is 0.
+    :return: An iterator of cleaned chunks.
+    """
+    for chunk in chunks:
+        if drop_columns:
+            chunk = chunk.drop(columns=drop_columns, errors="ignore")
+        yield fill_missing(chunk, fill_value)
+
+
+def fit_scaler_in_chunks(
+    chunks: Iterable[pd.DataFrame], scaler: Optional[StandardScaler] = None
+) -> StandardScaler:
+    """
+    Fits a StandardScaler incrementally over chunks with `partial_fit`.
+
+    The result matches fitting on the concatenated data, but only one chunk is
+    held in memory at a time. Since the chunks are consumed, stream the query a
+    second time to transform it with `scale_chunks`.
+
+    :param chunks: Chunks containing only feature columns.
+    :param scaler: An existing scaler to update. Default is None (a new
+        StandardScaler is created).
+    :return: The fitted scaler.
+    """
+    if scaler is None:
+        scaler = StandardScaler()
+
+    for chunk in chunks:
+        scaler.partial_fit(chunk)
+
+    return scaler
+
+
+def scale_chunks(
+    chunks: Iterable[pd.DataFrame], scaler: StandardScaler
+) -> Iterator[pd.DataFrame]:
+    """
+    Standardizes each chunk with an already fitted scaler.
+
+    :param chunks: Chunks containing the same feature columns the scaler was
+        fitted on.
+    :param scaler: A fitted StandardScaler.
+    :return: An iterator of scaled chunks that keep their column names and index.
+    """
+    for chunk in chunks:
+        yield pd.DataFrame(
+            scaler.transform(chunk), columns=chunk.columns, index=chunk.index
+        )
@@ -1,7 +1,14 @@
-from typing import Any, Dict, Tuple, List
-from interpret.glassbox import ExplainableBoostingClassifier
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple, List
+import numpy as np
 import pandas as pd
-from interpret import show
+from gams.ebm_scorer import EBMLookupScorer
+from gams.explanations import term_feature_names
+from ml_models.evalauion_results import roc_auc
+from utils.prediction import labels_from_proba, thresholded_accuracy
+
+if TYPE_CHECKING:
+    # interpret pulls in its visualization stack; it is imported on first use
+    from interpret.glassbox import ExplainableBoostingClassifier
 
 
 def train_ebm_model(
@@ -32,8 +39,12 @@ def train_ebm_model(
     objective: str = "log_loss",
     n_jobs: int = -2,
     random_state: int = 42,
+    threshold: float = 0.5,
+    compute_training_accuracy: bool = True,
+    y_test: Any = None,
+    progress_callback: Optional[Callable[[int, float], None]] = None,
     **kwargs: Dict[str, Any]
-) -> Tuple[ExplainableBoostingClassifier, Dict[str, Any]]:
+) -> Tuple["ExplainableBoostingClassifier", Dict[str, Any]]:
     """
     Trains an Explainable Boosting Machine (EBM) model with specified or default
     parameters on the provided training data and returns predictions,
@@ -75,10 +86,22 @@ def train_ebm_model(
     :param objective: Objective function for optimization. Default is 'log_loss'.
     :param n_jobs: Number of CPU cores to use. Default is -2 (all cores except one).
     :param random_state: Random seed for reproducibility. Default is 42.
+    :param threshold: Probability above which a test sample is labelled positive.
+        Default is 0.5.
+    :param compute_training_accuracy: Whether to score the training set, which
+        costs an extra inference pass over it. Default is True.
+    :param y_test: Test labels, needed for `progress_callback`. Default is None.
+    :param progress_callback: Function called with the outer bag number and
+        the ROC-AUC on (X_test, y_test) of the ensemble of the bags up to it,
+        see `staged_decision_function`. interpret offers no hook inside `fit`,
+        so the values are reported after fitting, before scoring X_test.
+        Exceptions it raises stop the training. Default is None.
     :param kwargs: Additional arguments to pass to ExplainableBoostingClassifier.
     :return: A tuple containing the trained EBM model and a dictionary with
         predictions, probabilities, model summary, and training accuracy.
     """
+    from interpret.glassbox import ExplainableBoostingClassifier
+
     # Initialize and train the model
     ebm_model = ExplainableBoostingClassifier(
         feature_names=feature_names,
@@ -110,12 +133,23 @@ def train_ebm_model(
 
     ebm_model.fit(X_train, y_train)
 
-    # Predict probabilities and binary outcomes on the test set
+    if progress_callback is not None:
+        if y_test is None:
+            raise ValueError("progress_callback needs y_test")
+        staged = staged_decision_function(ebm_model, X_test)
+        for bag, logits in enumerate(staged):
+            progress_callback(bag, roc_auc(y_test, logits))
+
+    # Predict probabilities once and derive binary outcomes from them
     y_pred_prob = ebm_model.predict_proba(X_test)[:, 1]
-    y_pred = ebm_model.predict(X_test)
+    y_pred = labels_from_proba(y_pred_prob, threshold, ebm_model.classes_)
 
     # Get training accuracy
-    training_accuracy = ebm_model.score(X_train, y_train)
+    training_accuracy = (
+        thresholded_accuracy(ebm_model, X_train, y_train, threshold, ebm_model.classes_)
+        if compute_training_accuracy
+        else None
+    )
 
     # Create a summary of the model parameters
     model_summary = {
@@ -156,6 +190,77 @@ def train_ebm_model(
     return ebm_model, results
 
 
+def compile_ebm_model(model: "ExplainableBoostingClassifier") -> EBMLookupScorer:
+    """
+    Compiles a trained binary EBM into a NumPy lookup-table scorer.
+
+    The scorer keeps only the bin edges, category mappings, term score tables
+    and intercept of the model, so it reproduces `predict_proba` without the
+    `interpret` package and can be saved as plain `.npy` arrays.
+
+    :param model: Trained binary ExplainableBoostingClassifier.
+    :return: The compiled scorer.
+    :raises ValueError: If the model is not a binary logit classifier.
+    """
+    if len(model.classes_) != 2 or getattr(model, "link_", "logit") != "logit":
+        raise ValueError("only binary EBM classifiers with a logit link are supported")
+
+    # Share one array per (feature, bin level) so the scorer bins it once
+    level_cuts: Dict[Tuple[int, int], Any] = {}
+
+    def bins_of(feature_idx: int, n_features: int) -> Any:
+        levels = model.bins_[feature_idx]
+        level = min(len(levels), n_features) - 1
+        key = (feature_idx, level)
+        if key not in level_cuts:
+            bins = levels[level]
+            level_cuts[key] = (
+                dict(bins) if isinstance(bins, dict) else np.asarray(bins, np.float64)
+            )
+        return level_cuts[key]
+
+    term_cuts, term_categories = [], []
+    for features in model.term_features_:
+        bins = [bins_of(feature_idx, len(features)) for feature_idx in features]
+        term_cuts.append([None if isinstance(b, dict) else b for b in bins])
+        term_categories.append([b if isinstance(b, dict) else None for b in bins])
+
+    return EBMLookupScorer(
+        feature_names=list(model.feature_names_in_),
+        feature_types=list(model.feature_types_in_),
+        intercept=float(np.ravel(model.intercept_)[0]),
+        term_features=[tuple(features) for features in model.term_features_],
+        term_scores=[np.asarray(scores, np.float64) for scores in model.term_scores_],
+        term_cuts=term_cuts,
+        term_categories=term_categories,
+        term_names=list(model.term_names_),
+        classes=list(model.classes_),
+    )
+
+
+def staged_decision_function(
+    model: "ExplainableBoostingClassifier", X: Any
+) -> np.ndarray:
+    """
+    Computes the logits of the ensembles of the first 1, 2, ... outer bags of
+    a trained binary EBM, whose average over all bags is the model itself.
+
+    :param model: Trained binary ExplainableBoostingClassifier.
+    :param X: Features.
+    :return: An (n_outer_bags, n_samples) array of logit scores.
+    """
+    scorer = compile_ebm_model(model)
+    bag_logits = np.zeros((len(model.bagged_intercept_), len(X)))
+    bag_logits += np.asarray(model.bagged_intercept_, np.float64)[:, np.newaxis]
+    for term_idx, indexes in scorer.bin_indexes(X):
+        bag_logits += model.bagged_scores_[term_idx][(slice(None),) + indexes]
+
+    weights = getattr(model, "bag_weights_", None)
+    weights = np.ones(len(bag_logits)) if weights is None else np.asarray(weights)
+    weighted = np.cumsum(weights[:, np.newaxis] * bag_logits, axis=0)
+    return weighted / np.cumsum(weights)[:, np.newaxis]
+
+
 def display_global_explanation_with_full_feature_names(model, feature_names: list):
     """
     Displays the global explanation of an EBM model with both individual
@@ -169,26 +274,12 @@ def display_global_explanation_with_full_feature_names(model, feature_names: lis
     # Get the global explanation object from the model
     global_explanation = model.explain_global(name="Global Explanation")
 
-    # Extract original feature names from the explanation
-    original_feature_names = global_explanation.data()["names"]
-
-    # Create a mapping for individual and combined features
-    name_mapping = {}
-    for original_name in original_feature_names:
-        if " & " in original_name:
-            # Handling combined features
-            combined = original_name.split(" & ")
-            mapped_names = [feature_names[int(name.split("_")[1])] for name in combined]
-            name_mapping[original_name] = " & ".join(mapped_names)
-        else:
-            # Handling individual features
-            index = int(original_name.split("_")[1])
-            name_mapping[original_name] = feature_names[index]
-
-    # Replace the feature names in the explanation object
-    global_explanation.data()["names"] = [
-        name_mapping[name] for name in original_feature_names
-    ]
+    # Name every term by its features, using the cached mapping
+    global_explanation.data()["names"] = term_feature_names(
+        model.term_features_, feature_names
+    )
 
     # Display the explanation plot
+    from interpret import show
+
     show(global_explanation)
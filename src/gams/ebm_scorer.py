@@ -0,0 +1,264 @@
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from utils.array_store import load_array, load_manifest, save_arrays
+
+ARTIFACT_FORMAT = "ebm-lookup-table"
+ARTIFACT_VERSION = 1
+
+
+class EBMLookupScorer:
+    """
+    A dependency-light scorer for a trained binary ExplainableBoostingClassifier.
+
+    At inference time an EBM is an intercept plus one score table per term,
+    indexed by the bin of each feature in the term. This class holds those
+    tables and the bin edges as plain NumPy arrays, bins continuous features
+    with `np.searchsorted` and gathers the term scores, which reproduces
+    `predict_proba` of the original model without importing `interpret`.
+
+    Bin 0 holds missing values, bins 1..len(cuts)+1 the regular bins and the
+    last bin unknown categories, as in `interpret`.
+    """
+
+    def __init__(
+        self,
+        feature_names: List[str],
+        feature_types: List[str],
+        intercept: float,
+        term_features: List[Tuple[int, ...]],
+        term_scores: List[np.ndarray],
+        term_cuts: List[List[Optional[np.ndarray]]],
+        term_categories: List[List[Optional[Dict[str, int]]]],
+        term_names: Optional[List[str]] = None,
+        classes: Optional[Sequence[Any]] = None,
+    ):
+        """
+        :param feature_names: Names of the model's input features, in order.
+        :param feature_types: 'continuous' or 'nominal'/'ordinal' per feature.
+        :param intercept: The model intercept on the logit scale.
+        :param term_features: Feature indexes of every term.
+        :param term_scores: Score table of every term, one axis per feature.
+        :param term_cuts: Per term and dimension, the bin edges of a
+            continuous feature, or None for a categorical one.
+        :param term_categories: Per term and dimension, the category to bin
+            mapping of a categorical feature, or None for a continuous one.
+        :param term_names: Names of the terms. Default is None.
+        :param classes: The two class labels. Default is None ([0, 1]).
+        """
+        self.feature_names = list(feature_names)
+        self.feature_types = list(feature_types)
+        self.intercept = float(intercept)
+        self.term_features = [tuple(features) for features in term_features]
+        self.term_scores = term_scores
+        self.term_cuts = term_cuts
+        self.term_categories = term_categories
+        self.term_names = list(term_names) if term_names is not None else None
+        self.classes = np.asarray(classes if classes is not None else [0, 1])
+
+    def _feature_matrix(self, X: Any) -> Any:
+        """
+        Orders the columns of a DataFrame like the training features.
+
+        :raises ValueError: If the columns are not the training features.
+        """
+        if not hasattr(X, "columns"):
+            return X
+        if len(X.columns) != len(self.feature_names) or not all(
+            name in X.columns for name in self.feature_names
+        ):
+            raise ValueError(
+                "X has columns {}, expected {}".format(
+                    list(X.columns), self.feature_names
+                )
+            )
+        return X[self.feature_names]
+
+    @staticmethod
+    def _column(X: Any, feature_idx: int) -> np.ndarray:
+        if hasattr(X, "iloc"):
+            return X.iloc[:, feature_idx].to_numpy()
+        return np.asarray(X)[:, feature_idx]
+
+    def _bin(self, values: np.ndarray, term_idx: int, dimension: int) -> np.ndarray:
+        """Maps the raw values of one term dimension to bin indexes."""
+        cuts = self.term_cuts[term_idx][dimension]
+        if cuts is not None:
+            values = np.asarray(values, dtype=np.float64)
+            bins = np.searchsorted(cuts, values, side="right") + 1
+            bins[np.isnan(values)] = 0
+            return bins
+
+        categories = self.term_categories[term_idx][dimension]
+        unknown = self.term_scores[term_idx].shape[dimension] - 1
+        return np.fromiter(
+            (
+                0
+                if value is None or value != value
+                else categories.get(str(value), unknown)
+                for value in values
+            ),
+            dtype=np.intp,
+            count=len(values),
+        )
+
+    def _term_indexes(self, X: Any) -> Iterator[Tuple[int, Tuple[np.ndarray, ...]]]:
+        """Yields every term index with the bin indexes of its dimensions."""
+        # A feature binned at the same level in several terms is binned once
+        binned: Dict[Tuple[int, int], np.ndarray] = {}
+
+        for term_idx, features in enumerate(self.term_features):
+            indexes = []
+            for dimension, feature_idx in enumerate(features):
+                bins = self.term_cuts[term_idx][dimension]
+                if bins is None:
+                    bins = self.term_categories[term_idx][dimension]
+                key = (feature_idx, id(bins))
+                if key not in binned:
+                    binned[key] = self._bin(
+                        self._column(X, feature_idx), term_idx, dimension
+                    )
+                indexes.append(binned[key])
+            yield term_idx, tuple(indexes)
+
+    def bin_indexes(self, X: Any) -> Iterator[Tuple[int, Tuple[np.ndarray, ...]]]:
+        """
+        Bins the features of every term, e.g. to look up other score tables
+        of the same shape such as the per-bag scores of the model.
+
+        :param X: Features as a DataFrame or 2-d array with the training columns.
+        :return: An iterator of (term index, bin indexes per dimension) tuples.
+        """
+        return self._term_indexes(self._feature_matrix(X))
+
+    def eval_terms(self, X: Any) -> np.ndarray:
+        """
+        Computes the additive contribution of every term for every sample.
+
+        :param X: Features as a DataFrame or 2-d array with the training columns.
+        :return: An (n_samples, n_terms) array of logit contributions.
+        """
+        X = self._feature_matrix(X)
+        contributions = np.empty((len(X), len(self.term_features)))
+        for term_idx, indexes in self._term_indexes(X):
+            contributions[:, term_idx] = self.term_scores[term_idx][indexes]
+        return contributions
+
+    def decision_function(self, X: Any) -> np.ndarray:
+        """
+        Computes the logit score of every sample.
+
+        :param X: Features as a DataFrame or 2-d array with the training columns.
+        :return: A 1-d array of logit scores.
+        """
+        X = self._feature_matrix(X)
+        scores = np.full(len(X), self.intercept)
+        for term_idx, indexes in self._term_indexes(X):
+            scores += self.term_scores[term_idx][indexes]
+        return scores
+
+    def predict_proba(self, X: Any) -> np.ndarray:
+        """
+        Predicts class probabilities like `ExplainableBoostingClassifier`.
+
+        :param X: Features as a DataFrame or 2-d array with the training columns.
+        :return: An (n_samples, 2) array of class probabilities.
+        """
+        positive = 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X: Any) -> np.ndarray:
+        """
+        Predicts class labels.
+
+        :param X: Features as a DataFrame or 2-d array with the training columns.
+        :return: The predicted labels.
+        """
+        return self.classes[(self.decision_function(X) > 0).astype(int)]
+
+    def save(
+        self, directory: Union[str, Path], metadata: Optional[Dict[str, Any]] = None
+    ) -> Path:
+        """
+        Writes the scorer as a directory of `.npy` arrays plus a JSON manifest.
+
+        :param directory: Target directory.
+        :param metadata: JSON-serializable data stored in the manifest under
+            'metadata'. Default is None.
+        :return: The path of the written directory.
+        """
+        arrays = {}
+        terms = []
+        for term_idx, features in enumerate(self.term_features):
+            arrays["t{}_scores".format(term_idx)] = self.term_scores[term_idx]
+            dimensions = []
+            for dimension in range(len(features)):
+                cuts = self.term_cuts[term_idx][dimension]
+                if cuts is not None:
+                    arrays["t{}_d{}_cuts".format(term_idx, dimension)] = cuts
+                dimensions.append(
+                    {"categories": self.term_categories[term_idx][dimension]}
+                )
+            terms.append({"features": list(features), "dimensions": dimensions})
+
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "version": ARTIFACT_VERSION,
+            "feature_names": self.feature_names,
+            "feature_types": self.feature_types,
+            "intercept": self.intercept,
+            "term_names": self.term_names,
+            "classes": self.classes.tolist(),
+            "terms": terms,
+            "metadata": metadata,
+        }
+        return save_arrays(directory, arrays, manifest)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], mmap: bool = True) -> "EBMLookupScorer":
+        """
+        Loads a scorer written by `save`.
+
+        :param directory: Directory written by `save`.
+        :param mmap: Whether to memory-map the score tables. Default is True.
+        :return: The scorer.
+        :raises ValueError: If the directory holds a different artifact format.
+        """
+        manifest = load_manifest(directory)
+        if manifest.get("format") != ARTIFACT_FORMAT:
+            raise ValueError("{} is not an EBM lookup-table artifact".format(directory))
+
+        term_scores, term_cuts, term_categories = [], [], []
+        # Terms sharing a feature at the same bin level share one cuts array
+        shared_cuts: Dict[bytes, np.ndarray] = {}
+        for term_idx, term in enumerate(manifest["terms"]):
+            term_scores.append(
+                load_array(directory, "t{}_scores".format(term_idx), mmap=mmap)
+            )
+            cuts_list, categories_list = [], []
+            for dimension, spec in enumerate(term["dimensions"]):
+                if spec["categories"] is None:
+                    cuts = load_array(
+                        directory,
+                        "t{}_d{}_cuts".format(term_idx, dimension),
+                        mmap=False,
+                    )
+                    cuts = shared_cuts.setdefault(cuts.tobytes(), cuts)
+                    cuts_list.append(cuts)
+                else:
+                    cuts_list.append(None)
+                categories_list.append(spec["categories"])
+            term_cuts.append(cuts_list)
+            term_categories.append(categories_list)
+
+        return cls(
+            feature_names=manifest["feature_names"],
+            feature_types=manifest["feature_types"],
+            intercept=manifest["intercept"],
+            term_features=[term["features"] for term in manifest["terms"]],
+            term_scores=term_scores,
+            term_cuts=term_cuts,
+            term_categories=term_categories,
+            term_names=manifest["term_names"],
+            classes=manifest["classes"],
+        )
@@ -0,0 +1,172 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from gams.ebm_scorer import EBMLookupScorer
+from gams.gam_scorer import GAMSplineScorer
+from utils.prediction import contribution_frame
+
+# pygam-style prefix of every LogisticGAM term kind
+GAM_TERM_PREFIXES = {"linear": "l", "spline": "s", "factor": "f", "tensor": "te"}
+
+
+@lru_cache(maxsize=256)
+def _ebm_term_names(
+    term_features: Tuple[Tuple[int, ...], ...], feature_names: Tuple[str, ...]
+) -> Tuple[str, ...]:
+    return tuple(
+        " & ".join(feature_names[feature_idx] for feature_idx in features)
+        for features in term_features
+    )
+
+
+def term_feature_names(
+    term_features: Sequence[Sequence[int]], feature_names: Sequence[str]
+) -> List[str]:
+    """
+    Names the terms of an EBM by their features, e.g. 'age & heart_rate' for
+    an interaction.
+
+    The mapping is computed from the feature indexes of every term instead of
+    parsing 'feature_XXXX' names and is cached per model and name list.
+
+    :param term_features: Feature indexes of every term, e.g. the model's
+        `term_features_`.
+    :param feature_names: Human-readable names of the model's input features.
+    :return: One name per term.
+    """
+    return list(
+        _ebm_term_names(
+            tuple(tuple(int(i) for i in features) for features in term_features),
+            tuple(feature_names),
+        )
+    )
+
+
+@lru_cache(maxsize=256)
+def _gam_term_names(
+    terms: Tuple[Tuple[str, Tuple[int, ...], Optional[int]], ...],
+    feature_names: Tuple[str, ...],
+) -> Tuple[str, ...]:
+    names = []
+    for kind, features, by in terms:
+        if kind == "intercept":
+            names.append("intercept")
+            continue
+        name = "{}({})".format(
+            GAM_TERM_PREFIXES[kind], ", ".join(feature_names[i] for i in features)
+        )
+        if by is not None:
+            name += " by {}".format(feature_names[by])
+        names.append(name)
+    return tuple(names)
+
+
+def gam_term_names(
+    terms: Sequence[Dict[str, Any]], feature_names: Sequence[str]
+) -> List[str]:
+    """
+    Names the terms of a compiled LogisticGAM like pygam, with feature names,
+    e.g. 's(age)' or 'te(age, heart_rate)'. The mapping is cached.
+
+    :param terms: The `terms` specs of a GAMSplineScorer.
+    :param feature_names: Human-readable names of the model's input features.
+    :return: One name per term.
+    """
+    key = tuple(
+        (
+            term["kind"],
+            tuple(marginal["feature"] for marginal in term["marginals"]),
+            term["by"],
+        )
+        for term in terms
+    )
+    return list(_gam_term_names(key, tuple(feature_names)))
+
+
+def explain_ebm_batch(
+    model: Any,
+    X: Any,
+    feature_names: Optional[Sequence[str]] = None,
+    include_intercept: bool = False,
+) -> pd.DataFrame:
+    """
+    Computes the local explanation of every sample of an EBM at once.
+
+    Every term's contribution is looked up in its score table by the binned
+    features of all samples together, which gives the scores of
+    `explain_local` for a whole cohort in a few array operations.
+
+    :param model: A trained binary ExplainableBoostingClassifier or its
+        compiled EBMLookupScorer.
+    :param X: Features as a DataFrame or 2-d array with the training columns.
+    :param feature_names: Human-readable names of the input features. Default
+        is None (the names the model was trained with).
+    :param include_intercept: Whether to add the intercept as the first
+        column. Default is False.
+    :return: An (n_samples, n_terms) DataFrame of logit contributions with one
+        column per term, interactions named 'a & b'. With the intercept, the
+        rows sum to the model's `decision_function`.
+    """
+    scorer = model
+    if not isinstance(model, EBMLookupScorer):
+        from gams.ebm_gam import compile_ebm_model
+
+        scorer = compile_ebm_model(model)
+    if feature_names is None:
+        feature_names = scorer.feature_names
+    names = term_feature_names(scorer.term_features, feature_names)
+    return contribution_frame(
+        scorer.eval_terms(X),
+        names,
+        X,
+        scorer.intercept if include_intercept else None,
+    )
+
+
+def explain_logistic_gam_batch(
+    model: Any,
+    X: Any,
+    feature_names: Optional[Sequence[str]] = None,
+    include_intercept: bool = False,
+) -> pd.DataFrame:
+    """
+    Computes the per-term partial predictions of every sample of a
+    LogisticGAM at once.
+
+    Univariate splines of the same order are evaluated together from their
+    non-zero basis functions, so the whole cohort costs about as much as one
+    `predict_proba` call.
+
+    :param model: A trained LogisticGAM or its compiled GAMSplineScorer.
+    :param X: Features as a DataFrame or 2-d array in training column order.
+    :param feature_names: Human-readable names of the input features. Default
+        is None (the DataFrame columns, or 'feature_XXXX').
+    :param include_intercept: Whether to add the intercept as the first
+        column. Default is False.
+    :return: An (n_samples, n_terms) DataFrame of logit contributions with one
+        column per term, named like 's(age)' or 'te(age, heart_rate)'. With
+        the intercept, the rows sum to the linear predictor.
+    """
+    scorer = model
+    if not isinstance(model, GAMSplineScorer):
+        from gams.logistic_gam import compile_logistic_gam_model
+
+        scorer = compile_logistic_gam_model(model)
+    if feature_names is None:
+        feature_names = (
+            [str(column) for column in X.columns]
+            if isinstance(X, pd.DataFrame)
+            else ["feature_{:04d}".format(i) for i in range(scorer.n_features)]
+        )
+
+    contributions = scorer.eval_terms(X)
+    names = gam_term_names(scorer.terms, feature_names)
+    is_intercept = np.array([term["kind"] == "intercept" for term in scorer.terms])
+    intercept = contributions[:, is_intercept].sum(axis=1)
+    return contribution_frame(
+        contributions[:, ~is_intercept],
+        [name for name, drop in zip(names, is_intercept) if not drop],
+        X,
+        intercept if include_intercept else None,
+    )
@@ -0,0 +1,359 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
+from utils.array_store import load_array, load_manifest, save_arrays
+
+ARTIFACT_FORMAT = "gam-basis-expansion"
+ARTIFACT_VERSION = 1
+
+# pygam wraps periodic splines with this tolerance
+_PERIODIC_WRAP = 1 + 1e-9
+
+
+def bspline_window(t: np.ndarray, order: int) -> np.ndarray:
+    """
+    Evaluates the non-zero B-splines of a uniform knot sequence.
+
+    Vectorized de Boor recursion: a point in a knot interval has `order + 1`
+    non-zero basis functions, whose values only depend on its relative
+    position `t` in [0, 1] within the interval.
+
+    :param t: Relative positions of the points inside their knot intervals.
+    :param order: Spline order (degree).
+    :return: An (n, order + 1) array, column r holding the basis function
+        starting r knots before the point's interval.
+    """
+    window = np.zeros((len(t), order + 1))
+    window[:, 0] = 1.0
+    for degree in range(1, order + 1):
+        saved = np.zeros(len(t))
+        for r in range(degree):
+            # With uniform knots every denominator equals the degree
+            temp = window[:, r] / degree
+            window[:, r] = saved + (r + 1 - t) * temp
+            saved = (t + degree - r - 1) * temp
+        window[:, degree] = saved
+    return window
+
+
+@lru_cache(maxsize=None)
+def _window_polynomials(order: int) -> np.ndarray:
+    """
+    Returns the matrix M with `bspline_window(t, order) == t ** [0..order] @ M`.
+
+    Each non-zero basis function is a polynomial of degree `order` in `t`, so
+    it is fixed by its values at `order + 1` points.
+    """
+    t = np.arange(order + 1, dtype=np.float64)
+    return np.linalg.solve(np.vander(t, increasing=True), bspline_window(t, order))
+
+
+def eval_bspline_window(t: np.ndarray, order: int) -> np.ndarray:
+    """
+    Same as `bspline_window`, evaluated as one small polynomial product.
+
+    :param t: Relative positions of the points inside their knot intervals.
+    :param order: Spline order (degree).
+    :return: An (n, order + 1) array of the non-zero basis function values.
+    """
+    return np.power.outer(t, np.arange(order + 1)) @ _window_polynomials(order)
+
+
+class GAMSplineScorer:
+    """
+    A dependency-light scorer for a trained pygam LogisticGAM.
+
+    Every term is stored as a coefficient tensor with one axis per marginal
+    (intercept: no axis, linear: one coefficient, spline or factor: one
+    coefficient per basis function). Spline marginals are evaluated with
+    `bspline_window`, so each sample only touches the `order + 1` non-zero
+    basis functions of every marginal instead of building the sparse model
+    matrix pygam uses. Outside the knot range splines extrapolate linearly
+    as in pygam.
+    """
+
+    def __init__(
+        self,
+        terms: List[Dict[str, Any]],
+        coefficients: List[np.ndarray],
+        edges: List[List[Optional[np.ndarray]]],
+        n_features: int,
+    ):
+        """
+        :param terms: One spec per term with its 'kind' ('intercept', 'linear',
+            'spline', 'factor' or 'tensor'), 'by' feature and 'marginals'.
+            A marginal spec holds its 'kind' ('linear' or 'spline'),
+            'feature' and, for splines, 'offset', 'scale', 'n_intervals',
+            'order' and 'periodic'.
+        :param coefficients: The coefficient tensor of every term.
+        :param edges: Per term and marginal, a (2, 2, order + 1) array with the
+            basis values and slopes at the left and right knot range edges,
+            or None for linear marginals.
+        :param n_features: Number of input features of the model.
+        """
+        self.terms = terms
+        self.coefficients = coefficients
+        self.edges = edges
+        self.n_features = n_features
+        self._group_splines()
+
+    def _group_splines(self) -> None:
+        """
+        Groups the univariate spline and factor terms by spline order, so
+        `linear_predictor` evaluates each group with one set of array
+        operations instead of one per term.
+        """
+        by_order: Dict[int, List[int]] = {}
+        for term_idx, term in enumerate(self.terms):
+            if term["kind"] in ("spline", "factor") and term["by"] is None:
+                by_order.setdefault(term["marginals"][0]["order"], []).append(term_idx)
+
+        self._spline_groups = []
+        for order, term_idxs in sorted(by_order.items()):
+            specs = [self.terms[term_idx]["marginals"][0] for term_idx in term_idxs]
+            width = max(len(self.coefficients[term_idx]) for term_idx in term_idxs)
+            coef = np.zeros((len(term_idxs), width))
+            for row, term_idx in enumerate(term_idxs):
+                term_coef = self.coefficients[term_idx]
+                coef[row, : len(term_coef)] = term_coef
+            params = {
+                key: np.array([spec[key] for spec in specs])
+                for key in ("feature", "offset", "scale", "n_intervals", "periodic")
+            }
+            params["order"] = order
+            params["edges"] = np.stack([self.edges[idx][0] for idx in term_idxs])
+            self._spline_groups.append((term_idxs, params, coef))
+
+        grouped = {idx for term_idxs, _, _ in self._spline_groups for idx in term_idxs}
+        self._other_terms = [
+            idx for idx in range(len(self.terms)) if idx not in grouped
+        ]
+
+    @staticmethod
+    def _spline_basis(
+        x: np.ndarray, params: Dict[str, Any]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Evaluates the non-zero basis functions of k spline marginals of equal
+        order at once.
+
+        :param x: An (n, k) array with the feature values of each marginal.
+        :param params: Per marginal 'offset', 'scale', 'n_intervals',
+            'periodic' and 'edges' arrays, and the shared 'order'.
+        :return: The (n, k) index of the first non-zero basis function and the
+            (n, k, order + 1) values of the non-zero basis functions.
+        """
+        order = params["order"]
+        s = (x - params["offset"]) / params["scale"]
+        periodic = params["periodic"]
+        if periodic.any():
+            s[:, periodic] = np.clip(s[:, periodic] % _PERIODIC_WRAP, 0.0, 1.0)
+
+        u = s * params["n_intervals"]
+        start = np.clip(np.floor(u), 0, params["n_intervals"] - 1)
+        weights = eval_bspline_window((u - start).ravel(), order)
+        weights = weights.reshape(s.shape + (order + 1,))
+        start = np.nan_to_num(start).astype(np.intp)
+
+        left, right = s < 0, s > 1
+        if order == 0:
+            # Step functions such as factor levels vanish outside the range
+            weights[left | right] = 0.0
+            return start, weights
+
+        edges = params["edges"]
+        if left.any():
+            marginal = np.nonzero(left)[1]
+            weights[left] = (
+                edges[marginal, 0, 0] + s[left, np.newaxis] * edges[marginal, 0, 1]
+            )
+        if right.any():
+            marginal = np.nonzero(right)[1]
+            weights[right] = (
+                edges[marginal, 1, 0]
+                + (s[right, np.newaxis] - 1) * edges[marginal, 1, 1]
+            )
+        return start, weights
+
+    def _marginal(
+        self, X: np.ndarray, spec: Dict[str, Any], edges: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Evaluates one marginal basis.
+
+        :return: The index of the first non-zero basis function of every sample
+            and the (n, window) values of the non-zero basis functions.
+        """
+        x = X[:, spec["feature"]]
+        if spec["kind"] == "linear":
+            return np.zeros(len(x), dtype=np.intp), x[:, np.newaxis]
+
+        params = {
+            key: np.array([spec[key]])
+            for key in ("offset", "scale", "n_intervals", "periodic")
+        }
+        params["order"] = spec["order"]
+        params["edges"] = None if edges is None else edges[np.newaxis]
+        start, weights = self._spline_basis(x[:, np.newaxis], params)
+        return start[:, 0], weights[:, 0]
+
+    def _term(self, X: np.ndarray, term_idx: int) -> np.ndarray:
+        """Computes the contribution of one term for every sample."""
+        term = self.terms[term_idx]
+        coef = self.coefficients[term_idx]
+        if term["kind"] == "intercept":
+            return np.full(len(X), float(coef))
+
+        n_marginals = len(term["marginals"])
+        index, weights = [], np.ones(len(X)).reshape((-1,) + (1,) * n_marginals)
+        for axis, spec in enumerate(term["marginals"]):
+            start, window = self._marginal(X, spec, self.edges[term_idx][axis])
+            shape = [1] * n_marginals
+            shape[axis] = window.shape[1]
+            offsets = np.arange(window.shape[1]).reshape(shape)
+            index.append(start.reshape((-1,) + (1,) * n_marginals) + offsets)
+            weights = weights * window.reshape([len(X)] + shape)
+
+        contribution = (coef[tuple(index)] * weights).reshape(len(X), -1).sum(axis=1)
+        if term["by"] is not None:
+            contribution *= X[:, term["by"]]
+        return contribution
+
+    def _check_X(self, X: Any) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(
+                "X has {} features, expected {}".format(X.shape[1], self.n_features)
+            )
+        return X
+
+    def partial_dependence(self, X: Any, term_idx: int) -> np.ndarray:
+        """
+        Computes the contribution of one term, like pygam's
+        `partial_dependence`.
+
+        :param X: Features as a DataFrame or 2-d array in training column order.
+        :param term_idx: Index of the term.
+        :return: A 1-d array with the term's contribution for every sample.
+        """
+        return self._term(self._check_X(X), term_idx)
+
+    def eval_terms(self, X: Any) -> np.ndarray:
+        """
+        Computes the contribution of every term for every sample, the
+        partial predictions summing to `linear_predictor`.
+
+        :param X: Features as a DataFrame or 2-d array in training column order.
+        :return: An (n_samples, n_terms) array of logit contributions, in the
+            order of `terms` and including the intercept term.
+        """
+        X = self._check_X(X)
+        contributions = np.empty((len(X), len(self.terms)))
+        for term_idxs, params, coef in self._spline_groups:
+            start, weights = self._spline_basis(X[:, params["feature"]], params)
+            window = start[:, :, np.newaxis] + np.arange(weights.shape[2])
+            rows = np.arange(len(coef))[:, np.newaxis]
+            contributions[:, term_idxs] = np.einsum(
+                "nkw,nkw->nk", weights, coef[rows, window]
+            )
+        for term_idx in self._other_terms:
+            contributions[:, term_idx] = self._term(X, term_idx)
+        return contributions
+
+    def linear_predictor(self, X: Any) -> np.ndarray:
+        """
+        Computes the linear predictor (logit) of every sample.
+
+        :param X: Features as a DataFrame or 2-d array in training column order.
+        :return: A 1-d array of logits.
+        """
+        X = self._check_X(X)
+        scores = np.zeros(len(X))
+        for _, params, coef in self._spline_groups:
+            start, weights = self._spline_basis(X[:, params["feature"]], params)
+            window = start[:, :, np.newaxis] + np.arange(weights.shape[2])
+            rows = np.arange(len(coef))[:, np.newaxis]
+            scores += np.einsum("nkw,nkw->n", weights, coef[rows, window])
+        for term_idx in self._other_terms:
+            scores += self._term(X, term_idx)
+        return scores
+
+    def predict_proba(self, X: Any) -> np.ndarray:
+        """
+        Predicts the positive-class probability like `LogisticGAM.predict_proba`.
+
+        :param X: Features as a DataFrame or 2-d array in training column order.
+        :return: A 1-d array of probabilities.
+        """
+        return 1.0 / (1.0 + np.exp(-self.linear_predictor(X)))
+
+    def predict(self, X: Any) -> np.ndarray:
+        """
+        Predicts binary outcomes like `LogisticGAM.predict`.
+
+        :param X: Features as a DataFrame or 2-d array in training column order.
+        :return: A boolean array.
+        """
+        return self.predict_proba(X) > 0.5
+
+    def save(
+        self, directory: Union[str, Path], metadata: Optional[Dict[str, Any]] = None
+    ) -> Path:
+        """
+        Writes the scorer as a directory of `.npy` arrays plus a JSON manifest.
+
+        :param directory: Target directory.
+        :param metadata: JSON-serializable data stored in the manifest under
+            'metadata'. Default is None.
+        :return: The path of the written directory.
+        """
+        arrays = {}
+        for term_idx, coef in enumerate(self.coefficients):
+            arrays["t{}_coef".format(term_idx)] = np.asarray(coef)
+            for axis, edges in enumerate(self.edges[term_idx]):
+                if edges is not None:
+                    arrays["t{}_m{}_edges".format(term_idx, axis)] = edges
+
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "version": ARTIFACT_VERSION,
+            "n_features": self.n_features,
+            "terms": self.terms,
+            "metadata": metadata,
+        }
+        return save_arrays(directory, arrays, manifest)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], mmap: bool = True) -> "GAMSplineScorer":
+        """
+        Loads a scorer written by `save`.
+
+        :param directory: Directory written by `save`.
+        :param mmap: Whether to memory-map the coefficients. Default is True.
+        :return: The scorer.
+        :raises ValueError: If the directory holds a different artifact format.
+        """
+        manifest = load_manifest(directory)
+        if manifest.get("format") != ARTIFACT_FORMAT:
+            raise ValueError(
+                "{} is not a GAM basis-expansion artifact".format(directory)
+            )
+
+        coefficients, edges = [], []
+        for term_idx, term in enumerate(manifest["terms"]):
+            coefficients.append(
+                load_array(directory, "t{}_coef".format(term_idx), mmap=mmap)
+            )
+            edges.append(
+                [
+                    load_array(directory, "t{}_m{}_edges".format(term_idx, axis))
+                    if spec["kind"] == "spline"
+                    else None
+                    for axis, spec in enumerate(term["marginals"])
+                ]
+            )
+
+        return cls(manifest["terms"], coefficients, edges, manifest["n_features"])
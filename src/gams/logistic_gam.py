@@ -1,6 +1,11 @@
-from typing import Any, Dict, Tuple
+from typing import Any, Callable, Dict, Optional, Tuple
 from pygam import LogisticGAM
+from pygam.callbacks import CallBack
+from pygam.utils import b_spline_basis
+import numpy as np
 import pandas as pd
+from gams.gam_scorer import GAMSplineScorer
+from utils.prediction import labels_from_proba, thresholded_accuracy
 
 
 def train_logistic_gam_model(
@@ -14,6 +19,9 @@ def train_logistic_gam_model(
     fit_intercept: bool = True,
     verbose: bool = True,
     include_summary: bool = True,  # New parameter for controlling summary
+    threshold: float = 0.5,
+    compute_training_accuracy: bool = True,
+    progress_callback: Optional[Callable[[int, float], None]] = None,
     **kwargs: Dict[str, Any]
 ) -> Tuple[LogisticGAM, Dict[str, Any]]:
     """
@@ -32,10 +40,23 @@ def train_logistic_gam_model(
     :param verbose: Whether to print progress messages. Default is False.
     :param include_summary: Whether to include the model summary in the output.
         Default is True.
+    :param threshold: Probability above which a test sample is labelled positive.
+        Default is 0.5.
+    :param compute_training_accuracy: Whether to score the training set, which
+        costs an extra inference pass over it. Default is True.
+    :param progress_callback: Function called at the start of every IRLS
+        iteration with the iteration number and the training deviance, e.g. to
+        report to an Optuna trial. Exceptions it raises stop the training.
+        Default is None.
     :param kwargs: Additional arguments to pass to LogisticGAM.
     :return: A tuple containing the trained LogisticGAM model and a dictionary with
         predictions, probabilities, model summary (if requested), and training accuracy.
     """
+    progress = None
+    if progress_callback is not None:
+        progress = DevianceProgress(progress_callback)
+        callbacks = list(callbacks) + [progress]
+
     # Train the model
     gam_model = LogisticGAM(
         terms=terms,
@@ -47,15 +68,23 @@ def train_logistic_gam_model(
         **kwargs
     ).fit(X_train, y_train)
 
-    # Predict probabilities and binary outcomes on the test set
+    if progress is not None:
+        # Do not keep the progress function alive with the model
+        gam_model.callbacks = [c for c in gam_model.callbacks if c is not progress]
+
+    # Predict probabilities once and derive binary outcomes from them
     y_pred_prob = gam_model.predict_proba(X_test)
-    y_pred = gam_model.predict(X_test)
+    y_pred = labels_from_proba(y_pred_prob, threshold)
 
     # Conditionally get the model summary
     model_summary = gam_model.summary() if include_summary else None
 
     # Get training accuracy
-    training_accuracy = gam_model.score(X_train, y_train)
+    training_accuracy = (
+        thresholded_accuracy(gam_model, X_train, y_train, threshold)
+        if compute_training_accuracy
+        else None
+    )
 
     # Package results
     results = {
@@ -66,3 +95,116 @@ def train_logistic_gam_model(
     }
 
     return gam_model, results
+
+
+class DevianceProgress(CallBack):
+    """pygam callback passing the deviance of every IRLS iteration on."""
+
+    def __init__(self, progress_callback: Callable[[int, float], None]):
+        """
+        :param progress_callback: Function called with the iteration number and
+            the training deviance.
+        """
+        super(DevianceProgress, self).__init__(name="progress")
+        self.progress_callback = progress_callback
+        self.iteration = 0
+
+    def on_loop_start(self, gam: LogisticGAM, y: np.ndarray, mu: np.ndarray) -> float:
+        # pygam passes its loop variables by the names of all locals of this
+        # method, so the work happens in a helper
+        return self._report(gam.distribution.deviance(y=y, mu=mu, scaled=False))
+
+    def _report(self, deviance: np.ndarray) -> float:
+        deviance = float(deviance.sum())
+        self.progress_callback(self.iteration, deviance)
+        self.iteration += 1
+        return deviance
+
+
+def _compile_marginal(term: Any) -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
+    """
+    Freezes a linear, spline or factor term into a marginal spec and, for
+    splines, the basis values and slopes at the edges of the knot range.
+    """
+    if term._name == "linear_term":
+        return {"kind": "linear", "feature": int(term.feature)}, None
+
+    periodic = term.basis == "cp"
+    order = int(term.spline_order)
+    n_columns = int(term.n_splines) + order * periodic
+    edge_knots = np.sort(term.edge_knots_)
+    scale = float(edge_knots[-1] - edge_knots[0]) or 1.0
+    spec = {
+        "kind": "spline",
+        "feature": int(term.feature),
+        "offset": float(edge_knots[0]),
+        "scale": scale,
+        "n_intervals": n_columns - order,
+        "order": order,
+        "periodic": periodic,
+    }
+
+    # pygam extrapolates linearly from the basis at the knot range edges, so
+    # evaluate it at -1, 0, 1 and 2 knot ranges. Periodic splines never do.
+    if periodic:
+        basis = np.zeros((4, n_columns))
+    else:
+        x = edge_knots[0] + scale * np.array([-1.0, 0.0, 1.0, 2.0])
+        basis = b_spline_basis(
+            x, edge_knots, int(term.n_splines), order, sparse=False, periodic=False
+        )
+    left, right = basis[:, : order + 1], basis[:, n_columns - order - 1 :]
+    edges = np.array([[left[1], left[1] - left[0]], [right[2], right[3] - right[2]]])
+    return spec, edges
+
+
+def compile_logistic_gam_model(model: LogisticGAM) -> GAMSplineScorer:
+    """
+    Compiles a trained LogisticGAM into an array-based basis-expansion scorer.
+
+    The scorer keeps the knots, spline orders, coefficients and tensor
+    structure of every term and evaluates only the non-zero B-splines per
+    sample, so it reproduces `predict_proba` without building pygam's sparse
+    model matrix and without importing pygam.
+
+    :param model: Trained LogisticGAM.
+    :return: The compiled scorer.
+    :raises ValueError: If the model does not use the logit link.
+    """
+    if getattr(model.link, "_name", model.link) != "logit":
+        raise ValueError("only LogisticGAM models with a logit link are supported")
+
+    terms, coefficients, edges = [], [], []
+    for term_idx, term in enumerate(model.terms):
+        coef = np.asarray(model.coef_[model.terms.get_coef_indices(term_idx)])
+        if term.isintercept:
+            terms.append({"kind": "intercept", "by": None, "marginals": []})
+            coefficients.append(np.asarray(coef[0], dtype=np.float64))
+            edges.append([])
+            continue
+
+        marginals = term._terms if term.istensor else [term]
+        compiled = [_compile_marginal(marginal) for marginal in marginals]
+        coef = coef.reshape([int(marginal.n_coefs) for marginal in marginals])
+        for axis, marginal in enumerate(marginals):
+            # Dummy-coded factors drop the first level, i.e. its coefficient is 0
+            if getattr(marginal, "coding", None) == "dummy":
+                coef = np.insert(coef, 0, 0.0, axis=axis)
+            # Periodic splines wrap their first basis functions around
+            if getattr(marginal, "basis", None) == "cp":
+                wrap = np.take(coef, range(marginal.spline_order), axis=axis)
+                coef = np.concatenate([coef, wrap], axis=axis)
+
+        terms.append(
+            {
+                "kind": "tensor" if term.istensor else term._name.replace("_term", ""),
+                "by": int(term.by) if getattr(term, "by", None) is not None else None,
+                "marginals": [spec for spec, _ in compiled],
+            }
+        )
+        coefficients.append(np.ascontiguousarray(coef, dtype=np.float64))
+        edges.append([marginal_edges for _, marginal_edges in compiled])
+
+    return GAMSplineScorer(
+        terms, coefficients, edges, int(model.statistics_["m_features"])
+    )
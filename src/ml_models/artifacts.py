@@ -0,0 +1,139 @@
+import importlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+import numpy as np
+from utils.array_store import load_manifest
+
+# Artifact format -> (module, scorer class)
+SCORERS = {
+    "ebm-lookup-table": ("gams.ebm_scorer", "EBMLookupScorer"),
+    "gam-basis-expansion": ("gams.gam_scorer", "GAMSplineScorer"),
+    "tree-ensemble": ("ml_models.tree_scorer", "TreeEnsembleScorer"),
+}
+
+# Model class name -> (module, compile_* function)
+COMPILERS = {
+    "ExplainableBoostingClassifier": ("gams.ebm_gam", "compile_ebm_model"),
+    "LogisticGAM": ("gams.logistic_gam", "compile_logistic_gam_model"),
+    "RandomForestClassifier": (
+        "ml_models.random_forest",
+        "compile_random_forest_model",
+    ),
+    "XGBClassifier": ("ml_models.xgb_model", "compile_xgboost_model"),
+}
+
+
+def _jsonable(value: Any) -> Any:
+    """Converts NumPy values nested in a model summary to JSON types."""
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return _jsonable(value.tolist())
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return repr(value)
+
+
+def compile_model(model: Any) -> Any:
+    """
+    Compiles a trained model into its array-based scorer.
+
+    Only the module of the model's own family is imported, so saving a forest
+    does not import `interpret` or `pygam`.
+
+    :param model: A trained ExplainableBoostingClassifier, LogisticGAM,
+        RandomForestClassifier or XGBClassifier.
+    :return: An EBMLookupScorer, GAMSplineScorer or TreeEnsembleScorer.
+    :raises TypeError: For other model types.
+    """
+    for cls in type(model).__mro__:
+        if cls.__name__ in COMPILERS:
+            module, function = COMPILERS[cls.__name__]
+            return getattr(importlib.import_module(module), function)(model)
+    raise TypeError(
+        "cannot save a {}, expected one of {}".format(
+            type(model).__name__, sorted(COMPILERS)
+        )
+    )
+
+
+def save_model(
+    model: Any,
+    directory: Union[str, Path],
+    model_summary: Optional[Dict[str, Any]] = None,
+    feature_names: Optional[List[str]] = None,
+) -> Path:
+    """
+    Saves a trained model as a versioned artifact directory.
+
+    The directory holds flat `.npy` arrays (bin edges and score tables, spline
+    coefficients, or int32/float32 tree nodes) and a JSON manifest with the
+    format, its version, the model type, the feature names and the model
+    summary. It is written atomically.
+
+    :param model: A trained model returned by one of the `train_*` wrappers.
+    :param directory: Target directory; an existing one is replaced.
+    :param model_summary: The 'model_summary' of the wrapper's results.
+        Default is None.
+    :param feature_names: Names of the input features. Default is None (the
+        names the model was trained with, if any).
+    :return: The path of the written directory.
+    """
+    scorer = compile_model(model)
+    if feature_names is None:
+        feature_names = getattr(scorer, "feature_names", None)
+    metadata = {
+        "model_type": type(model).__name__,
+        "feature_names": None if feature_names is None else list(feature_names),
+        "model_summary": _jsonable(model_summary),
+    }
+    return scorer.save(directory, metadata)
+
+
+def load_model(directory: Union[str, Path], mmap: bool = True) -> Any:
+    """
+    Loads the scorer of an artifact written by `save_model`.
+
+    With `mmap`, the large arrays are memory-mapped read-only instead of
+    read, so loading takes milliseconds, pages are only read when scoring
+    touches them, and processes loading the same artifact share one copy in
+    the page cache.
+
+    :param directory: Directory written by `save_model`.
+    :param mmap: Whether to memory-map the arrays. Default is True.
+    :return: The scorer, with `predict_proba` and `predict` like the model.
+    :raises ValueError: For an unknown format or a newer format version.
+    """
+    manifest = load_manifest(directory)
+    if manifest.get("format") not in SCORERS:
+        raise ValueError("{} is not a model artifact".format(directory))
+    module = importlib.import_module(SCORERS[manifest["format"]][0])
+    scorer_class = getattr(module, SCORERS[manifest["format"]][1])
+    if manifest["version"] > module.ARTIFACT_VERSION:
+        raise ValueError(
+            "{} has version {} of the '{}' format, this code reads up to "
+            "version {}".format(
+                directory,
+                manifest["version"],
+                manifest["format"],
+                module.ARTIFACT_VERSION,
+            )
+        )
+    return scorer_class.load(directory, mmap=mmap)
+
+
+def load_metadata(directory: Union[str, Path]) -> Dict[str, Any]:
+    """
+    Reads the model type, feature names and model summary of an artifact.
+
+    :param directory: Directory written by `save_model`.
+    :return: The 'metadata' of the manifest, with its 'format' and 'version'.
+    """
+    manifest = load_manifest(directory)
+    metadata = dict(manifest.get("metadata") or {})
+    metadata.update({"format": manifest["format"], "version": manifest["version"]})
+    return metadata
@@ -0,0 +1,270 @@
+import importlib
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Union
+import pandas as pd
+from threadpoolctl import threadpool_limits
+from ml_models.evalauion_results import compute_metrics
+from utils.prediction import positive_class_proba
+from utils.shared_data import SharedDataset
+
+# Model family -> (module, train_* wrapper)
+TRAINERS = {
+    "logistic_gam": ("gams.logistic_gam", "train_logistic_gam_model"),
+    "ebm": ("gams.ebm_gam", "train_ebm_model"),
+    "random_forest": ("ml_models.random_forest", "train_random_forest_model"),
+    "xgboost": ("ml_models.xgb_model", "train_xgboost_model"),
+}
+
+# Keyword controlling the number of threads of each model family, if any
+THREAD_PARAMS = {
+    "logistic_gam": None,
+    "ebm": "n_jobs",
+    "random_forest": "n_jobs",
+    "xgboost": "n_jobs",
+}
+
+# File name prefix of the `*_best_configs.json` files -> model family
+CONFIG_PREFIXES = {
+    "logisticgam_": "logistic_gam",
+    "ebm_": "ebm",
+    "random_forest_": "random_forest",
+    "xgboost_": "xgboost",
+}
+
+# Training data shared with the benchmark workers
+_WORKER_DATA: Dict[str, Any] = {}
+
+
+def get_trainer(model: str) -> Callable:
+    """
+    Imports the `train_*` wrapper of a model family.
+
+    :param model: One of TRAINERS.
+    :return: The training function.
+    :raises KeyError: If the model family is unknown.
+    """
+    if model not in TRAINERS:
+        raise KeyError(
+            "unknown model '{}', expected one of {}".format(model, sorted(TRAINERS))
+        )
+    module, function = TRAINERS[model]
+    return getattr(importlib.import_module(module), function)
+
+
+def load_best_config(
+    config_file: Union[str, Path], name: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Turns a saved `*_best_configs.json` file into a benchmark job.
+
+    The model family is derived from the file name. Optuna-only parameters are
+    translated into `train_*` arguments: the LogisticGAM 'terms_option'
+    becomes `terms='auto'`.
+
+    :param config_file: Path of the JSON file written by the tuning notebooks.
+    :param name: Name of the job. Default is None (the file stem).
+    :return: A job dictionary with 'name', 'model', 'params' and 'best_value'.
+    :raises ValueError: If the model family cannot be derived from the name or
+        the config uses custom GAM terms, which only exist in the notebooks.
+    """
+    config_file = Path(config_file)
+    model = next(
+        (
+            family
+            for prefix, family in CONFIG_PREFIXES.items()
+            if config_file.name.startswith(prefix)
+        ),
+        None,
+    )
+    if model is None:
+        raise ValueError("cannot derive the model family of {}".format(config_file))
+
+    with open(config_file, "r") as f:
+        saved_configs = json.load(f)
+
+    params = dict(saved_configs["best_params"])
+    if model == "logistic_gam":
+        terms_option = params.pop("terms_option", "auto")
+        if terms_option != "auto":
+            raise ValueError(
+                "{} uses custom terms; pass them in the job params".format(config_file)
+            )
+        params["terms"] = "auto"
+
+    return {
+        "name": name or config_file.stem.replace("_best_configs", ""),
+        "model": model,
+        "params": params,
+        "best_value": saved_configs.get("best_value"),
+    }
+
+
+def plan_threads(n_jobs: int, max_workers: Optional[int] = None) -> tuple:
+    """
+    Splits the CPU cores between concurrent jobs.
+
+    :param n_jobs: Number of benchmark jobs.
+    :param max_workers: Maximum number of concurrent jobs. Default is None
+        (one per core, at most one per job).
+    :return: The number of worker processes and the threads of each job.
+    """
+    cores = os.cpu_count() or 1
+    workers = max(1, min(n_jobs, max_workers or cores))
+    return workers, max(1, cores // workers)
+
+
+def _init_worker(data: Union[Dict[str, Any], SharedDataset]) -> None:
+    # A SharedDataset arrives as its handle and attaches zero-copy views here
+    _WORKER_DATA["data"] = data
+
+
+def _run_job(job: Dict[str, Any], threads: int, threshold: float) -> Dict[str, Any]:
+    """Trains, times and evaluates one job inside a worker."""
+    row = {
+        "name": job["name"],
+        "model": job["model"],
+        "threads": threads,
+        "error": None,
+    }
+    params = dict(job.get("params", {}))
+    thread_param = THREAD_PARAMS.get(job["model"])
+    if thread_param is not None:
+        params[thread_param] = threads
+    if job["model"] == "logistic_gam":
+        params.setdefault("verbose", False)
+        params.setdefault("include_summary", False)
+    if job["model"] == "xgboost":
+        params.setdefault("verbosity", 0)
+
+    try:
+        train = get_trainer(job["model"])
+        data = _WORKER_DATA["data"]
+        X_train, y_train = data["X_train"], data["y_train"]
+        X_test, y_test = data["X_test"], data["y_test"]
+
+        # Also cap BLAS/OpenMP pools the model does not control itself
+        with threadpool_limits(limits=threads):
+            start = time.perf_counter()
+            model, results = train(
+                X_train,
+                y_train,
+                X_test,
+                threshold=threshold,
+                compute_training_accuracy=False,
+                **params
+            )
+            train_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            positive_class_proba(model, X_test)
+            predict_seconds = time.perf_counter() - start
+
+        metrics = compute_metrics(y_test, results["y_pred_prob"], threshold)
+        at_threshold = metrics["thresholds"].iloc[0]
+        row.update(
+            {
+                "roc_auc": metrics["roc_auc"],
+                "roc_prc": metrics["roc_prc"],
+                "f1_score": float(at_threshold["f1_score"]),
+                "test_accuracy": float(at_threshold["accuracy"]),
+                # The wrapper also scores X_test once, so subtract that pass
+                "fit_seconds": max(0.0, train_seconds - predict_seconds),
+                "predict_seconds": predict_seconds,
+            }
+        )
+    except Exception:
+        row["error"] = traceback.format_exc(limit=3)
+
+    return row
+
+
+def run_benchmark(
+    X_train: Any,
+    y_train: Any,
+    X_test: Any,
+    y_test: Any,
+    jobs: Sequence[Union[Dict[str, Any], str, Path]],
+    max_workers: Optional[int] = None,
+    threads_per_job: Optional[int] = None,
+    threshold: float = 0.5,
+) -> pd.DataFrame:
+    """
+    Trains and evaluates several models concurrently on the same split.
+
+    Jobs run in a process pool. Every job gets an explicit thread budget that
+    is passed to the model's own `n_jobs` and used to cap BLAS/OpenMP thread
+    pools, so concurrent jobs do not oversubscribe the cores.
+
+    :param X_train: Training features.
+    :param y_train: Training labels.
+    :param X_test: Test features.
+    :param y_test: Test labels.
+    :param jobs: Job dictionaries with 'name', 'model' (one of TRAINERS) and
+        'params' for the `train_*` wrapper, or paths of `*_best_configs.json`
+        files, see `load_best_config`.
+    :param max_workers: Maximum number of concurrent jobs. Default is None
+        (one per core, at most one per job).
+    :param threads_per_job: Threads of each job. Default is None (the cores
+        divided by the number of workers).
+    :param threshold: Decision threshold of F1 and accuracy. Default is 0.5.
+    :return: One row per job with its ROC-AUC, PR-AUC, F1, accuracy, fit and
+        predict seconds, thread budget and error (None on success), sorted by
+        descending ROC-AUC.
+    """
+    jobs = [job if isinstance(job, dict) else load_best_config(job) for job in jobs]
+    names = [job["name"] for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError("job names must be unique: {}".format(names))
+
+    workers, threads = plan_threads(len(jobs), max_workers)
+    threads = threads_per_job or threads
+    data = {
+        "X_train": X_train,
+        "y_train": y_train,
+        "X_test": X_test,
+        "y_test": y_test,
+    }
+
+    if workers == 1:
+        _init_worker(data)
+        rows = [_run_job(job, threads, threshold) for job in jobs]
+    else:
+        # Place the split in shared memory once instead of pickling it per worker
+        try:
+            shared = SharedDataset.create(data)
+        except ValueError:
+            shared = None
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(shared if shared is not None else data,),
+            ) as executor:
+                futures = [
+                    executor.submit(_run_job, job, threads, threshold) for job in jobs
+                ]
+                rows = [future.result() for future in futures]
+        finally:
+            if shared is not None:
+                shared.unlink()
+
+    columns = [
+        "name",
+        "model",
+        "roc_auc",
+        "roc_prc",
+        "f1_score",
+        "test_accuracy",
+        "fit_seconds",
+        "predict_seconds",
+        "threads",
+        "error",
+    ]
+    table = pd.DataFrame(rows).reindex(columns=columns)
+    table = table.sort_values("roc_auc", ascending=False, na_position="last")
+    return table.reset_index(drop=True)
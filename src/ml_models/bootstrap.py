@@ -0,0 +1,305 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from scipy.stats import norm, rankdata
+from ml_models.evalauion_results import compute_metrics
+
+METRICS = ("roc_auc", "roc_prc", "f1_score", "test_accuracy")
+
+# Per-model sort structures shared with the bootstrap workers
+_WORKER_DATA: Dict[str, Any] = {}
+
+
+def _sort_structure(y_true: np.ndarray, y_score: np.ndarray, threshold: float):
+    """
+    Sorts one model's scores once for all resamples.
+
+    :return: The descending sort order, the start of every run of equal scores
+        in it, and the number of distinct scores strictly above the threshold.
+    """
+    order = np.argsort(y_score, kind="mergesort")[::-1]
+    sorted_scores = y_score[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_scores)) + 1]
+    n_above = int(np.searchsorted(-sorted_scores[starts], -threshold, side="left"))
+    return order, starts, n_above
+
+
+def _init_worker(data: Dict[str, Any]) -> None:
+    _WORKER_DATA.clear()
+    _WORKER_DATA.update(data)
+
+
+def resample_metrics(
+    counts: np.ndarray,
+    y_true: np.ndarray,
+    order: np.ndarray,
+    starts: np.ndarray,
+    n_above: int,
+) -> Dict[str, np.ndarray]:
+    """
+    Computes the metrics of many resamples at once from their sample counts.
+
+    A resample is the number of times each original sample was drawn, so all
+    rank statistics are weighted sums over the runs of equal scores of the
+    single original sort.
+
+    :param counts: A (n_resamples, n_samples) matrix of draw counts.
+    :param y_true: Binary labels as 0/1.
+    :param order: Descending sort order of the scores.
+    :param starts: Start of every run of equal scores in the sorted order.
+    :param n_above: Number of distinct scores above the decision threshold.
+    :return: One array per metric in METRICS, NaN where a resample lacks a class.
+    """
+    counts = counts[:, order]
+    pos = counts * y_true[order].astype(counts.dtype)
+    neg = counts - pos
+    if len(starts) < counts.shape[1]:
+        # Merge runs of tied scores
+        pos = np.add.reduceat(pos, starts, axis=1)
+        neg = np.add.reduceat(neg, starts, axis=1)
+
+    tps = np.cumsum(pos, axis=1, dtype=pos.dtype)
+    fps = np.cumsum(neg, axis=1, dtype=neg.dtype)
+    n_pos, n_neg = tps[:, -1:], fps[:, -1:]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Positives outrank the negatives below them and half of the tied ones
+        roc_auc = (pos * (n_neg - fps + 0.5 * neg)).sum(axis=1) / (
+            n_pos * n_neg
+        ).ravel()
+
+        # Trapezoidal PR curve with decreasing recall ending at (0, 1)
+        predicted = tps + fps
+        # Before the first drawn sample the curve sits at the (0, 1) end point
+        precision = np.where(predicted > 0, tps / np.maximum(predicted, 1), 1.0)
+        precision = np.c_[precision[:, ::-1], np.ones(len(counts))]
+        recall = np.c_[(tps / n_pos)[:, ::-1], np.zeros(len(counts))]
+        roc_prc = -np.trapz(precision, recall, axis=1)
+
+        tp = tps[:, n_above - 1] if n_above else np.zeros(len(counts))
+        fp = fps[:, n_above - 1] if n_above else np.zeros(len(counts))
+        fn, tn = n_pos.ravel() - tp, n_neg.ravel() - fp
+        f1 = np.where(tp + fp + fn > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+        accuracy = (tp + tn) / (n_pos + n_neg).ravel()
+
+    undefined = (n_pos == 0).ravel() | (n_neg == 0).ravel()
+    roc_auc[undefined] = np.nan
+    roc_prc[undefined] = np.nan
+
+    return {
+        "roc_auc": roc_auc,
+        "roc_prc": roc_prc,
+        "f1_score": f1,
+        "test_accuracy": accuracy,
+    }
+
+
+def _bootstrap_chunk(task: Tuple[np.random.SeedSequence, int]) -> Dict[str, Any]:
+    """Draws one block of resamples and scores every model on it."""
+    seed, n_resamples = task
+    y_true = _WORKER_DATA["y_true"]
+    n_samples = len(y_true)
+
+    # One index matrix per block, turned into per-sample draw counts
+    rng = np.random.default_rng(seed)
+    indices = rng.integers(0, n_samples, size=(n_resamples, n_samples))
+    offsets = np.arange(n_resamples)[:, np.newaxis] * n_samples
+    counts = np.bincount((indices + offsets).ravel(), minlength=indices.size)
+    counts = counts.astype(np.int32).reshape(n_resamples, n_samples)
+
+    return {
+        name: resample_metrics(counts, y_true, *structure)
+        for name, structure in _WORKER_DATA["models"].items()
+    }
+
+
+def bootstrap_metrics(
+    y_true: Any,
+    y_pred_probs: Dict[str, Any],
+    n_resamples: int = 2000,
+    alpha: float = 0.05,
+    threshold: float = 0.5,
+    baseline: Optional[str] = None,
+    n_jobs: int = 1,
+    chunk_size: int = 100,
+    random_state: int = 42,
+) -> pd.DataFrame:
+    """
+    Estimates bootstrap confidence intervals of ROC-AUC, PR-AUC, F1 and
+    accuracy for several models or scores on the same test set.
+
+    Every model is scored on the same resamples, so differences to the
+    baseline are paired. Resample indices are drawn as one matrix per block
+    of `chunk_size` resamples, and the blocks are spread over a process pool.
+    Results only depend on `random_state` and `chunk_size`, not on `n_jobs`.
+
+    :param y_true: True binary labels.
+    :param y_pred_probs: Mapping of model name to predicted probabilities
+        (or scores, e.g. SAPS-II) of the positive class.
+    :param n_resamples: Number of bootstrap resamples. Default is 2000.
+    :param alpha: One minus the confidence level. Default is 0.05.
+    :param threshold: Decision threshold of F1 and accuracy. Default is 0.5.
+    :param baseline: Name of the model the others are compared to. Default is
+        None (no comparison).
+    :param n_jobs: Number of worker processes. Default is 1 (in-process).
+    :param chunk_size: Number of resamples drawn per block. Default is 100.
+    :param random_state: Seed of the resampling. Default is 42.
+    :return: A DataFrame with one row per model and metric and the columns
+        'model', 'metric', 'estimate', 'ci_lower', 'ci_upper', 'std' and,
+        with a baseline, the paired bootstrap 'p_value' of the difference.
+    """
+    y_true = np.asarray(y_true).ravel()
+    classes = np.unique(y_true)
+    y_binary = (y_true == classes[-1]).astype(np.int8)
+    scores = {
+        name: np.asarray(y_score, dtype=np.float64).ravel()
+        for name, y_score in y_pred_probs.items()
+    }
+    if baseline is not None and baseline not in scores:
+        raise KeyError("unknown baseline '{}'".format(baseline))
+
+    data = {
+        "y_true": y_binary,
+        "models": {
+            name: _sort_structure(y_binary, y_score, threshold)
+            for name, y_score in scores.items()
+        },
+    }
+
+    sizes = [chunk_size] * (n_resamples // chunk_size)
+    if n_resamples % chunk_size:
+        sizes.append(n_resamples % chunk_size)
+    tasks = list(zip(np.random.SeedSequence(random_state).spawn(len(sizes)), sizes))
+
+    if n_jobs <= 1:
+        _init_worker(data)
+        chunks = [_bootstrap_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_jobs, initializer=_init_worker, initargs=(data,)
+        ) as executor:
+            chunks = list(executor.map(_bootstrap_chunk, tasks))
+
+    resampled = {
+        name: {
+            metric: np.concatenate([chunk[name][metric] for chunk in chunks])
+            for metric in METRICS
+        }
+        for name in scores
+    }
+
+    rows = []
+    for name, y_score in scores.items():
+        point = compute_metrics(y_binary, y_score, threshold)
+        at_threshold = point.pop("thresholds").iloc[0]
+        point["f1_score"] = at_threshold["f1_score"]
+        point["test_accuracy"] = at_threshold["accuracy"]
+        for metric in METRICS:
+            values = resampled[name][metric]
+            lower, upper = np.nanpercentile(
+                values, [100 * alpha / 2, 100 * (1 - alpha / 2)]
+            )
+            row = {
+                "model": name,
+                "metric": metric,
+                "estimate": float(point[metric]),
+                "ci_lower": float(lower),
+                "ci_upper": float(upper),
+                "std": float(np.nanstd(values)),
+            }
+            if baseline is not None:
+                row["p_value"] = (
+                    np.nan
+                    if name == baseline
+                    else paired_p_value(values - resampled[baseline][metric])
+                )
+            rows.append(row)
+
+    return pd.DataFrame(rows)
+
+
+def paired_p_value(differences: np.ndarray) -> float:
+    """
+    Computes the two-sided bootstrap p-value of a paired difference.
+
+    :param differences: Metric differences between two models per resample.
+    :return: Twice the smaller fraction of resamples on either side of zero.
+    """
+    differences = differences[~np.isnan(differences)]
+    if len(differences) == 0:
+        return np.nan
+    tail = min(np.mean(differences <= 0), np.mean(differences >= 0))
+    return float(min(1.0, 2 * tail))
+
+
+def _delong_covariance(
+    y_true: Any, y_scores: List[Any]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fast DeLong: AUCs and their covariance from midranks (Sun and Xu, 2014).
+
+    :return: The AUC of every score and their (k, k) covariance matrix.
+    """
+    y_true = np.asarray(y_true).ravel()
+    positive = y_true == np.unique(y_true)[-1]
+    scores = np.atleast_2d(np.asarray(y_scores, dtype=np.float64))
+    pos, neg = scores[:, positive], scores[:, ~positive]
+    m, n = pos.shape[1], neg.shape[1]
+    if m == 0 or n == 0:
+        raise ValueError("DeLong's test needs positive and negative samples")
+
+    ranks = rankdata(np.c_[pos, neg], axis=1)
+    pos_ranks, neg_ranks = rankdata(pos, axis=1), rankdata(neg, axis=1)
+
+    aucs = (ranks[:, :m].sum(axis=1) - m * (m + 1) / 2) / (m * n)
+    v01 = (ranks[:, :m] - pos_ranks) / n
+    v10 = 1.0 - (ranks[:, m:] - neg_ranks) / m
+    covariance = np.atleast_2d(np.cov(v01)) / m + np.atleast_2d(np.cov(v10)) / n
+    return aucs, covariance
+
+
+def delong_roc_ci(y_true: Any, y_score: Any, alpha: float = 0.05) -> Dict[str, float]:
+    """
+    Computes the ROC-AUC with DeLong's asymptotic confidence interval.
+
+    :param y_true: True binary labels.
+    :param y_score: Predicted probabilities or scores of the positive class.
+    :param alpha: One minus the confidence level. Default is 0.05.
+    :return: A dictionary with 'roc_auc', 'ci_lower', 'ci_upper' and 'std'.
+    """
+    aucs, covariance = _delong_covariance(y_true, [y_score])
+    std = float(np.sqrt(covariance[0, 0]))
+    z = norm.ppf(1 - alpha / 2)
+    return {
+        "roc_auc": float(aucs[0]),
+        "ci_lower": max(0.0, float(aucs[0]) - z * std),
+        "ci_upper": min(1.0, float(aucs[0]) + z * std),
+        "std": std,
+    }
+
+
+def delong_roc_test(y_true: Any, y_score_a: Any, y_score_b: Any) -> Dict[str, float]:
+    """
+    Compares two correlated ROC-AUCs on the same samples with DeLong's test.
+
+    :param y_true: True binary labels.
+    :param y_score_a: Scores of the first model.
+    :param y_score_b: Scores of the second model, e.g. SAPS-II.
+    :return: A dictionary with 'roc_auc_a', 'roc_auc_b', 'difference', 'z' and
+        the two-sided 'p_value'.
+    """
+    aucs, covariance = _delong_covariance(y_true, [y_score_a, y_score_b])
+    difference = aucs[0] - aucs[1]
+    variance = covariance[0, 0] + covariance[1, 1] - 2 * covariance[0, 1]
+    if variance <= 0:
+        z = 0.0 if difference == 0 else np.inf * np.sign(difference)
+    else:
+        z = difference / np.sqrt(variance)
+    return {
+        "roc_auc_a": float(aucs[0]),
+        "roc_auc_b": float(aucs[1]),
+        "difference": float(difference),
+        "z": float(z),
+        "p_value": float(2 * norm.sf(abs(z))),
+    }
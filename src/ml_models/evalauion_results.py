@@ -1,45 +1,192 @@
-from typing import Any, Dict
-from sklearn.metrics import (
-    roc_auc_score,
-    roc_curve,
-    auc,
-    accuracy_score,
-    precision_recall_curve,
-    f1_score,
-    classification_report,
-    confusion_matrix,
-    ConfusionMatrixDisplay,
-)
-import matplotlib.pyplot as plt
+from typing import Any, Dict, Optional, Sequence, Union
+import numpy as np
 import pandas as pd
 
 
-def evaluate_model(
-    y_true: pd.Series, y_pred: pd.Series, y_pred_prob: pd.Series
+def _check_binary(y_true: Any, y_score: Any) -> tuple:
+    """Converts labels and scores to arrays and checks both classes are present."""
+    y_true = np.asarray(y_true).ravel()
+    y_score = np.asarray(y_score, dtype=np.float64).ravel()
+    if y_true.shape != y_score.shape:
+        raise ValueError(
+            "y_true has {} samples but y_score has {}".format(len(y_true), len(y_score))
+        )
+    classes = np.unique(y_true)
+    if len(classes) != 2:
+        raise ValueError(
+            "Only one class present in y_true. ROC AUC score is not defined "
+            "in that case."
+        )
+    return (y_true == classes[1]).astype(np.int64), y_score
+
+
+def score_curve(y_true: Any, y_score: Any) -> Dict[str, np.ndarray]:
+    """
+    Sorts the scores once and counts true and false positives above every
+    distinct score, the single pass all other metrics are derived from.
+
+    :param y_true: True binary labels.
+    :param y_score: Predicted probabilities (or scores) of the positive class.
+    :return: A dictionary with the descending distinct 'thresholds', the
+        cumulative 'tps' and 'fps' of samples scoring at or above each of
+        them, and the number of 'positives' and 'negatives'.
+    """
+    y_true, y_score = _check_binary(y_true, y_score)
+
+    order = np.argsort(y_score, kind="mergesort")[::-1]
+    y_score, y_true = y_score[order], y_true[order]
+
+    # Keep the last position of every run of equal scores
+    distinct = np.flatnonzero(np.diff(y_score))
+    ends = np.r_[distinct, len(y_true) - 1]
+    tps = np.cumsum(y_true)[ends]
+    fps = ends + 1 - tps
+
+    return {
+        "thresholds": y_score[ends],
+        "tps": tps,
+        "fps": fps,
+        "positives": int(tps[-1]),
+        "negatives": int(fps[-1]),
+    }
+
+
+def curve_aucs(curve: Dict[str, np.ndarray]) -> Dict[str, float]:
+    """
+    Computes the areas under the ROC and precision-recall curves.
+
+    Matches `roc_auc_score` and `auc(recall, precision)` on the output of
+    `precision_recall_curve`.
+
+    :param curve: Output of `score_curve`.
+    :return: A dictionary with 'roc_auc' and 'roc_prc'.
+    """
+    tps, fps = curve["tps"], curve["fps"]
+
+    fpr = np.r_[0, fps] / curve["negatives"]
+    tpr = np.r_[0, tps] / curve["positives"]
+    roc_auc = np.trapz(tpr, fpr)
+
+    # Like precision_recall_curve: decreasing recall, ending at (0, 1)
+    precision = np.r_[(tps / (tps + fps))[::-1], 1.0]
+    recall = np.r_[(tps / curve["positives"])[::-1], 0.0]
+    roc_prc = -np.trapz(precision, recall)
+
+    return {"roc_auc": float(roc_auc), "roc_prc": float(roc_prc)}
+
+
+def roc_auc(y_true: Any, y_score: Any) -> float:
+    """
+    Computes the ROC-AUC like `sklearn.metrics.roc_auc_score`, without
+    importing scikit-learn's metrics.
+
+    :param y_true: True binary labels.
+    :param y_score: Predicted probabilities (or scores) of the positive class.
+    :return: The area under the ROC curve.
+    """
+    return curve_aucs(score_curve(y_true, y_score))["roc_auc"]
+
+
+def threshold_metrics(
+    curve: Dict[str, np.ndarray], thresholds: Union[float, Sequence[float]] = 0.5
+) -> pd.DataFrame:
+    """
+    Computes the confusion matrix, accuracy, precision, recall and F1 at one
+    or many thresholds from a sorted score curve.
+
+    A sample is labelled positive when its score is strictly above the
+    threshold, like `utils.prediction.labels_from_proba`.
+
+    :param curve: Output of `score_curve`.
+    :param thresholds: One or many decision thresholds. Default is 0.5.
+    :return: A DataFrame with one row per threshold and the columns
+        'threshold', 'tn', 'fp', 'fn', 'tp', 'accuracy', 'precision',
+        'recall' and 'f1_score'.
+    """
+    thresholds = np.atleast_1d(np.asarray(thresholds, dtype=np.float64))
+
+    # Number of distinct scores strictly above each threshold
+    n_above = np.searchsorted(-curve["thresholds"], -thresholds, side="left")
+    tps = np.r_[0, curve["tps"]][n_above]
+    fps = np.r_[0, curve["fps"]][n_above]
+    fns = curve["positives"] - tps
+    tns = curve["negatives"] - fps
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(tps + fps > 0, tps / (tps + fps), 0.0)
+        recall = tps / curve["positives"]
+        f1 = np.where(2 * tps + fps + fns > 0, 2 * tps / (2 * tps + fps + fns), 0.0)
+
+    return pd.DataFrame(
+        {
+            "threshold": thresholds,
+            "tn": tns,
+            "fp": fps,
+            "fn": fns,
+            "tp": tps,
+            "accuracy": (tps + tns) / (curve["positives"] + curve["negatives"]),
+            "precision": precision,
+            "recall": recall,
+            "f1_score": f1,
+        }
+    )
+
+
+def compute_metrics(
+    y_true: Any,
+    y_pred_prob: Any,
+    thresholds: Union[float, Sequence[float]] = 0.5,
 ) -> Dict[str, Any]:
     """
-    Evaluates a binary classification model on test data, returns various metrics,
-    and directly prints the results.
+    Computes ROC-AUC, PR-AUC and the thresholded metrics from a single sort
+    of the scores, without plotting. Suited for tuning loops and batch jobs.
 
-    :param y_true: True labels.
+    :param y_true: True binary labels.
+    :param y_pred_prob: Predicted probabilities of the positive class.
+    :param thresholds: One or many decision thresholds. Default is 0.5.
+    :return: A dictionary with 'roc_auc', 'roc_prc' and 'thresholds', the
+        DataFrame returned by `threshold_metrics`.
+    """
+    curve = score_curve(y_true, y_pred_prob)
+    metrics = curve_aucs(curve)
+    metrics["thresholds"] = threshold_metrics(curve, thresholds)
+    return metrics
+
+
+def confusion_counts(y_true: Any, y_pred: Any) -> np.ndarray:
+    """
+    Computes the 2x2 confusion matrix of binary labels.
+
+    :param y_true: True binary labels.
     :param y_pred: Predicted binary labels.
-    :param y_pred_prob: Predicted probabilities for the positive class.
-    :return: A dictionary containing evaluation metrics, classification report,
-        and confusion matrix plot.
+    :return: The confusion matrix [[tn, fp], [fn, tp]] like `confusion_matrix`.
     """
+    y_true, y_pred = np.asarray(y_true).ravel(), np.asarray(y_pred).ravel()
+    classes = np.unique(np.r_[y_true, y_pred])
+    positive = classes[-1]
+    cells = 2 * (y_true == positive) + (y_pred == positive)
+    return np.bincount(cells.astype(np.int64), minlength=4).reshape(2, 2)
 
-    # Calculate evaluation metrics
-    roc_auc = roc_auc_score(y_true, y_pred_prob)
-    fpr, tpr, _ = roc_curve(y_true, y_pred_prob)
-    roc_auc_value = auc(fpr, tpr)
-    test_accuracy = accuracy_score(y_true, y_pred)
-    f1 = f1_score(y_true, y_pred)
-    class_report = classification_report(y_true, y_pred)
-    conf_matrix = confusion_matrix(y_true, y_pred)
 
-    # Precision-Recall Curve
-    precision, recall, _ = precision_recall_curve(y_true, y_pred_prob)
-    roc_prc_value = auc(recall, precision)
+def plot_evaluation(
+    y_true: Any, y_pred_prob: Any, conf_matrix: np.ndarray, show: bool = True
+) -> Any:
+    """
+    Plots the confusion matrix next to the ROC curve.
+
+    :param y_true: True binary labels.
+    :param y_pred_prob: Predicted probabilities of the positive class.
+    :param conf_matrix: The confusion matrix to display.
+    :param show: Whether to call the blocking `plt.show()`. Default is True.
+    :return: The matplotlib figure.
+    """
+    import matplotlib.pyplot as plt
+    from sklearn.metrics import ConfusionMatrixDisplay
+
+    curve = score_curve(y_true, y_pred_prob)
+    fpr = np.r_[0, curve["fps"]] / curve["negatives"]
+    tpr = np.r_[0, curve["tps"]] / curve["positives"]
+    roc_auc_value = curve_aucs(curve)["roc_auc"]
 
     # Set up the figure and subplots
     fig, axes = plt.subplots(
@@ -69,16 +216,64 @@ def evaluate_model(
     axes[1].legend(loc="lower right")
 
     plt.tight_layout()  # Adjust the layout to prevent overlap
-    plt.show()
+    if show:
+        plt.show()
+
+    return fig
+
+
+def evaluate_model(
+    y_true: pd.Series,
+    y_pred: pd.Series,
+    y_pred_prob: pd.Series,
+    plot: bool = True,
+    include_report: bool = True,
+    thresholds: Optional[Union[float, Sequence[float]]] = None,
+) -> Dict[str, Any]:
+    """
+    Evaluates a binary classification model on test data, returns various metrics,
+    and optionally plots the confusion matrix and ROC curve.
+
+    :param y_true: True labels.
+    :param y_pred: Predicted binary labels.
+    :param y_pred_prob: Predicted probabilities for the positive class.
+    :param plot: Whether to plot the confusion matrix and ROC curve.
+        Default is True.
+    :param include_report: Whether to build the text classification report.
+        Default is True.
+    :param thresholds: Optional thresholds to also evaluate the probabilities
+        at, see `threshold_metrics`. Default is None.
+    :return: A dictionary containing evaluation metrics, classification report
+        and confusion matrix, plus the 'thresholds' table if requested.
+    """
+    # Sort the scores once for both curves
+    curve = score_curve(y_true, y_pred_prob)
+    aucs = curve_aucs(curve)
+
+    conf_matrix = confusion_counts(y_true, y_pred)
+    (tn, fp), (fn, tp) = conf_matrix
+    test_accuracy = (tp + tn) / conf_matrix.sum()
+    f1 = 2 * tp / (2 * tp + fp + fn) if tp + fp + fn else 0.0
+
+    class_report = None
+    if include_report:
+        from sklearn.metrics import classification_report
+
+        class_report = classification_report(y_true, y_pred)
+
+    if plot:
+        plot_evaluation(y_true, y_pred_prob, conf_matrix)
 
     # Package results
     evaluation_results = {
-        "roc_auc": roc_auc,
-        "roc_prc": roc_prc_value,
-        "test_accuracy": test_accuracy,
-        "f1_score": f1,
+        "roc_auc": aucs["roc_auc"],
+        "roc_prc": aucs["roc_prc"],
+        "test_accuracy": float(test_accuracy),
+        "f1_score": float(f1),
         "classification_report": class_report,
         "confusion_matrix": conf_matrix,
     }
+    if thresholds is not None:
+        evaluation_results["thresholds"] = threshold_metrics(curve, thresholds)
 
     return evaluation_results
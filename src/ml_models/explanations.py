@@ -0,0 +1,191 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+from utils.prediction import contribution_frame
+
+# TreeSHAP explainer shared with the contribution workers
+_WORKER_DATA: Dict[str, Any] = {}
+
+
+def _feature_names(model: Any, X: Any, feature_names: Optional[Sequence[str]]):
+    if feature_names is not None:
+        return [str(name) for name in feature_names]
+    if isinstance(X, pd.DataFrame):
+        return [str(column) for column in X.columns]
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None:
+        return [str(name) for name in names]
+    return ["feature_{:04d}".format(i) for i in range(np.shape(X)[1])]
+
+
+def _training_columns(model: Any, X: Any) -> Any:
+    """
+    Reorders the columns of a DataFrame to the model's training features,
+    like `TreeEnsembleScorer` does.
+
+    :raises ValueError: If the columns are not the training features or the
+        number of features does not match.
+    """
+    names = getattr(model, "feature_names_in_", None)
+    if isinstance(X, pd.DataFrame) and names is not None:
+        if len(X.columns) != len(names) or not all(name in X.columns for name in names):
+            raise ValueError(
+                "X has columns {}, expected {}".format(list(X.columns), list(names))
+            )
+        X = X[list(names)]
+    n_features = getattr(model, "n_features_in_", None)
+    if n_features is not None and np.shape(X)[1] != n_features:
+        raise ValueError(
+            "X has {} features, expected {}".format(np.shape(X)[1], n_features)
+        )
+    return X
+
+
+def explain_xgboost_batch(
+    model: Any,
+    X: Any,
+    feature_names: Optional[Sequence[str]] = None,
+    include_intercept: bool = False,
+    chunk_size: int = 50000,
+) -> pd.DataFrame:
+    """
+    Computes the TreeSHAP contribution of every feature for every sample of
+    an XGBClassifier with XGBoost's native `pred_contribs`.
+
+    The samples are converted to DMatrix chunks of `chunk_size` rows, so the
+    memory of the conversion stays bounded for cohort-sized inputs. Like
+    `predict_proba`, only the trees up to the best iteration are used when
+    the model was trained with early stopping.
+
+    :param model: A trained binary XGBClassifier.
+    :param X: Features as a DataFrame with the training columns, or a 2-d
+        array in training column order.
+    :param feature_names: Human-readable names of the input features. Default
+        is None (the DataFrame columns or the training names).
+    :param include_intercept: Whether to add the bias term as the first column.
+        Default is False.
+    :param chunk_size: Number of samples per DMatrix. Default is 50000.
+    :return: An (n_samples, n_features) DataFrame of logit contributions. With
+        the intercept, the rows sum to the model's margin.
+    :raises ValueError: If X does not have the training features.
+    """
+    import xgboost as xgb
+
+    X = _training_columns(model, X)
+    booster = model.get_booster()
+    try:
+        iteration_range = (0, model.best_iteration + 1)
+    except AttributeError:
+        iteration_range = (0, 0)
+
+    values = X.to_numpy() if isinstance(X, pd.DataFrame) else np.asarray(X)
+    contributions = np.concatenate(
+        [
+            booster.predict(
+                xgb.DMatrix(values[start : start + chunk_size], missing=np.nan),
+                pred_contribs=True,
+                iteration_range=iteration_range,
+                validate_features=False,
+            )
+            for start in range(0, len(values), chunk_size)
+        ]
+    ).astype(np.float64)
+
+    return contribution_frame(
+        contributions[:, :-1],
+        _feature_names(model, X, feature_names),
+        X,
+        contributions[:, -1] if include_intercept else None,
+    )
+
+
+def _init_worker(explainer: Any) -> None:
+    _WORKER_DATA["explainer"] = explainer
+
+
+def _shap_chunk(X: np.ndarray) -> np.ndarray:
+    """Computes the positive-class TreeSHAP values of one chunk in a worker."""
+    values = _WORKER_DATA["explainer"].shap_values(X, check_additivity=False)
+    values = np.asarray(values[1] if isinstance(values, list) else values)
+    return values[..., 1] if values.ndim == 3 else values
+
+
+def explain_random_forest_batch(
+    model: Any,
+    X: Any,
+    background: Any = None,
+    n_background: int = 100,
+    feature_names: Optional[Sequence[str]] = None,
+    include_intercept: bool = False,
+    n_jobs: int = 1,
+    chunk_size: int = 500,
+    random_state: int = 42,
+) -> pd.DataFrame:
+    """
+    Computes the TreeSHAP contribution of every feature for every sample of a
+    RandomForestClassifier, in chunks spread over a process pool.
+
+    Without a background sample the tree-path-dependent algorithm uses the
+    training distribution stored in the trees. With one, the interventional
+    algorithm is used on a random subsample of at most `n_background` rows,
+    as its cost grows linearly with the background size. Each worker builds
+    the explainer once and gets `chunk_size` samples per task, so memory is
+    bounded by the chunk and the output matrix.
+
+    :param model: A trained binary RandomForestClassifier.
+    :param X: Features as a DataFrame with the training columns, or a 2-d
+        array in training column order.
+    :param background: Reference samples of the interventional algorithm,
+        e.g. the training features. Default is None (tree-path-dependent).
+    :param n_background: Maximum number of background samples. Default is 100.
+    :param feature_names: Human-readable names of the input features. Default
+        is None (the DataFrame columns or the training names).
+    :param include_intercept: Whether to add the expected positive-class
+        probability as the first column. Default is False.
+    :param n_jobs: Number of worker processes. Default is 1 (in-process).
+    :param chunk_size: Number of samples per task. Default is 500.
+    :param random_state: Seed of the background subsample. Default is 42.
+    :return: An (n_samples, n_features) DataFrame of contributions to the
+        positive-class probability. With the intercept, the rows sum to
+        `predict_proba`.
+    :raises ValueError: If X does not have the training features.
+    """
+    import shap
+
+    X = _training_columns(model, X)
+    if background is None:
+        explainer = shap.TreeExplainer(model)
+    else:
+        background = np.asarray(_training_columns(model, background), dtype=np.float64)
+        if len(background) > n_background:
+            rng = np.random.default_rng(random_state)
+            rows = rng.choice(len(background), n_background, replace=False)
+            background = background[np.sort(rows)]
+        explainer = shap.TreeExplainer(
+            model, data=background, feature_perturbation="interventional"
+        )
+
+    values = np.asarray(X, dtype=np.float64)
+    chunks = [
+        values[start : start + chunk_size]
+        for start in range(0, len(values), chunk_size)
+    ]
+    if n_jobs <= 1 or len(chunks) <= 1:
+        _init_worker(explainer)
+        parts = [_shap_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(n_jobs, len(chunks)),
+            initializer=_init_worker,
+            initargs=(explainer,),
+        ) as executor:
+            parts = list(executor.map(_shap_chunk, chunks))
+
+    expected = np.ravel(explainer.expected_value)[-1]
+    return contribution_frame(
+        np.concatenate(parts),
+        _feature_names(model, X, feature_names),
+        X,
+        expected if include_intercept else None,
+    )
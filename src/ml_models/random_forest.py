@@ -1,6 +1,9 @@
 from typing import Any, Dict, Tuple
 from sklearn.ensemble import RandomForestClassifier
+import numpy as np
 import pandas as pd
+from ml_models.tree_scorer import TreeEnsembleScorer, concatenate_trees
+from utils.prediction import labels_from_proba, thresholded_accuracy
 
 
 def train_random_forest_model(
@@ -26,6 +29,8 @@ def train_random_forest_model(
     ccp_alpha: float = 0.0,
     max_samples: Any = None,
     monotonic_cst: Any = None,
+    threshold: float = 0.5,
+    compute_training_accuracy: bool = True,
     **kwargs: Dict[str, Any]
 ) -> Tuple[RandomForestClassifier, Dict[str, Any]]:
     """
@@ -70,6 +75,10 @@ def train_random_forest_model(
     :param max_samples: If bootstrap is True, the number of samples to
         draw from X to train each base estimator. Default is None.
     :param monotonic_cst: Constraints for monotonic splits. Default is None.
+    :param threshold: Probability above which a test sample is labelled positive.
+        Default is 0.5.
+    :param compute_training_accuracy: Whether to score the training set, which
+        costs an extra inference pass over it. Default is True.
     :param kwargs: Additional arguments to pass to RandomForestClassifier.
     :return: A tuple containing the trained RandomForestClassifier model,
         a dictionary with predictions, probabilities, model summary,
@@ -101,12 +110,16 @@ def train_random_forest_model(
 
     rf_model.fit(X_train, y_train)
 
-    # Predict probabilities and binary outcomes on the test set
+    # Predict probabilities once and derive binary outcomes from them
     y_pred_prob = rf_model.predict_proba(X_test)[:, 1]
-    y_pred = rf_model.predict(X_test)
+    y_pred = labels_from_proba(y_pred_prob, threshold, rf_model.classes_)
 
     # Get training accuracy
-    training_accuracy = rf_model.score(X_train, y_train)
+    training_accuracy = (
+        thresholded_accuracy(rf_model, X_train, y_train, threshold, rf_model.classes_)
+        if compute_training_accuracy
+        else None
+    )
 
     # Get feature importance
     feature_importance = rf_model.feature_importances_
@@ -136,3 +149,53 @@ def train_random_forest_model(
     }
 
     return rf_model, results
+
+
+def compile_random_forest_model(model: RandomForestClassifier) -> TreeEnsembleScorer:
+    """
+    Compiles a trained binary RandomForestClassifier into a flat-array
+    tree-ensemble scorer.
+
+    Thresholds are stored as the largest float32 not above the original
+    float64 threshold, which gives the same decisions for the float32
+    features scikit-learn compares, and every leaf stores its positive-class
+    probability.
+
+    :param model: Trained binary RandomForestClassifier.
+    :return: The compiled scorer.
+    :raises ValueError: If the model is not a binary classifier.
+    """
+    if len(model.classes_) != 2 or getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("only binary single-output forests are supported")
+
+    trees = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        leaf = tree.children_left < 0
+        threshold = tree.threshold.astype(np.float32)
+        above = threshold.astype(np.float64) > tree.threshold
+        threshold[above] = np.nextafter(threshold[above], np.float32(-np.inf))
+        value = tree.value[:, 0, :]
+        missing_left = getattr(tree, "missing_go_to_left", np.zeros(len(leaf)))
+        trees.append(
+            {
+                "feature": np.where(leaf, -1, tree.feature),
+                "threshold": np.where(leaf, 0.0, threshold),
+                "left": tree.children_left,
+                "right": tree.children_right,
+                "default_left": np.asarray(missing_left, dtype=bool),
+                "value": value[:, 1] / value.sum(axis=1),
+            }
+        )
+
+    nodes, roots, max_depth = concatenate_trees(trees)
+    feature_names = getattr(model, "feature_names_in_", None)
+    return TreeEnsembleScorer(
+        nodes,
+        roots,
+        aggregation="mean_proba",
+        n_features=model.n_features_in_,
+        max_depth=max_depth,
+        feature_names=None if feature_names is None else list(feature_names),
+        classes=list(model.classes_),
+    )
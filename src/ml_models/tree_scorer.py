@@ -0,0 +1,291 @@
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+import numpy as np
+from utils.array_store import load_array, load_manifest, save_arrays
+
+ARTIFACT_FORMAT = "tree-ensemble"
+ARTIFACT_VERSION = 1
+
+# How the leaf values of all trees become a positive-class probability
+AGGREGATIONS = ("mean_proba", "logit_sum")
+
+# Node arrays of the flattened ensemble and their stored dtypes
+NODE_ARRAYS = {
+    "feature": np.int32,
+    "threshold": np.float32,
+    "left": np.int32,
+    "right": np.int32,
+    "default_left": np.bool_,
+    "value": np.float32,
+}
+
+
+class TreeEnsembleScorer:
+    """
+    A dependency-light scorer for a trained binary tree ensemble such as a
+    RandomForestClassifier or an XGBClassifier.
+
+    All trees are flattened into one set of node arrays with absolute child
+    indexes (feature -1 marks a leaf). Prediction walks every sample through
+    every tree at once, one tree level per step, so the cost is a few array
+    operations per level instead of a Python loop over trees. Features are
+    compared as float32 like both libraries do; missing values follow each
+    node's default direction.
+    """
+
+    def __init__(
+        self,
+        nodes: Dict[str, np.ndarray],
+        roots: np.ndarray,
+        aggregation: str,
+        n_features: int,
+        max_depth: int,
+        strict: bool = False,
+        base_score: float = 0.0,
+        feature_names: Optional[List[str]] = None,
+        classes: Optional[Sequence[Any]] = None,
+        chunk_size: int = 1 << 20,
+    ):
+        """
+        :param nodes: One flat array per key of NODE_ARRAYS. 'value' holds the
+            positive-class probability ('mean_proba') or the logit ('logit_sum')
+            of every leaf.
+        :param roots: Index of the root node of every tree.
+        :param aggregation: One of AGGREGATIONS.
+        :param n_features: Number of input features of the model.
+        :param max_depth: Largest number of splits on a root-to-leaf path.
+        :param strict: Whether a sample goes left when its value is strictly
+            below the threshold (XGBoost) instead of below or equal to it
+            (scikit-learn). Default is False.
+        :param base_score: Logit added to the sum of the leaf values for
+            'logit_sum'. Default is 0.0.
+        :param feature_names: Names of the input features. Default is None.
+        :param classes: The two class labels. Default is None ([0, 1]).
+        :param chunk_size: Maximum number of (sample, tree) pairs walked at
+            once, to bound the memory of the traversal. Default is 2 ** 20.
+        """
+        if aggregation not in AGGREGATIONS:
+            raise ValueError("aggregation must be one of {}".format(AGGREGATIONS))
+        self.nodes = nodes
+        self.roots = roots
+        self.aggregation = aggregation
+        self.n_features = int(n_features)
+        self.max_depth = int(max_depth)
+        self.strict = bool(strict)
+        self.base_score = float(base_score)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.classes = np.asarray(classes if classes is not None else [0, 1])
+        self.chunk_size = chunk_size
+
+    @property
+    def n_trees(self) -> int:
+        """Number of trees in the ensemble."""
+        return len(self.roots)
+
+    def _check_X(self, X: Any) -> np.ndarray:
+        if hasattr(X, "columns") and self.feature_names is not None:
+            if len(X.columns) != len(self.feature_names) or not all(
+                name in X.columns for name in self.feature_names
+            ):
+                raise ValueError(
+                    "X has columns {}, expected {}".format(
+                        list(X.columns), self.feature_names
+                    )
+                )
+            X = X[self.feature_names]
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(
+                "X has {} features, expected {}".format(X.shape[1], self.n_features)
+            )
+        return X
+
+    def _apply(self, X: np.ndarray) -> np.ndarray:
+        """Walks a float32 feature chunk through all trees to their leaves."""
+        feature, threshold = self.nodes["feature"], self.nodes["threshold"]
+        left, right = self.nodes["left"], self.nodes["right"]
+        default_left = self.nodes["default_left"]
+
+        node = np.tile(np.asarray(self.roots, dtype=np.intp), len(X))
+        # Flat positions of the (sample, tree) pairs still inside a tree and
+        # of their sample's row in the flattened features
+        active = np.arange(len(node))
+        offset = np.repeat(np.arange(len(X)) * X.shape[1], self.n_trees)
+        X = X.ravel()
+        for _ in range(self.max_depth + 1):
+            current = node[active]
+            node_feature = feature[current]
+            internal = node_feature >= 0
+            if not internal.all():
+                active, offset = active[internal], offset[internal]
+                current, node_feature = current[internal], node_feature[internal]
+            if not len(active):
+                break
+            x = X[offset + node_feature]
+            node_threshold = threshold[current]
+            go_left = x < node_threshold if self.strict else x <= node_threshold
+            missing = np.isnan(x)
+            if missing.any():
+                go_left[missing] = default_left[current[missing]]
+            node[active] = np.where(go_left, left[current], right[current])
+        return node.reshape(-1, self.n_trees)
+
+    def apply(self, X: Any) -> np.ndarray:
+        """
+        Finds the leaf every sample reaches in every tree.
+
+        :param X: Features as a DataFrame with the training columns, or a 2-d
+            array in training column order.
+        :return: An (n_samples, n_trees) array of node indexes into `nodes`.
+        """
+        X = self._check_X(X)
+        step = max(1, self.chunk_size // max(self.n_trees, 1))
+        return np.concatenate(
+            [self._apply(X[start : start + step]) for start in range(0, len(X), step)]
+        )
+
+    def leaf_values(self, X: Any) -> np.ndarray:
+        """
+        Returns the leaf value of every sample in every tree.
+
+        :param X: Features as a DataFrame with the training columns, or a 2-d
+            array in training column order.
+        :return: An (n_samples, n_trees) array of leaf probabilities or logits.
+        """
+        return np.asarray(self.nodes["value"])[self.apply(X)].astype(np.float64)
+
+    def decision_function(self, X: Any) -> np.ndarray:
+        """
+        Computes the logit score of every sample.
+
+        :param X: Features as a DataFrame with the training columns, or a 2-d
+            array in training column order.
+        :return: A 1-d array of logits.
+        """
+        values = self.leaf_values(X)
+        if self.aggregation == "logit_sum":
+            return self.base_score + values.sum(axis=1)
+        positive = values.mean(axis=1)
+        with np.errstate(divide="ignore"):
+            return np.log(positive) - np.log1p(-positive)
+
+    def _positive_proba(self, X: Any) -> np.ndarray:
+        if self.aggregation == "mean_proba":
+            return self.leaf_values(X).mean(axis=1)
+        return 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+
+    def predict_proba(self, X: Any) -> np.ndarray:
+        """
+        Predicts class probabilities like the original classifier.
+
+        :param X: Features as a DataFrame with the training columns, or a 2-d
+            array in training column order.
+        :return: An (n_samples, 2) array of class probabilities.
+        """
+        positive = self._positive_proba(X)
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X: Any) -> np.ndarray:
+        """
+        Predicts class labels.
+
+        :param X: Features as a DataFrame with the training columns, or a 2-d
+            array in training column order.
+        :return: The predicted labels.
+        """
+        return self.classes[(self._positive_proba(X) > 0.5).astype(int)]
+
+    def save(
+        self, directory: Union[str, Path], metadata: Optional[Dict[str, Any]] = None
+    ) -> Path:
+        """
+        Writes the scorer as a directory of `.npy` arrays plus a JSON manifest.
+
+        :param directory: Target directory.
+        :param metadata: JSON-serializable data stored in the manifest under
+            'metadata'. Default is None.
+        :return: The path of the written directory.
+        """
+        arrays = {name: np.asarray(self.nodes[name]) for name in NODE_ARRAYS}
+        arrays["roots"] = np.asarray(self.roots, dtype=np.int32)
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "version": ARTIFACT_VERSION,
+            "aggregation": self.aggregation,
+            "n_features": self.n_features,
+            "max_depth": self.max_depth,
+            "strict": self.strict,
+            "base_score": self.base_score,
+            "feature_names": self.feature_names,
+            "classes": self.classes.tolist(),
+            "metadata": metadata,
+        }
+        return save_arrays(directory, arrays, manifest)
+
+    @classmethod
+    def load(
+        cls, directory: Union[str, Path], mmap: bool = True
+    ) -> "TreeEnsembleScorer":
+        """
+        Loads a scorer written by `save`.
+
+        :param directory: Directory written by `save`.
+        :param mmap: Whether to memory-map the node arrays. Default is True.
+        :return: The scorer.
+        :raises ValueError: If the directory holds a different artifact format.
+        """
+        manifest = load_manifest(directory)
+        if manifest.get("format") != ARTIFACT_FORMAT:
+            raise ValueError("{} is not a tree-ensemble artifact".format(directory))
+
+        return cls(
+            nodes={
+                name: load_array(directory, name, mmap=mmap) for name in NODE_ARRAYS
+            },
+            roots=load_array(directory, "roots", mmap=False),
+            aggregation=manifest["aggregation"],
+            n_features=manifest["n_features"],
+            max_depth=manifest["max_depth"],
+            strict=manifest["strict"],
+            base_score=manifest["base_score"],
+            feature_names=manifest["feature_names"],
+            classes=manifest["classes"],
+        )
+
+
+def concatenate_trees(trees: List[Dict[str, np.ndarray]]) -> tuple:
+    """
+    Flattens per-tree node arrays with tree-local child indexes into one
+    ensemble.
+
+    :param trees: One dictionary per tree with the keys of NODE_ARRAYS; leaves
+        have feature -1 and child -1.
+    :return: The flat node arrays, the root of every tree and the largest
+        tree depth.
+    """
+    offsets = np.cumsum([0] + [len(tree["feature"]) for tree in trees])
+    nodes = {}
+    for name, dtype in NODE_ARRAYS.items():
+        parts = []
+        for offset, tree in zip(offsets, trees):
+            part = np.asarray(tree[name])
+            if name in ("left", "right"):
+                # Leaves point to themselves, which keeps the walk in place
+                part = np.where(part >= 0, part + offset, np.arange(len(part)) + offset)
+            parts.append(part)
+        nodes[name] = np.ascontiguousarray(np.concatenate(parts), dtype=dtype)
+
+    max_depth = 0
+    for tree in trees:
+        left, right = np.asarray(tree["left"]), np.asarray(tree["right"])
+        level, frontier = 0, np.array([0])
+        while True:
+            frontier = np.concatenate([left[frontier], right[frontier]])
+            frontier = frontier[frontier >= 0]
+            if not len(frontier):
+                break
+            level += 1
+        max_depth = max(max_depth, level)
+    return nodes, offsets[:-1].astype(np.int32), max_depth
@@ -1,7 +1,29 @@
-from typing import Any, Dict, Tuple
+import json
+from typing import Any, Callable, Dict, Optional, Tuple
 import xgboost as xgb
 import pandas as pd
 import numpy as np
+from ml_models.tree_scorer import TreeEnsembleScorer, concatenate_trees
+from utils.prediction import labels_from_proba, thresholded_accuracy
+
+
+class RoundProgress(xgb.callback.TrainingCallback):
+    """XGBoost callback passing the evaluation metric of every round on."""
+
+    def __init__(self, progress_callback: Callable[[int, float], None], metric: str):
+        """
+        :param progress_callback: Function called with the round number and
+            the metric on the first evaluation set.
+        :param metric: Name of the metric in the evaluation log.
+        """
+        super().__init__()
+        self.progress_callback = progress_callback
+        self.metric = metric
+
+    def after_iteration(self, model: Any, epoch: int, evals_log: Dict) -> bool:
+        history = next(iter(evals_log.values()))[self.metric]
+        self.progress_callback(epoch, float(history[-1]))
+        return False
 
 
 def train_xgboost_model(
@@ -28,6 +50,10 @@ def train_xgboost_model(
     gamma: float = 0,
     max_delta_step: float = 0,
     missing: Any = np.nan,
+    threshold: float = 0.5,
+    compute_training_accuracy: bool = True,
+    y_test: Any = None,
+    progress_callback: Optional[Callable[[int, float], None]] = None,
     **kwargs: Dict[str, Any]
 ) -> Tuple[xgb.XGBClassifier, Dict[str, Any]]:
     """
@@ -65,6 +91,15 @@ def train_xgboost_model(
     :param max_delta_step: Maximum delta step allowed for each tree's weight estimation.
         Default is 0.
     :param missing: Missing values are treated as np.nan by default. Default is np.nan.
+    :param threshold: Probability above which a test sample is labelled positive.
+        Default is 0.5.
+    :param compute_training_accuracy: Whether to score the training set, which
+        costs an extra inference pass over it. Default is True.
+    :param y_test: Test labels, needed for `progress_callback`. Default is None.
+    :param progress_callback: Function called after every boosting round with
+        the round number and the ROC-AUC on (X_test, y_test) (or the last
+        `eval_metric`), e.g. to report to an Optuna trial. Exceptions it raises
+        stop the training. Default is None.
     :param kwargs: Additional arguments to pass to XGBClassifier.
     :return: A tuple containing the trained XGBClassifier model, a dictionary with
         predictions, probabilities, model summary, training accuracy,
@@ -95,14 +130,35 @@ def train_xgboost_model(
         **kwargs
     )
 
-    xgb_model.fit(X_train, y_train)
+    if progress_callback is None:
+        xgb_model.fit(X_train, y_train)
+    else:
+        if y_test is None:
+            raise ValueError("progress_callback needs y_test")
+        metric = xgb_model.get_params().get("eval_metric") or "auc"
+        metric = metric if isinstance(metric, str) else metric[-1]
+        callbacks = xgb_model.get_params().get("callbacks")
+        xgb_model.set_params(
+            eval_metric=metric,
+            callbacks=list(callbacks or [])
+            + [RoundProgress(progress_callback, metric)],
+        )
+        try:
+            xgb_model.fit(X_train, y_train, eval_set=[(X_test, y_test)], verbose=False)
+        finally:
+            # Do not keep the progress function alive with the model
+            xgb_model.set_params(callbacks=callbacks)
 
-    # Predict probabilities and binary outcomes on the test set
+    # Predict probabilities once and derive binary outcomes from them
     y_pred_prob = xgb_model.predict_proba(X_test)[:, 1]
-    y_pred = xgb_model.predict(X_test)
+    y_pred = labels_from_proba(y_pred_prob, threshold, xgb_model.classes_)
 
     # Get training accuracy
-    training_accuracy = xgb_model.score(X_train, y_train)
+    training_accuracy = (
+        thresholded_accuracy(xgb_model, X_train, y_train, threshold, xgb_model.classes_)
+        if compute_training_accuracy
+        else None
+    )
 
     # Get feature importance
     feature_importance = xgb_model.feature_importances_
@@ -140,3 +196,66 @@ def train_xgboost_model(
     }
 
     return xgb_model, results
+
+
+def compile_xgboost_model(model: xgb.XGBClassifier) -> TreeEnsembleScorer:
+    """
+    Compiles a trained binary XGBClassifier into a flat-array tree-ensemble
+    scorer.
+
+    The trees are read from the booster's JSON model. Like `predict_proba`,
+    only the trees up to the best iteration are kept when the model was
+    trained with early stopping.
+
+    :param model: Trained XGBClassifier with a 'binary:logistic' objective
+        and a 'gbtree' booster.
+    :return: The compiled scorer.
+    :raises ValueError: For other objectives, boosters or categorical splits.
+    """
+    booster = model.get_booster()
+    learner = json.loads(booster.save_raw("json"))["learner"]
+    if learner["objective"]["name"] != "binary:logistic":
+        raise ValueError("only 'binary:logistic' models are supported")
+    if learner["gradient_booster"]["name"] != "gbtree":
+        raise ValueError("only the 'gbtree' booster is supported")
+
+    n_trees = None
+    try:
+        n_parallel = int(model.get_xgb_params().get("num_parallel_tree") or 1)
+        n_trees = (model.best_iteration + 1) * n_parallel
+    except AttributeError:
+        pass
+
+    trees = []
+    for tree in learner["gradient_booster"]["model"]["trees"][:n_trees]:
+        if any(tree["split_type"]):
+            raise ValueError("categorical splits are not supported")
+        left = np.asarray(tree["left_children"])
+        leaf = left < 0
+        conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+        trees.append(
+            {
+                "feature": np.where(leaf, -1, tree["split_indices"]),
+                "threshold": np.where(leaf, 0.0, conditions),
+                "left": left,
+                "right": np.asarray(tree["right_children"]),
+                "default_left": np.asarray(tree["default_left"], dtype=bool),
+                # Leaves keep their weight in the split condition
+                "value": np.where(leaf, conditions, 0.0),
+            }
+        )
+
+    nodes, roots, max_depth = concatenate_trees(trees)
+    base_score = float(learner["learner_model_param"]["base_score"])
+    feature_names = getattr(model, "feature_names_in_", None)
+    return TreeEnsembleScorer(
+        nodes,
+        roots,
+        aggregation="logit_sum",
+        n_features=int(learner["learner_model_param"]["num_feature"]),
+        max_depth=max_depth,
+        strict=True,
+        base_score=float(np.log(base_score) - np.log1p(-base_score)),
+        feature_names=None if feature_names is None else list(feature_names),
+        classes=list(model.classes_),
+    )
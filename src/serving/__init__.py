@@ -0,0 +1 @@
+"This Module is for Serving Trained Models"
@@ -0,0 +1,191 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+
+
+class LatencyStats:
+    """
+    Thread-safe request counters of a scoring endpoint.
+
+    Latencies are kept for the most recent `window` requests only, so the
+    percentiles follow the current load and the memory stays bounded.
+    """
+
+    def __init__(self, window: int = 10000):
+        """
+        :param window: Number of recent latencies the percentiles are computed
+            from. Default is 10000.
+        """
+        self._lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=window)
+        self.started = time.monotonic()
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+
+    def record(self, latencies: Sequence[float], failed: bool = False) -> None:
+        """
+        Records one scored micro-batch.
+
+        :param latencies: Seconds from submission to result of every request.
+        :param failed: Whether scoring the batch raised. Default is False.
+        """
+        with self._lock:
+            self.requests += len(latencies)
+            self.batches += 1
+            if failed:
+                self.errors += len(latencies)
+            self._latencies.extend(latencies)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Summarizes the counters.
+
+        :return: A dictionary with the 'requests', 'batches' and 'errors'
+            counts, the 'mean_batch_size', the 'throughput' in requests per
+            second since start and the 'p50_ms' and 'p99_ms' latencies (None
+            before the first request).
+        """
+        with self._lock:
+            latencies = np.array(self._latencies)
+            requests, batches, errors = self.requests, self.batches, self.errors
+        uptime = max(time.monotonic() - self.started, 1e-9)
+        p50, p99 = (
+            np.percentile(latencies, [50, 99]) * 1000 if len(latencies) else (None,) * 2
+        )
+        return {
+            "requests": requests,
+            "batches": batches,
+            "errors": errors,
+            "mean_batch_size": requests / batches if batches else None,
+            "throughput": requests / uptime,
+            "p50_ms": None if p50 is None else float(p50),
+            "p99_ms": None if p99 is None else float(p99),
+        }
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item requests into small batches.
+
+    A background thread waits for the first pending item, then keeps
+    collecting items until `max_batch_size` are pending or `max_latency_ms`
+    have passed since the first one arrived, and hands them to `handler` in
+    one call. Callers get a Future per item, so one vectorized model call
+    serves many concurrent requests at the cost of at most the latency window.
+    If a batch fails, its items are retried one by one so that only the
+    invalid ones fail.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 64,
+        max_latency_ms: float = 5.0,
+        stats: Optional[LatencyStats] = None,
+    ):
+        """
+        :param handler: Function scoring a list of items and returning one
+            result per item, in order.
+        :param max_batch_size: Largest number of items per call. Default is 64.
+        :param max_latency_ms: Longest time the first item of a batch waits for
+            others, in milliseconds. Default is 5.0.
+        :param stats: Counters to record the batches in. Default is None (new
+            counters).
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_latency = max(0.0, max_latency_ms) / 1000
+        self.stats = stats or LatencyStats()
+        self._pending: deque = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """
+        Queues one item for the next batch.
+
+        :param item: Input of `handler`.
+        :return: A Future resolving to the item's result, or to the exception
+            raised while scoring its batch.
+        :raises RuntimeError: If the batcher is closed.
+        """
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("the batcher is closed")
+            self._pending.append((item, future, time.perf_counter()))
+            self._condition.notify()
+        return future
+
+    def _next_batch(self) -> List[tuple]:
+        """Waits for the first item, then fills the batch until the deadline."""
+        with self._condition:
+            while not self._pending and not self._closed:
+                self._condition.wait()
+            if not self._pending:
+                return []
+            deadline = self._pending[0][2] + self.max_latency
+            while len(self._pending) < self.max_batch_size and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            size = min(len(self._pending), self.max_batch_size)
+            return [self._pending.popleft() for _ in range(size)]
+
+    def _handle(self, items: List[Any]) -> List[Any]:
+        results = list(self.handler(items))
+        if len(results) != len(items):
+            raise ValueError(
+                "handler returned {} results for {} items".format(
+                    len(results), len(items)
+                )
+            )
+        return results
+
+    def _complete(self, batch: List[tuple]) -> None:
+        """Scores one batch and resolves the futures of its items."""
+        try:
+            results = self._handle([item for item, _, _ in batch])
+        except Exception as error:
+            if len(batch) > 1:
+                # Score the items one by one so that a single invalid item
+                # only fails its own request
+                for entry in batch:
+                    self._complete([entry])
+                return
+            finished = time.perf_counter()
+            batch[0][1].set_exception(error)
+            self.stats.record([finished - batch[0][2]], failed=True)
+            return
+        finished = time.perf_counter()
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+        self.stats.record([finished - submitted for _, _, submitted in batch])
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            self._complete(batch)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Stops accepting items, scores the pending ones and stops the thread.
+
+        :param timeout: Seconds to wait for the thread. Default is None
+            (until it stops).
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
@@ -0,0 +1,527 @@
+import argparse
+import json
+import os
+import socketserver
+import stat
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from gams.ebm_scorer import EBMLookupScorer
+from gams.explanations import explain_ebm_batch, explain_logistic_gam_batch
+from gams.gam_scorer import GAMSplineScorer
+from ml_models.artifacts import compile_model, load_metadata, load_model
+from serving.batcher import LatencyStats, MicroBatcher
+from utils.prediction import labels_from_proba, positive_class_proba
+
+
+def _jsonable(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _is_socket(path: Union[str, Path]) -> bool:
+    """Tells whether a path exists and is a Unix domain socket."""
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+
+def _term_explainer(scorer: Any) -> Optional[Callable]:
+    """Returns the batch explanation function of a glass-box scorer, if any."""
+    if isinstance(scorer, EBMLookupScorer):
+        return explain_ebm_batch
+    if isinstance(scorer, GAMSplineScorer):
+        return explain_logistic_gam_batch
+    return None
+
+
+class ModelEndpoint:
+    """
+    One loaded model behind a micro-batcher.
+
+    Single-patient payloads are validated in the request thread, queued, and
+    scored together with the other requests that arrive within the latency
+    window, in one `predict_proba` call on the stacked rows.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        scorer: Any,
+        feature_names: Optional[Sequence[str]] = None,
+        threshold: float = 0.5,
+        max_batch_size: int = 64,
+        max_latency_ms: float = 5.0,
+    ):
+        """
+        :param name: Name of the model in the request paths.
+        :param scorer: A scorer loaded with `load_model`, or any binary
+            classifier with `predict_proba`.
+        :param feature_names: Names of the input features, in training order.
+            Default is None (the scorer's names; without names, payloads must
+            list the features in order).
+        :param threshold: Decision threshold of the returned label. Default is
+            0.5.
+        :param max_batch_size: Largest number of requests scored at once.
+            Default is 64.
+        :param max_latency_ms: Longest time a request waits for others, in
+            milliseconds. Default is 5.0.
+        """
+        self.name = name
+        self.scorer = scorer
+        if feature_names is None:
+            feature_names = getattr(scorer, "feature_names", None)
+        self.feature_names = None if feature_names is None else list(feature_names)
+        self.threshold = threshold
+        self._explain = _term_explainer(scorer)
+        self.stats = LatencyStats()
+        self.batcher = MicroBatcher(
+            self._score_batch, max_batch_size, max_latency_ms, self.stats
+        )
+
+    @property
+    def n_features(self) -> Optional[int]:
+        """Number of input features, if known."""
+        if self.feature_names is not None:
+            return len(self.feature_names)
+        return getattr(self.scorer, "n_features", None)
+
+    def parse_features(self, features: Any) -> List[Any]:
+        """
+        Turns the features of one payload into a row in training order.
+
+        :param features: A mapping of feature name to value, or a list of
+            values in training order. None stands for a missing value.
+        :return: The row as a list.
+        :raises ValueError: If features are missing or the row has the wrong
+            length.
+        """
+        if isinstance(features, dict):
+            if self.feature_names is None:
+                raise ValueError(
+                    "model '{}' has no feature names, send the features as a "
+                    "list in training order".format(self.name)
+                )
+            missing = [name for name in self.feature_names if name not in features]
+            if missing:
+                raise ValueError("missing features: {}".format(missing))
+            return [features[name] for name in self.feature_names]
+        if isinstance(features, list):
+            if self.n_features is not None and len(features) != self.n_features:
+                raise ValueError(
+                    "got {} features, expected {}".format(
+                        len(features), self.n_features
+                    )
+                )
+            return features
+        raise ValueError("'features' must be an object or a list")
+
+    def _matrix(self, rows: List[List[Any]]) -> np.ndarray:
+        """Stacks rows as floats, or as objects when they hold categories."""
+        try:
+            return np.array(rows, dtype=np.float64)
+        except (TypeError, ValueError):
+            return np.array(rows, dtype=object)
+
+    def contributions(self, X: Any) -> Tuple[List[str], np.ndarray]:
+        """
+        Computes the term contributions of a glass-box model.
+
+        :param X: Features in training column order.
+        :return: The term names and an (n_samples, n_terms) array of logit
+            contributions.
+        :raises ValueError: For models without additive terms.
+        """
+        if self._explain is None:
+            raise ValueError("model '{}' has no term contributions".format(self.name))
+        frame = self._explain(self.scorer, X, self.feature_names)
+        return [str(column) for column in frame.columns], frame.to_numpy()
+
+    def _score_batch(self, items: List[Tuple[List[Any], int]]) -> List[Dict]:
+        """Scores one micro-batch of (row, number of contributions) items."""
+        X = self._matrix([row for row, _ in items])
+        probabilities = positive_class_proba(self.scorer, X)
+        if not np.isfinite(probabilities).all():
+            raise ValueError(
+                "the model returned a non-finite probability for these features"
+            )
+        labels = labels_from_proba(
+            probabilities, self.threshold, getattr(self.scorer, "classes", None)
+        )
+        results = [
+            {
+                "model": self.name,
+                "probability": float(probability),
+                "label": _jsonable(label),
+            }
+            for probability, label in zip(probabilities, labels)
+        ]
+
+        if any(k > 0 for _, k in items):
+            names, values = self.contributions(X)
+            for result, (_, k), row in zip(results, items, values):
+                if k > 0:
+                    # Largest absolute contributions first
+                    order = np.argsort(-np.abs(row), kind="stable")[:k]
+                    result["contributions"] = [
+                        {"term": names[i], "value": float(row[i])} for i in order
+                    ]
+        return results
+
+    def score(
+        self, features: Any, contributions: int = 0, timeout: Optional[float] = 30.0
+    ) -> Dict[str, Any]:
+        """
+        Scores one patient through the micro-batcher.
+
+        :param features: A mapping of feature name to value, or a list of
+            values in training order.
+        :param contributions: Number of largest term contributions to return.
+            Default is 0.
+        :param timeout: Seconds to wait for the result. Default is 30.0.
+        :return: A dictionary with 'model', 'probability', 'label' and, if
+            requested, the 'contributions' as a list of 'term' and 'value'.
+        :raises ValueError: For invalid features or `contributions`, features
+            the model returns a non-finite probability for, or contributions
+            of a model without additive terms.
+        """
+        if (
+            isinstance(contributions, bool)
+            or not isinstance(contributions, (int, np.integer))
+            or contributions < 0
+        ):
+            raise ValueError("'contributions' must be a non-negative integer")
+        if contributions and self._explain is None:
+            raise ValueError("model '{}' has no term contributions".format(self.name))
+        row = self.parse_features(features)
+        return self.batcher.submit((row, int(contributions))).result(timeout)
+
+    def info(self) -> Dict[str, Any]:
+        """Describes the endpoint for the '/models' route."""
+        return {
+            "name": self.name,
+            "scorer": type(self.scorer).__name__,
+            "feature_names": self.feature_names,
+            "threshold": self.threshold,
+            "max_batch_size": self.batcher.max_batch_size,
+            "max_latency_ms": self.batcher.max_latency * 1000,
+        }
+
+    def close(self) -> None:
+        """Scores the queued requests and stops the batcher."""
+        self.batcher.close()
+
+
+class ScoringService:
+    """
+    The models served by one scoring server, each loaded once.
+    """
+
+    def __init__(
+        self,
+        models: Dict[str, Any],
+        thresholds: Optional[Dict[str, float]] = None,
+        max_batch_size: int = 64,
+        max_latency_ms: float = 5.0,
+        mmap: bool = True,
+    ):
+        """
+        :param models: Mapping of model name to the directory of an artifact
+            written by `ml_models.artifacts.save_model`, a trained model
+            returned by a `train_*` wrapper (compiled to its scorer) or a
+            loaded scorer.
+        :param thresholds: Decision threshold per model name. Default is None
+            (0.5 for every model).
+        :param max_batch_size: Largest number of requests scored at once.
+            Default is 64.
+        :param max_latency_ms: Longest time a request waits for others, in
+            milliseconds. Default is 5.0.
+        :param mmap: Whether to memory-map artifact arrays. Default is True.
+        """
+        thresholds = thresholds or {}
+        self.endpoints: Dict[str, ModelEndpoint] = {}
+        for name, model in models.items():
+            feature_names = None
+            if isinstance(model, (str, Path)):
+                feature_names = load_metadata(model).get("feature_names")
+                scorer = load_model(model, mmap=mmap)
+            else:
+                try:
+                    scorer = compile_model(model)
+                except TypeError:
+                    scorer = model
+            self.endpoints[name] = ModelEndpoint(
+                name,
+                scorer,
+                feature_names,
+                thresholds.get(name, 0.5),
+                max_batch_size,
+                max_latency_ms,
+            )
+
+    def endpoint(self, name: Optional[str]) -> ModelEndpoint:
+        """
+        Looks up a model by name.
+
+        :param name: Name of the model, or None when only one model is served.
+        :return: The model's endpoint.
+        :raises KeyError: If the model is unknown.
+        """
+        if name is None and len(self.endpoints) == 1:
+            return next(iter(self.endpoints.values()))
+        if name not in self.endpoints:
+            raise KeyError("unknown model '{}'".format(name))
+        return self.endpoints[name]
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Collects the counters of every model.
+
+        :return: Per model name, the request, batch and error counts, the mean
+            batch size, the throughput and the p50/p99 latencies.
+        """
+        return {
+            name: endpoint.stats.snapshot() for name, endpoint in self.endpoints.items()
+        }
+
+    def close(self) -> None:
+        """Stops the batchers of all models."""
+        for endpoint in self.endpoints.values():
+            endpoint.close()
+
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON routes of the scoring server:
+
+    - GET /health: liveness and the served model names
+    - GET /models: feature names, threshold and batching of every model
+    - GET /metrics: throughput and p50/p99 latency counters per model
+    - POST /models/<name>/predict (or /predict with a single model): scores a
+      body {"features": {...} or [...], "contributions": k}
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return "unix"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if getattr(self.server, "verbose", False):
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: Dict[str, Any], close: bool = False) -> None:
+        try:
+            payload = json.dumps(body, allow_nan=False).encode("utf-8")
+        except ValueError:
+            # NaN and infinity are not valid JSON
+            status = 500
+            payload = json.dumps({"error": "non-finite value in the response"})
+            payload = payload.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if close:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        service: ScoringService = self.server.service
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "models": list(service.endpoints)})
+        elif self.path == "/models":
+            self._send(
+                200,
+                {
+                    "models": [
+                        endpoint.info() for endpoint in service.endpoints.values()
+                    ]
+                },
+            )
+        elif self.path == "/metrics":
+            self._send(200, {"models": service.metrics()})
+        else:
+            self._send(404, {"error": "unknown route {}".format(self.path)})
+
+    def do_POST(self) -> None:
+        # Read the body first so that the connection can be reused after errors
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            # The body cannot be skipped, so the connection is closed
+            self._send(400, {"error": "invalid Content-Length"}, close=True)
+            return
+        raw_body = self.rfile.read(length)
+        parts = self.path.strip("/").split("/")
+        if parts == ["predict"]:
+            name = None
+        elif len(parts) == 3 and parts[0] == "models" and parts[2] == "predict":
+            name = parts[1]
+        else:
+            self._send(404, {"error": "unknown route {}".format(self.path)})
+            return
+
+        try:
+            endpoint = self.server.service.endpoint(name)
+        except KeyError as error:
+            self._send(404, {"error": error.args[0]})
+            return
+
+        try:
+            body = json.loads(raw_body or b"{}")
+            if not isinstance(body, dict) or "features" not in body:
+                raise ValueError("the body must be an object with 'features'")
+            result = endpoint.score(
+                body["features"],
+                body.get("contributions") or 0,
+                self.server.request_timeout,
+            )
+        except ValueError as error:
+            self._send(400, {"error": str(error)})
+        except FutureTimeoutError:
+            self._send(503, {"error": "scoring timed out"})
+        except Exception as error:
+            self._send(500, {"error": "{}: {}".format(type(error).__name__, error)})
+        else:
+            self._send(200, result)
+
+
+class ScoringHTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP scoring server on a TCP port."""
+
+    daemon_threads = True
+    # Bursts of admissions connect at once; the default backlog is 5
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        service: ScoringService,
+        request_timeout: float = 30.0,
+        verbose: bool = False,
+    ):
+        self.service = service
+        self.request_timeout = request_timeout
+        self.verbose = verbose
+        super().__init__(address, ScoringRequestHandler)
+
+
+class UnixScoringHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded HTTP scoring server on a Unix domain socket."""
+
+    daemon_threads = True
+    # Bursts of admissions connect at once; the default backlog is 5
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        service: ScoringService,
+        request_timeout: float = 30.0,
+        verbose: bool = False,
+    ):
+        self.service = service
+        self.request_timeout = request_timeout
+        self.verbose = verbose
+        # Replace the socket of a stopped server, but never another file
+        if _is_socket(path):
+            os.unlink(path)
+        elif os.path.lexists(path):
+            raise FileExistsError("{} exists and is not a socket".format(path))
+        super().__init__(str(path), ScoringRequestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if _is_socket(self.server_address):
+            os.unlink(self.server_address)
+
+
+def make_server(
+    service: ScoringService,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    unix_socket: Optional[Union[str, Path]] = None,
+    request_timeout: float = 30.0,
+    verbose: bool = False,
+) -> socketserver.BaseServer:
+    """
+    Binds a scoring server; call `serve_forever` on it to start serving.
+
+    :param service: The models to serve.
+    :param host: Interface of the TCP server. Default is '127.0.0.1'.
+    :param port: TCP port; 0 picks a free one. Default is 8000.
+    :param unix_socket: Path of a Unix domain socket to listen on instead of
+        a TCP port. A socket left there by a stopped server is replaced.
+        Default is None.
+    :param request_timeout: Seconds a request waits for its score. Default is
+        30.0.
+    :param verbose: Whether to log every request. Default is False.
+    :return: The bound server.
+    :raises FileExistsError: If `unix_socket` exists and is not a socket.
+    """
+    if unix_socket is not None:
+        return UnixScoringHTTPServer(unix_socket, service, request_timeout, verbose)
+    return ScoringHTTPServer((host, port), service, request_timeout, verbose)
+
+
+def _name_value(option: str) -> Tuple[str, str]:
+    name, separator, value = option.partition("=")
+    if not separator or not name or not value:
+        raise argparse.ArgumentTypeError("expected NAME=VALUE, got '{}'".format(option))
+    return name, value
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command line entry point of the scoring server."""
+    parser = argparse.ArgumentParser(
+        description="Serve saved mortality models over HTTP with micro-batching."
+    )
+    parser.add_argument(
+        "--model",
+        type=_name_value,
+        action="append",
+        required=True,
+        help="NAME=ARTIFACT_DIR of a model written by save_model; repeatable",
+    )
+    parser.add_argument(
+        "--threshold", type=_name_value, action="append", default=[], help="NAME=P"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--unix-socket", default=None, help="listen on this socket")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-latency-ms", type=float, default=5.0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    service = ScoringService(
+        dict(args.model),
+        {name: float(value) for name, value in args.threshold},
+        args.max_batch_size,
+        args.max_latency_ms,
+    )
+    server = make_server(
+        service, args.host, args.port, args.unix_socket, verbose=args.verbose
+    )
+    print(
+        "Serving {} on {}".format(", ".join(service.endpoints), server.server_address)
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"This Module is for Hyperparameter Tuning"
@@ -0,0 +1,77 @@
+from typing import Optional, Tuple
+import pandas as pd
+from sklearn.utils import resample
+from data_pipeline.cache import QueryCache
+from data_pipeline.extractor import execute_query
+
+SCORES = ("sapsii", "apsiii")
+
+COHORT_QUERY = """
+SELECT s.*, a.hospital_expire_flag as mortality
+FROM {score} s
+LEFT JOIN admissions a
+ON s.subject_id = a.subject_id
+AND s.hadm_id = a.hadm_id;
+"""
+
+TARGET = "mortality"
+
+
+def balance_cohort(df: pd.DataFrame, random_state: int = 42) -> pd.DataFrame:
+    """
+    Balances a cohort like the '*_Balanced_Data' notebooks: the minority class
+    is oversampled to twice its size and the majority class is downsampled to
+    the same size.
+
+    :param df: Cohort with a binary 'mortality' column.
+    :param random_state: Seed of both resamplings. Default is 42.
+    :return: The balanced cohort, majority rows first.
+    """
+    minority = df[df[TARGET] == 1]
+    majority = df[df[TARGET] == 0]
+    minority = resample(
+        minority, replace=True, n_samples=2 * len(minority), random_state=random_state
+    )
+    majority = resample(
+        majority, replace=False, n_samples=len(minority), random_state=random_state
+    )
+    return pd.concat([majority, minority])
+
+
+def prepare_cohort(
+    df: pd.DataFrame, score: str, balanced: bool = False
+) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Turns the result of COHORT_QUERY into the features and labels used by the
+    tuning notebooks: identifiers and the score itself are dropped and missing
+    values are replaced by 0.
+
+    :param df: Result of COHORT_QUERY.
+    :param score: 'sapsii' or 'apsiii'.
+    :param balanced: Whether to balance the cohort. Default is False.
+    :return: A tuple of the features and the mortality labels.
+    """
+    df = df.drop(
+        columns=["subject_id", "hadm_id", "icustay_id", score, score + "_prob"]
+    ).fillna(0)
+    if balanced:
+        df = balance_cohort(df)
+    return df.drop(columns=[TARGET]), df[TARGET]
+
+
+def load_cohort(
+    score: str, balanced: bool = False, cache: Optional[QueryCache] = None
+) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Queries the tuning cohort of a severity score from the MIMIC-III database.
+
+    :param score: 'sapsii' or 'apsiii'.
+    :param balanced: Whether to balance the cohort. Default is False.
+    :param cache: Optional on-disk result cache. Default is None.
+    :return: A tuple of the features and the mortality labels.
+    :raises ValueError: For an unknown score.
+    """
+    if score not in SCORES:
+        raise ValueError("score must be one of {}".format(SCORES))
+    df = execute_query(COHORT_QUERY.format(score=score), cache=cache)
+    return prepare_cohort(df, score, balanced)
@@ -0,0 +1,208 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.preprocessing import StandardScaler
+from utils.shared_data import SharedDataset
+
+FOLD_ARRAYS = ("X_train", "y_train", "X_valid", "y_valid")
+
+
+def _read_only(array: Any, dtype: Optional[Any] = None) -> np.ndarray:
+    array = np.ascontiguousarray(array, dtype=dtype)
+    array.flags.writeable = False
+    return array
+
+
+def split_folds(
+    X: Any,
+    y: Any,
+    n_splits: int = 1,
+    test_size: float = 0.2,
+    scale: bool = True,
+    random_state: int = 42,
+) -> List[Dict[str, np.ndarray]]:
+    """
+    Splits a cohort into stratified train/validation folds and scales them.
+
+    With `n_splits=1` this is the single stratified hold-out split of the
+    tuning notebooks, i.e. `train_test_split(X, y, test_size=0.2,
+    random_state=42, stratify=y)` followed by a StandardScaler fitted on the
+    training part.
+
+    :param X: Features.
+    :param y: Binary labels.
+    :param n_splits: Number of folds. Default is 1 (one hold-out split).
+        Larger values use a shuffled StratifiedKFold.
+    :param test_size: Validation fraction of the hold-out split. Default is 0.2.
+    :param scale: Whether to standardize every fold with a scaler fitted on
+        its training part. Default is True.
+    :param random_state: Seed of the split. Default is 42.
+    :return: One dictionary per fold with read-only 'X_train', 'y_train',
+        'X_valid' and 'y_valid' arrays.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y).ravel()
+
+    if n_splits == 1:
+        splits = [
+            train_test_split(
+                np.arange(len(y)),
+                test_size=test_size,
+                random_state=random_state,
+                stratify=y,
+            )
+        ]
+    else:
+        splitter = StratifiedKFold(n_splits, shuffle=True, random_state=random_state)
+        splits = list(splitter.split(X, y))
+
+    folds = []
+    for train_index, valid_index in splits:
+        X_train, X_valid = X[train_index], X[valid_index]
+        if scale:
+            scaler = StandardScaler()
+            X_train = scaler.fit_transform(X_train)
+            X_valid = scaler.transform(X_valid)
+        folds.append(
+            {
+                "X_train": _read_only(X_train),
+                "y_train": _read_only(y[train_index]),
+                "X_valid": _read_only(X_valid),
+                "y_valid": _read_only(y[valid_index]),
+            }
+        )
+    return folds
+
+
+def subsample_indices(y: Any, fraction: float, random_state: int = 42) -> np.ndarray:
+    """
+    Draws a stratified subsample of a training fold.
+
+    :param y: Binary labels of the fold.
+    :param fraction: Fraction of the samples to keep.
+    :param random_state: Seed of the subsample. Default is 42.
+    :return: Sorted indices of the subsample, at least two per class.
+    """
+    y = np.asarray(y).ravel()
+    n_classes = len(np.unique(y))
+    n_samples = max(int(round(fraction * len(y))), 2 * n_classes)
+    if n_samples >= len(y):
+        return np.arange(len(y))
+    index, _ = train_test_split(
+        np.arange(len(y)),
+        train_size=n_samples,
+        random_state=random_state,
+        stratify=y,
+    )
+    return np.sort(index)
+
+
+class TuningData:
+    """
+    Train/validation folds of one study, split and scaled once and shared
+    read-only by all of its trials.
+
+    The notebooks re-split and re-scale the cohort inside every objective call
+    although the result never changes. A TuningData is prepared once per study
+    and every trial reads views of the same arrays. After `share`, the arrays
+    live in shared memory and pickling the object only sends a handle, so
+    parallel trial workers attach the same physical copy.
+    """
+
+    def __init__(
+        self,
+        arrays: Any,
+        n_folds: int,
+        feature_names: Optional[List[str]] = None,
+    ):
+        """
+        Use `prepare` instead of calling this directly.
+
+        :param arrays: Mapping or SharedDataset of the fold arrays, named
+            like 'X_train_0'.
+        :param n_folds: Number of folds.
+        :param feature_names: Names of the feature columns. Default is None.
+        """
+        self._arrays = arrays
+        self.n_folds = n_folds
+        self.feature_names = feature_names
+
+    @classmethod
+    def prepare(
+        cls,
+        X: Any,
+        y: Any,
+        n_splits: int = 1,
+        test_size: float = 0.2,
+        scale: bool = True,
+        random_state: int = 42,
+    ) -> "TuningData":
+        """
+        Splits and scales the cohort once, see `split_folds`.
+
+        :param X: Features.
+        :param y: Binary labels.
+        :param n_splits: Number of folds. Default is 1 (one hold-out split).
+        :param test_size: Validation fraction of the hold-out split.
+            Default is 0.2.
+        :param scale: Whether to standardize the folds. Default is True.
+        :param random_state: Seed of the split. Default is 42.
+        :return: The prepared folds.
+        """
+        folds = split_folds(X, y, n_splits, test_size, scale, random_state)
+        arrays = {
+            "{}_{}".format(name, i): fold[name]
+            for i, fold in enumerate(folds)
+            for name in FOLD_ARRAYS
+        }
+        columns = getattr(X, "columns", None)
+        feature_names = None if columns is None else [str(c) for c in columns]
+        return cls(arrays, len(folds), feature_names)
+
+    def _get(self, name: str) -> np.ndarray:
+        if isinstance(self._arrays, SharedDataset):
+            return self._arrays.array(name)
+        return self._arrays[name]
+
+    def fold(self, i: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns read-only views of one fold.
+
+        :param i: Index of the fold.
+        :return: A tuple of X_train, y_train, X_valid and y_valid.
+        """
+        if not 0 <= i < self.n_folds:
+            raise IndexError("fold {} out of range".format(i))
+        return tuple(self._get("{}_{}".format(name, i)) for name in FOLD_ARRAYS)
+
+    def __len__(self) -> int:
+        return self.n_folds
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, ...]]:
+        return (self.fold(i) for i in range(self.n_folds))
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the fold arrays in bytes."""
+        if isinstance(self._arrays, SharedDataset):
+            return self._arrays.nbytes
+        return sum(array.nbytes for array in self._arrays.values())
+
+    def share(self, backend: str = "shm") -> "TuningData":
+        """
+        Moves the folds into shared memory for parallel trial workers.
+
+        :param backend: 'shm' or 'memmap', see `SharedDataset.create`.
+            Default is 'shm'.
+        :return: A TuningData backed by shared memory. Call `unlink` on it when
+            the study is done.
+        """
+        if isinstance(self._arrays, SharedDataset):
+            return self
+        shared = SharedDataset.create(self._arrays, backend=backend)
+        return TuningData(shared, self.n_folds, self.feature_names)
+
+    def unlink(self) -> None:
+        """Frees the shared memory of a shared TuningData."""
+        if isinstance(self._arrays, SharedDataset):
+            self._arrays.unlink()
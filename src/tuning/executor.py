@@ -0,0 +1,385 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+import optuna
+import pandas as pd
+from optuna.storages import BaseStorage, JournalStorage
+from optuna.storages.journal import JournalFileBackend
+from optuna.study import MaxTrialsCallback
+from optuna.trial import TrialState
+from threadpoolctl import threadpool_limits
+from ml_models.benchmark import THREAD_PARAMS, plan_threads
+from tuning.cohorts import TARGET, load_cohort
+from tuning.data import TuningData
+from tuning.objectives import (
+    DEFAULT_FIDELITIES,
+    DEFAULT_PARAMS,
+    MAX_RESOURCE,
+    fidelity_step,
+    make_objective,
+)
+from tuning.registry import TUNING_DIR, ConfigRegistry, cohort_key, dataset_fingerprint
+from tuning.warm_start import (
+    NOTEBOOK_STORAGE,
+    prior_configs,
+    registry_configs,
+    warm_start,
+)
+
+# Journal file shared by concurrent workers; SQLite locks up under them
+DEFAULT_STORAGE = TUNING_DIR / "optuna_journal.log"
+
+# Study name label of every model family, as used in the notebooks
+MODEL_LABELS = {
+    "logistic_gam": "LogisticGam",
+    "ebm": "EBM",
+    "random_forest": "Random_Forest",
+    "xgboost": "XGBoost",
+}
+
+# Cohorts of the four notebooks, in the order of their case numbers
+CASES = [("sapsii", False), ("sapsii", True), ("apsiii", False), ("apsiii", True)]
+
+
+def _study_specs() -> Dict[str, Dict[str, Any]]:
+    specs = {}
+    for i, (score, balanced) in enumerate(CASES):
+        for j, (model, label) in enumerate(MODEL_LABELS.items()):
+            name = "Case {}: {}_{}{}".format(
+                4 * i + j + 1,
+                label,
+                score.upper(),
+                "_Balanced_Data" if balanced else "",
+            )
+            specs[name] = {"model": model, "score": score, "balanced": balanced}
+    return specs
+
+
+# Study name -> model family, severity score and cohort balancing
+STUDIES = _study_specs()
+
+
+def related_studies(study_name: str) -> List[str]:
+    """
+    Lists the studies of the same model family, most closely related first:
+    the same study, the other balancing of the same score, the same balancing
+    of the other score, then the rest.
+
+    :param study_name: Name of one of STUDIES.
+    :return: Names of studies in STUDIES, including `study_name`.
+    """
+    spec = STUDIES[study_name]
+    return sorted(
+        (name for name, other in STUDIES.items() if other["model"] == spec["model"]),
+        key=lambda name: (
+            STUDIES[name]["score"] != spec["score"],
+            STUDIES[name]["balanced"] != spec["balanced"],
+        ),
+    )
+
+
+def open_storage(storage: Union[str, Path, BaseStorage, None] = None) -> Any:
+    """
+    Opens an Optuna storage that tolerates concurrent writers.
+
+    :param storage: A storage object, a database URL such as
+        'postgresql://...', or the path of a journal file. Default is None
+        (DEFAULT_STORAGE).
+    :return: The storage, or the URL for Optuna to open.
+    """
+    if storage is None:
+        storage = DEFAULT_STORAGE
+    if isinstance(storage, BaseStorage) or "://" in str(storage):
+        return storage
+    Path(storage).parent.mkdir(parents=True, exist_ok=True)
+    return JournalStorage(JournalFileBackend(str(storage)))
+
+
+def retry_interrupted_trials(study: optuna.Study) -> int:
+    """
+    Marks trials left running by an interrupted run as failed and enqueues
+    their parameters again.
+
+    Only call this while no other process works on the study.
+
+    :param study: The study.
+    :return: The number of requeued trials.
+    """
+    stale = study.get_trials(deepcopy=False, states=(TrialState.RUNNING,))
+    for trial in stale:
+        study.tell(trial.number, state=TrialState.FAIL)
+        study.enqueue_trial(trial.params, user_attrs={"retry_of": trial.number})
+    return len(stale)
+
+
+def _optimize(
+    study_name: str,
+    storage: Any,
+    model: str,
+    data: TuningData,
+    n_trials: int,
+    threads: int,
+    seed: Optional[int],
+    fidelities: Optional[Sequence[float]] = None,
+) -> int:
+    """Runs trials in one worker until the study has `n_trials` finished ones."""
+    fixed_params = {}
+    if THREAD_PARAMS.get(model):
+        fixed_params[THREAD_PARAMS[model]] = threads
+
+    if fidelities:
+        pruner = optuna.pruners.HyperbandPruner(
+            min_resource=fidelity_step(min(fidelities)),
+            max_resource=MAX_RESOURCE,
+            reduction_factor=3,
+        )
+    else:
+        pruner = optuna.pruners.MedianPruner(n_warmup_steps=5)
+    study = optuna.load_study(
+        study_name=study_name,
+        storage=open_storage(storage),
+        sampler=optuna.samplers.TPESampler(seed=seed),
+        pruner=pruner,
+    )
+    finished = (TrialState.COMPLETE, TrialState.PRUNED)
+    n_before = len(study.get_trials(deepcopy=False))
+    if len(study.get_trials(deepcopy=False, states=finished)) < n_trials:
+        with threadpool_limits(limits=threads):
+            study.optimize(
+                make_objective(
+                    model, data, fixed_params=fixed_params, fidelities=fidelities
+                ),
+                callbacks=[MaxTrialsCallback(n_trials, states=finished)],
+            )
+    return len(study.get_trials(deepcopy=False)) - n_before
+
+
+def run_study(
+    study_name: str,
+    X: Any,
+    y: Any,
+    n_trials: int = 100,
+    n_workers: int = 1,
+    storage: Union[str, Path, BaseStorage, None] = None,
+    model: Optional[str] = None,
+    threads_per_trial: Optional[int] = None,
+    seed: Optional[int] = None,
+    registry: Optional[ConfigRegistry] = None,
+    cohort: Optional[str] = None,
+    fidelities: Optional[Sequence[float]] = None,
+    warm_start_trials: int = 0,
+    warm_start_storage: Any = NOTEBOOK_STORAGE,
+    retry_interrupted: bool = False,
+    publish: bool = True,
+) -> optuna.Study:
+    """
+    Runs an Optuna study across several worker processes, resuming it if it
+    already exists in the storage.
+
+    The folds are split and scaled once and shared with the workers through
+    shared memory. Every worker runs trials until the study holds `n_trials`
+    complete or pruned trials in total, so an interrupted run is continued
+    by running it again. Every trial is limited to its share of the cores.
+
+    :param study_name: Name of the study, e.g. 'Case 2: EBM_SAPSII'.
+    :param X: Features.
+    :param y: Binary labels.
+    :param n_trials: Number of finished trials the study should reach. Workers
+        still busy when it is reached finish their trial. Default is 100.
+    :param n_workers: Number of worker processes. Default is 1 (in-process).
+    :param storage: See `open_storage`. With several workers, pass a path or
+        URL rather than a storage object. Default is None (DEFAULT_STORAGE).
+    :param model: Model family. Default is None (derived from the name, see
+        STUDIES).
+    :param threads_per_trial: Threads of every trial. Default is None (the
+        cores divided by the workers).
+    :param seed: Seed of the sampler; worker i uses seed + i. Default is None.
+    :param registry: Registry of the best configs, read by the warm start
+        and published to. Default is None (neither).
+    :param cohort: Cohort key of the registry entry. Default is None (derived
+        from the name, see STUDIES).
+    :param fidelities: Training fractions evaluated before the full fidelity,
+        e.g. DEFAULT_FIDELITIES. Trials are then pruned by a HyperbandPruner
+        at these fidelities instead of a MedianPruner during training, see
+        `make_objective`. Default is None.
+    :param warm_start_trials: Number of configs enqueued after the default
+        trial when the study is new. They are taken from the best trials of
+        the related studies in `warm_start_storage`, see `related_studies`,
+        preceded by their configs in the registry, if any. Default is 0.
+    :param warm_start_storage: Storage of the earlier studies. Default is
+        NOTEBOOK_STORAGE, the notebooks' database.
+    :param retry_interrupted: Whether trials left running are failed and
+        requeued first, see `retry_interrupted_trials`. Only set it when no
+        other process or host works on the study, or their running trials
+        are failed as well. Default is False.
+    :param publish: Whether the best trial is published to `registry` if it
+        beats the registered config, see `ConfigRegistry.publish`. Default is
+        True.
+    :return: The study.
+    :raises KeyError: If the model family or, when publishing, the cohort
+        cannot be derived from the name.
+    """
+    if model is None:
+        if study_name not in STUDIES:
+            raise KeyError(
+                "unknown study '{}', pass the model family".format(study_name)
+            )
+        model = STUDIES[study_name]["model"]
+    publish = publish and registry is not None
+    if cohort is None and publish:
+        if study_name not in STUDIES:
+            raise KeyError("unknown study '{}', pass the cohort".format(study_name))
+        spec = STUDIES[study_name]
+        cohort = cohort_key(spec["score"], spec["balanced"])
+
+    # Workers reopen the storage from its path or URL
+    storage_spec, storage = storage, open_storage(storage)
+    study = optuna.create_study(
+        study_name=study_name,
+        storage=storage,
+        direction="maximize",
+        load_if_exists=True,
+    )
+    if not study.get_trials(deepcopy=False):
+        study.enqueue_trial(DEFAULT_PARAMS[model])
+        if warm_start_trials and study_name in STUDIES:
+            related = related_studies(study_name)
+            if warm_start_storage is storage or str(warm_start_storage) == str(
+                storage_spec
+            ):
+                related.remove(study_name)
+            configs = prior_configs(warm_start_storage, related, warm_start_trials)
+            if registry is not None:
+                cohorts = [
+                    cohort_key(STUDIES[name]["score"], STUDIES[name]["balanced"])
+                    for name in related_studies(study_name)
+                ]
+                configs = registry_configs(registry, model, cohorts) + configs
+            warm_start(study, configs, warm_start_trials)
+    if retry_interrupted:
+        retry_interrupted_trials(study)
+
+    workers, threads = plan_threads(n_workers, n_workers)
+    threads = threads_per_trial or threads
+    seeds = [None if seed is None else seed + i for i in range(workers)]
+    data = TuningData.prepare(X, y)
+
+    if workers == 1:
+        _optimize(
+            study_name, storage, model, data, n_trials, threads, seeds[0], fidelities
+        )
+    else:
+        shared = data.share()
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(
+                        _optimize,
+                        study_name,
+                        storage_spec,
+                        model,
+                        shared,
+                        n_trials,
+                        threads,
+                        worker_seed,
+                        fidelities,
+                    )
+                    for worker_seed in seeds
+                ]
+                for future in futures:
+                    future.result()
+        finally:
+            shared.unlink()
+
+    study = optuna.load_study(study_name=study_name, storage=storage)
+    if publish:
+        registry.publish_study(study, model, cohort, dataset_fingerprint(X, y))
+    return study
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command line entry point of the parallel study executor."""
+    parser = argparse.ArgumentParser(
+        description="Run or resume an Optuna study of the tuning notebooks."
+    )
+    parser.add_argument("study", help="study name, e.g. 'Case 2: EBM_SAPSII'")
+    parser.add_argument("--n-trials", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--storage", default=None, help="journal file or database URL")
+    parser.add_argument(
+        "--data", default=None, help="CSV cohort with a 'mortality' column"
+    )
+    parser.add_argument("--model", default=None, choices=sorted(MODEL_LABELS))
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--multi-fidelity",
+        action="store_true",
+        help="screen trials on subsamples with reduced rounds first (Hyperband)",
+    )
+    parser.add_argument(
+        "--warm-start",
+        type=int,
+        default=0,
+        metavar="K",
+        help="enqueue K configs of related studies and the registry first",
+    )
+    parser.add_argument(
+        "--warm-start-storage",
+        default=NOTEBOOK_STORAGE,
+        help="storage of the earlier studies",
+    )
+    parser.add_argument(
+        "--registry",
+        default=str(TUNING_DIR),
+        help="directory of the best configs, read by --warm-start and --publish",
+    )
+    parser.add_argument(
+        "--cohort", default=None, help="registry cohort, e.g. 'sapsii_balanced_data'"
+    )
+    parser.add_argument(
+        "--publish",
+        action="store_true",
+        help="publish the best trial to the registry if it scores higher",
+    )
+    parser.add_argument(
+        "--retry-interrupted",
+        action="store_true",
+        help="fail and requeue trials left running; only when no other run is active",
+    )
+    args = parser.parse_args(argv)
+
+    if args.data is not None:
+        df = pd.read_csv(args.data)
+        X, y = df.drop(columns=[TARGET]), df[TARGET]
+    else:
+        if args.study not in STUDIES:
+            parser.error("unknown study; pass --data and --model")
+        spec = STUDIES[args.study]
+        X, y = load_cohort(spec["score"], spec["balanced"])
+
+    study = run_study(
+        args.study,
+        X,
+        y,
+        n_trials=args.n_trials,
+        n_workers=args.workers,
+        storage=args.storage,
+        model=args.model,
+        threads_per_trial=args.threads,
+        seed=args.seed,
+        registry=ConfigRegistry(args.registry),
+        cohort=args.cohort,
+        fidelities=DEFAULT_FIDELITIES if args.multi_fidelity else None,
+        warm_start_trials=args.warm_start,
+        warm_start_storage=args.warm_start_storage,
+        retry_interrupted=args.retry_interrupted,
+        publish=args.publish,
+    )
+    print("Best hyperparameters:", study.best_params)
+    print("Best ROC-AUC score:", study.best_value)
+
+
+if __name__ == "__main__":
+    main()
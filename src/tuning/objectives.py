@@ -0,0 +1,431 @@
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+import optuna
+from ml_models.benchmark import get_trainer
+from ml_models.evalauion_results import roc_auc
+from tuning.data import TuningData, subsample_indices
+from utils.prediction import positive_class_proba
+
+# Parameters of every trial that are not tuned, as set in the notebooks
+FIXED_PARAMS = {
+    "logistic_gam": {"verbose": False, "include_summary": False},
+    "ebm": {"random_state": 42},
+    "random_forest": {"random_state": 42, "verbose": False},
+    "xgboost": {
+        "objective": "binary:logistic",
+        "booster": "gbtree",
+        "random_state": 42,
+        "verbosity": 0,
+    },
+}
+
+# First trial enqueued in every study of the notebooks
+DEFAULT_PARAMS = {
+    "logistic_gam": {
+        "terms_option": "auto",
+        "max_iter": 100,
+        "tol": 0.0001,
+        "fit_intercept": True,
+    },
+    "ebm": {
+        "max_bins": 1024,
+        "max_interaction_bins": 32,
+        "interactions": 0.9,
+        "outer_bags": 14,
+        "inner_bags": 0,
+        "learning_rate": 0.01,
+        "min_samples_leaf": 2,
+        "max_leaves": 3,
+        "max_rounds": 25000,
+        "early_stopping_rounds": 50,
+        "smoothing_rounds": 200,
+        "greedy_ratio": 1.5,
+    },
+    "random_forest": {
+        "n_estimators": 100,
+        "criterion": "gini",
+        "max_depth": 10,
+        "min_samples_split": 2,
+        "min_samples_leaf": 1,
+        "min_weight_fraction_leaf": 0.0,
+        "max_features": "sqrt",
+        # The notebooks enqueue 25, which is not one of the sampled choices
+        "max_leaf_nodes": 20,
+        "min_impurity_decrease": 0.0,
+        "bootstrap": True,
+        "oob_score": False,
+        "class_weight": None,
+        "ccp_alpha": 0.0,
+        "max_samples": 0.5,
+    },
+    "xgboost": {
+        "learning_rate": 0.3,
+        "max_depth": 6,
+        "min_child_weight": 1,
+        "subsample": 1,
+        "colsample_bytree": 1,
+        "reg_alpha": 0.0,
+        "reg_lambda": 1.0,
+        "scale_pos_weight": 1.0,
+        "n_estimators": 100,
+        "gamma": 0.0,
+        "max_delta_step": 0.0,
+    },
+}
+
+
+def custom_gam_terms() -> List[Any]:
+    """
+    Returns the predefined LogisticGAM terms of the 'custom' terms option.
+
+    :return: Spline, linear and tensor terms of the first 15 features.
+    """
+    from pygam import l, s, te
+
+    n_splines = [10, 15, 20, 12, 18, 10, 14, 16, 12, 10, 15, 10, 18, 12, 20]
+    return (
+        [s(i, n_splines=n, spline_order=3) for i, n in enumerate(n_splines)]
+        + [l(i) for i in range(15)]
+        + [
+            te(s(0), s(1)),
+            te(s(2), s(3)),
+            te(s(4), s(5)),
+            te(l(6), l(7)),
+            te(l(8), l(9)),
+            te(s(10), l(11)),
+            te(s(12), s(13)),
+            te(l(13), l(14)),
+        ]
+    )
+
+
+def suggest_logistic_gam_params(trial: optuna.Trial) -> Dict[str, Any]:
+    """
+    Samples LogisticGAM hyperparameters from the search space of the notebooks.
+
+    :param trial: The Optuna trial.
+    :return: The sampled parameters, as stored in the study.
+    """
+    params = {
+        "terms_option": trial.suggest_categorical("terms_option", ["auto", "custom"])
+    }
+    if params["terms_option"] == "custom":
+        params["selected_term"] = trial.suggest_int(
+            "selected_term", 0, len(custom_gam_terms()) - 1
+        )
+    params["max_iter"] = trial.suggest_int("max_iter", 50, 500)
+    params["tol"] = trial.suggest_float("tol", 1e-5, 1e-1, log=True)
+    params["fit_intercept"] = trial.suggest_categorical("fit_intercept", [True, False])
+    return params
+
+
+def suggest_ebm_params(trial: optuna.Trial) -> Dict[str, Any]:
+    """
+    Samples EBM hyperparameters from the search space of the notebooks.
+
+    :param trial: The Optuna trial.
+    :return: The sampled parameters.
+    """
+    return {
+        "max_bins": trial.suggest_int("max_bins", 64, 1024),
+        "max_interaction_bins": trial.suggest_int("max_interaction_bins", 16, 64),
+        "interactions": trial.suggest_float("interactions", 0.0, 1.0),
+        "outer_bags": trial.suggest_int("outer_bags", 1, 20),
+        "inner_bags": trial.suggest_int("inner_bags", 0, 10),
+        "learning_rate": trial.suggest_float("learning_rate", 0.001, 0.1),
+        "min_samples_leaf": trial.suggest_int("min_samples_leaf", 2, 100),
+        "max_leaves": trial.suggest_int("max_leaves", 1, 10),
+        "max_rounds": trial.suggest_int("max_rounds", 5000, 25000),
+        "early_stopping_rounds": trial.suggest_int("early_stopping_rounds", 10, 100),
+        "smoothing_rounds": trial.suggest_int("smoothing_rounds", 50, 500),
+        "greedy_ratio": trial.suggest_float("greedy_ratio", 0.0, 3.0),
+    }
+
+
+def suggest_random_forest_params(trial: optuna.Trial) -> Dict[str, Any]:
+    """
+    Samples Random Forest hyperparameters from the search space of the
+    notebooks. 'oob_score' and 'max_samples' are only sampled with bootstrap.
+
+    :param trial: The Optuna trial.
+    :return: The sampled parameters.
+    """
+    params = {
+        "n_estimators": trial.suggest_int("n_estimators", 100, 300),
+        "criterion": trial.suggest_categorical("criterion", ["gini", "entropy"]),
+        "max_depth": trial.suggest_int("max_depth", 10, 30),
+        "min_samples_split": trial.suggest_int("min_samples_split", 2, 10),
+        "min_samples_leaf": trial.suggest_int("min_samples_leaf", 1, 5),
+        "min_weight_fraction_leaf": trial.suggest_float(
+            "min_weight_fraction_leaf", 0.0, 0.2
+        ),
+        "max_features": trial.suggest_categorical(
+            "max_features", ["sqrt", "log2", None]
+        ),
+        "max_leaf_nodes": trial.suggest_categorical(
+            "max_leaf_nodes", [None, 20, 50, 100]
+        ),
+        "min_impurity_decrease": trial.suggest_float("min_impurity_decrease", 0.0, 0.1),
+        "bootstrap": trial.suggest_categorical("bootstrap", [True, False]),
+    }
+    if params["bootstrap"]:
+        params["oob_score"] = trial.suggest_categorical("oob_score", [True, False])
+        params["max_samples"] = trial.suggest_categorical(
+            "max_samples", [None, 0.5, 0.75, 1.0]
+        )
+    else:
+        params["oob_score"] = False
+        params["max_samples"] = None
+    params["class_weight"] = trial.suggest_categorical(
+        "class_weight", [None, "balanced", "balanced_subsample"]
+    )
+    params["ccp_alpha"] = trial.suggest_float("ccp_alpha", 0.0, 0.05)
+    return params
+
+
+def suggest_xgboost_params(trial: optuna.Trial) -> Dict[str, Any]:
+    """
+    Samples XGBoost hyperparameters from the search space of the notebooks.
+
+    :param trial: The Optuna trial.
+    :return: The sampled parameters.
+    """
+    return {
+        "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.3),
+        "max_depth": trial.suggest_int("max_depth", 3, 10),
+        "min_child_weight": trial.suggest_float("min_child_weight", 1, 10),
+        "subsample": trial.suggest_float("subsample", 0.5, 1.0),
+        "colsample_bytree": trial.suggest_float("colsample_bytree", 0.5, 1.0),
+        "reg_alpha": trial.suggest_float("reg_alpha", 0.0, 10.0),
+        "reg_lambda": trial.suggest_float("reg_lambda", 0.0, 10.0),
+        "scale_pos_weight": trial.suggest_float("scale_pos_weight", 1.0, 5.0),
+        "n_estimators": trial.suggest_int("n_estimators", 100, 500),
+        "gamma": trial.suggest_float("gamma", 0.0, 5.0),
+        "max_delta_step": trial.suggest_float("max_delta_step", 0.0, 10.0),
+    }
+
+
+# Sign making the intermediate values of each family's `progress_callback`
+# larger-is-better like the studies' ROC-AUC: the LogisticGAM reports its
+# training deviance, the others a validation ROC-AUC. The EBM reports its
+# outer bags only after the fit, see `make_objective`
+PROGRESS_SIGNS = {"logistic_gam": -1.0, "ebm": 1.0, "xgboost": 1.0}
+
+# Families whose progress is scored on labelled validation data
+PROGRESS_NEEDS_LABELS = ("ebm", "xgboost")
+
+SUGGESTERS = {
+    "logistic_gam": suggest_logistic_gam_params,
+    "ebm": suggest_ebm_params,
+    "random_forest": suggest_random_forest_params,
+    "xgboost": suggest_xgboost_params,
+}
+
+
+def to_train_params(model: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Translates study parameters into `train_*` arguments.
+
+    Only the LogisticGAM needs translating: 'terms_option' and
+    'selected_term' become its `terms`.
+
+    :param model: Model family, one of SUGGESTERS.
+    :param params: Parameters as stored in the study.
+    :return: Keyword arguments of the model's `train_*` wrapper.
+    """
+    params = dict(params)
+    if model == "logistic_gam":
+        terms_option = params.pop("terms_option", "auto")
+        selected_term = params.pop("selected_term", None)
+        if terms_option == "auto":
+            params["terms"] = "auto"
+        else:
+            params["terms"] = custom_gam_terms()[selected_term]
+    return params
+
+
+# `train_*` argument setting the number of boosting rounds, trees or
+# iterations, scaled down at low fidelities
+BUDGET_PARAMS = {
+    "logistic_gam": "max_iter",
+    "ebm": "max_rounds",
+    "random_forest": "n_estimators",
+    "xgboost": "n_estimators",
+}
+
+# Training fractions evaluated before the full fidelity, spaced for a
+# Hyperband reduction factor of 3
+DEFAULT_FIDELITIES = (1 / 9, 1 / 3)
+
+# Step at which the full fidelity is reported; a fidelity f reports at
+# round(f * MAX_RESOURCE)
+MAX_RESOURCE = 100
+
+
+def fidelity_step(fidelity: float) -> int:
+    """
+    Returns the step at which a fidelity is reported to the trial.
+
+    :param fidelity: Fraction of the training data and budget.
+    :return: The step, between 1 and MAX_RESOURCE.
+    """
+    return max(1, int(round(fidelity * MAX_RESOURCE)))
+
+
+def pruning_callback(
+    trial: optuna.Trial, sign: float = 1.0
+) -> Callable[[int, float], None]:
+    """
+    Builds a `progress_callback` of the `train_*` wrappers that reports to a
+    trial and stops the training when the study's pruner prunes it.
+
+    :param trial: The Optuna trial.
+    :param sign: Factor applied to every value before reporting, -1.0 for
+        losses in a maximized study. Default is 1.0.
+    :return: The callback.
+    :raises optuna.TrialPruned: From the callback, when the trial is pruned.
+    """
+
+    def report(step: int, value: float) -> None:
+        trial.report(sign * value, step)
+        if trial.should_prune():
+            raise optuna.TrialPruned("pruned at step {}".format(step))
+
+    return report
+
+
+def make_objective(
+    model: str,
+    data: TuningData,
+    fixed_params: Optional[Dict[str, Any]] = None,
+    suggest: Optional[Callable[[optuna.Trial], Dict[str, Any]]] = None,
+    prune: bool = True,
+    fidelities: Optional[Sequence[float]] = None,
+    scale_budget: bool = True,
+) -> Callable[[optuna.Trial], float]:
+    """
+    Builds the Optuna objective of a model family on prepared folds.
+
+    Every trial trains on the same read-only fold arrays and returns the mean
+    validation ROC-AUC over the folds. As in the notebooks, a failing trial
+    scores 0.0; its error is stored in the trial's 'error' user attribute.
+    The mean fit seconds per fold and the seconds to score the first validation
+    fold are stored as 'fit_seconds' and 'predict_seconds'.
+
+    With `prune`, model families in PROGRESS_SIGNS report their progress on
+    the first fold to the trial, so the study's pruner can stop unpromising
+    trials early. XGBoost and the LogisticGAM report during the fit (boosting
+    rounds and IRLS iterations), so a pruned trial also stops its current
+    fit. interpret has no hook inside the EBM fit: its staged outer-bag
+    ROC-AUCs are only reported once the first fold is fitted, so pruning an
+    EBM trial saves the fits and scoring of the remaining folds, not the
+    first fit.
+
+    With `fidelities`, every trial is first trained on stratified subsamples
+    of the first fold's training part, with the rounds, trees or iterations
+    of BUDGET_PARAMS scaled by the same fraction. The validation ROC-AUC of
+    each fidelity is reported at `fidelity_step`, and the mean over all folds
+    at full fidelity at MAX_RESOURCE. Only trials the pruner keeps reach the
+    full fidelity, so a SuccessiveHalvingPruner or HyperbandPruner with
+    `min_resource=fidelity_step(fidelities[0])` spends the full training
+    budget on the promising ones only. Progress within a training is then
+    not reported, as its steps would mix with the fidelity steps.
+
+    :param model: Model family, one of SUGGESTERS.
+    :param data: Folds prepared once per study.
+    :param fixed_params: `train_*` arguments of every trial. They override
+        FIXED_PARAMS and the sampled values. Default is None.
+    :param suggest: Function sampling the trial parameters. Default is None
+        (the notebook search space of the model family).
+    :param prune: Whether to report intermediate values for pruning.
+        Default is True.
+    :param fidelities: Increasing training fractions below 1 evaluated before
+        the full fidelity, e.g. DEFAULT_FIDELITIES. Default is None (always
+        train at full fidelity).
+    :param scale_budget: Whether to scale BUDGET_PARAMS with the fidelity, in
+        addition to the training data. Default is True.
+    :return: The objective function.
+    """
+    train = get_trainer(model)
+    suggest = suggest or SUGGESTERS[model]
+    defaults = FIXED_PARAMS.get(model, {})
+    fidelities = sorted(fidelities or [])
+    if any(not 0 < fidelity < 1 for fidelity in fidelities):
+        raise ValueError(
+            "fidelities must be between 0 and 1, got {}".format(fidelities)
+        )
+    # The same subsamples for every trial keep low-fidelity scores comparable
+    X_first, y_first, X_valid_first, y_valid_first = data.fold(0)
+    subsamples = [subsample_indices(y_first, fidelity) for fidelity in fidelities]
+
+    def low_fidelity_scores(trial: optuna.Trial, params: Dict[str, Any]) -> None:
+        budget = BUDGET_PARAMS.get(model)
+        for fidelity, index in zip(fidelities, subsamples):
+            fidelity_params = dict(params)
+            if scale_budget and fidelity_params.get(budget) is not None:
+                fidelity_params[budget] = max(
+                    1, int(round(fidelity * fidelity_params[budget]))
+                )
+            _, results = train(
+                X_first[index],
+                y_first[index],
+                X_valid_first,
+                compute_training_accuracy=False,
+                **fidelity_params
+            )
+            score = roc_auc(y_valid_first, results["y_pred_prob"])
+            trial.report(score, fidelity_step(fidelity))
+            if trial.should_prune():
+                raise optuna.TrialPruned("pruned at fidelity {:.3g}".format(fidelity))
+
+    def objective(trial: optuna.Trial) -> float:
+        try:
+            params = {
+                **defaults,
+                **to_train_params(model, suggest(trial)),
+                **(fixed_params or {}),
+            }
+            if fidelities:
+                low_fidelity_scores(trial, params)
+            scores, fit_seconds = [], []
+            for i, (X_train, y_train, X_valid, y_valid) in enumerate(data):
+                progress = {}
+                if prune and not fidelities and i == 0 and model in PROGRESS_SIGNS:
+                    # Steps of later folds would repeat the reported ones
+                    progress["progress_callback"] = pruning_callback(
+                        trial, PROGRESS_SIGNS[model]
+                    )
+                    if model in PROGRESS_NEEDS_LABELS:
+                        progress["y_test"] = y_valid
+                start = time.perf_counter()
+                fitted, results = train(
+                    X_train,
+                    y_train,
+                    X_valid,
+                    compute_training_accuracy=False,
+                    **params,
+                    **progress
+                )
+                train_seconds = time.perf_counter() - start
+                if i == 0:
+                    start = time.perf_counter()
+                    positive_class_proba(fitted, X_valid)
+                    predict_seconds = time.perf_counter() - start
+                # The wrapper also scores X_valid once, so subtract that pass
+                fit_seconds.append(max(0.0, train_seconds - predict_seconds))
+                scores.append(roc_auc(y_valid, results["y_pred_prob"]))
+        except optuna.TrialPruned:
+            raise
+        except Exception as e:
+            trial.set_user_attr("error", repr(e))
+            return 0.0
+
+        trial.set_user_attr("fold_scores", scores)
+        trial.set_user_attr("fit_seconds", float(np.mean(fit_seconds)))
+        trial.set_user_attr("predict_seconds", predict_seconds)
+        if fidelities:
+            trial.report(float(np.mean(scores)), MAX_RESOURCE)
+        return float(np.mean(scores))
+
+    return objective
@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from filelock import FileLock
+from ml_models.benchmark import CONFIG_PREFIXES, get_trainer
+from tuning.objectives import to_train_params
+
+TUNING_DIR = (
+    Path(__file__).resolve().parent.parent.parent / "hyperparameter_tuning_optuna"
+)
+
+# Model family -> file name prefix of its `*_best_configs.json` files
+FILE_PREFIXES = {family: prefix for prefix, family in CONFIG_PREFIXES.items()}
+
+
+def cohort_key(score: str, balanced: bool = False) -> str:
+    """
+    Names a tuning cohort like the `*_best_configs.json` files do.
+
+    :param score: Severity score of the cohort, e.g. 'sapsii'.
+    :param balanced: Whether the cohort is balanced. Default is False.
+    :return: The cohort key, e.g. 'sapsii_balanced_data'.
+    """
+    return score + ("_balanced_data" if balanced else "")
+
+
+def dataset_fingerprint(X: Any, y: Any = None) -> str:
+    """
+    Hashes a dataset's shape, columns, dtypes and values to tell data versions
+    apart.
+
+    :param X: Features as a DataFrame or array.
+    :param y: Labels. Default is None.
+    :return: A 16-digit hexadecimal fingerprint.
+    """
+    digest = hashlib.sha256()
+    for part in (X, y):
+        if part is None:
+            continue
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            frame = part.to_frame() if isinstance(part, pd.Series) else part
+            header = [(str(c), str(t)) for c, t in frame.dtypes.items()]
+            values = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+        else:
+            values = np.ascontiguousarray(part)
+            header = [str(values.dtype)]
+        digest.update(json.dumps([list(np.shape(part)), header]).encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+class ConfigRegistry:
+    """
+    Best hyperparameters per model family and cohort, shared by concurrent
+    tuning runs.
+
+    Every entry is one `<model>_<cohort>_best_configs.json` file as written by
+    the notebooks, extended with the study name, dataset fingerprint and
+    timings. Updates hold an exclusive file lock across the read-compare-write
+    and replace the file atomically, so parallel studies cannot clobber each
+    other and readers never see a partial file. Reads are cached until the
+    file changes.
+    """
+
+    def __init__(self, directory: Union[str, Path] = TUNING_DIR):
+        """
+        :param directory: Directory of the config files. Default is the
+            `hyperparameter_tuning_optuna` folder.
+        """
+        self.directory = Path(directory)
+        self._cache: Dict[Path, Tuple[int, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def path(self, model: str, cohort: str) -> Path:
+        """
+        Returns the config file of a model family and cohort.
+
+        :param model: Model family, e.g. 'ebm'.
+        :param cohort: Cohort key, see `cohort_key`.
+        :return: The path of the JSON file.
+        """
+        if model not in FILE_PREFIXES:
+            raise KeyError(
+                "unknown model '{}', expected one of {}".format(
+                    model, sorted(FILE_PREFIXES)
+                )
+            )
+        return self.directory / "{}{}_best_configs.json".format(
+            FILE_PREFIXES[model], cohort
+        )
+
+    def get(self, model: str, cohort: str) -> Optional[Dict[str, Any]]:
+        """
+        Looks up the best config of a model family on a cohort.
+
+        :param model: Model family, e.g. 'ebm'.
+        :param cohort: Cohort key, see `cohort_key`.
+        :return: The entry with at least 'best_params' and 'best_value', or
+            None if there is none.
+        """
+        path = self.path(model, cohort)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is not None and cached[0] == mtime:
+                return dict(cached[1])
+
+        with open(path, "r") as f:
+            entry = json.load(f)
+        with self._lock:
+            self._cache[path] = (mtime, entry)
+        return dict(entry)
+
+    def publish(
+        self,
+        model: str,
+        cohort: str,
+        params: Dict[str, Any],
+        value: float,
+        study_name: Optional[str] = None,
+        fingerprint: Optional[str] = None,
+        fit_seconds: Optional[float] = None,
+        predict_seconds: Optional[float] = None,
+        force: bool = False,
+    ) -> bool:
+        """
+        Stores a config if it beats the registered one.
+
+        Scores on different data are not comparable, so a config is not
+        stored if the registered one was tuned on a dataset with another
+        fingerprint.
+
+        :param model: Model family, e.g. 'ebm'.
+        :param cohort: Cohort key, see `cohort_key`.
+        :param params: Hyperparameters as stored in the study.
+        :param value: Validation ROC-AUC of the config.
+        :param study_name: Name of the study the config comes from.
+            Default is None.
+        :param fingerprint: `dataset_fingerprint` of the tuning data.
+            Default is None.
+        :param fit_seconds: Training time of the config. Default is None.
+        :param predict_seconds: Scoring time of the validation data.
+            Default is None.
+        :param force: Whether to store the config even if it is not better or
+            was tuned on other data. Default is False.
+        :return: Whether the config was stored.
+        """
+        path = self.path(model, cohort)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        with FileLock(str(path.with_name(path.name + ".lock"))):
+            current = None
+            if path.exists():
+                with open(path, "r") as f:
+                    current = json.load(f)
+            if not force and current is not None:
+                registered = current.get("dataset_fingerprint")
+                if registered and fingerprint and registered != fingerprint:
+                    return False
+                if value <= current["best_value"]:
+                    return False
+
+            entry = {
+                "best_params": params,
+                "best_value": value,
+                "study_name": study_name,
+                "dataset_fingerprint": fingerprint,
+                "fit_seconds": fit_seconds,
+                "predict_seconds": predict_seconds,
+                "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            }
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(entry, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        return True
+
+    def publish_study(
+        self,
+        study: Any,
+        model: str,
+        cohort: str,
+        fingerprint: Optional[str] = None,
+    ) -> bool:
+        """
+        Stores the best trial of an Optuna study if it beats the registered
+        config, with the timings recorded by `tuning.objectives.make_objective`.
+
+        :param study: The finished Optuna study.
+        :param model: Model family, e.g. 'ebm'.
+        :param cohort: Cohort key, see `cohort_key`.
+        :param fingerprint: `dataset_fingerprint` of the tuning data.
+            Default is None.
+        :return: Whether the config was stored.
+        """
+        best = study.best_trial
+        return self.publish(
+            model,
+            cohort,
+            best.params,
+            best.value,
+            study_name=study.study_name,
+            fingerprint=fingerprint,
+            fit_seconds=best.user_attrs.get("fit_seconds"),
+            predict_seconds=best.user_attrs.get("predict_seconds"),
+        )
+
+    def train_params(self, model: str, cohort: str) -> Dict[str, Any]:
+        """
+        Returns the `train_*` arguments of the best config.
+
+        :param model: Model family, e.g. 'ebm'.
+        :param cohort: Cohort key, see `cohort_key`.
+        :return: Keyword arguments of the model's `train_*` wrapper.
+        :raises KeyError: If no config is registered.
+        """
+        entry = self.get(model, cohort)
+        if entry is None:
+            raise KeyError("no config registered for {} on {}".format(model, cohort))
+        return to_train_params(model, entry["best_params"])
+
+    def train_best(
+        self,
+        model: str,
+        cohort: str,
+        X_train: Any,
+        y_train: Any,
+        X_test: Any,
+        **overrides: Any
+    ) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Calls the `train_*` wrapper of a model family with its best config.
+
+        :param model: Model family, e.g. 'ebm'.
+        :param cohort: Cohort key, see `cohort_key`.
+        :param X_train: Training features.
+        :param y_train: Training labels.
+        :param X_test: Test features.
+        :param overrides: Arguments replacing or extending the config, e.g.
+            `n_jobs`.
+        :return: The model and results of the wrapper.
+        """
+        params = {**self.train_params(model, cohort), **overrides}
+        return get_trainer(model)(X_train, y_train, X_test, **params)
@@ -0,0 +1,124 @@
+import math
+from itertools import zip_longest
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence
+import optuna
+from optuna.trial import TrialState
+from tuning.registry import TUNING_DIR, ConfigRegistry
+
+# Database of the tuning notebooks' studies
+NOTEBOOK_STORAGE = "sqlite:///{}".format(
+    TUNING_DIR / "Optuna_hyperparameter_optimization.db"
+)
+
+
+def _key(params: Dict[str, Any]) -> tuple:
+    return tuple(sorted((name, repr(value)) for name, value in params.items()))
+
+
+def prior_configs(
+    storage: Any, study_names: Sequence[str], k: int = 5
+) -> List[Dict[str, Any]]:
+    """
+    Collects the best finished trials of earlier studies.
+
+    Studies are taken in the given order, which should put the most closely
+    related first. Their ROC-AUCs come from different cohorts and are not
+    compared; instead the configs alternate between the studies by rank: the
+    best of every study, then the second best, and so on.
+
+    :param storage: Storage of the earlier studies, e.g. NOTEBOOK_STORAGE.
+    :param study_names: Names of the earlier studies. Missing ones are skipped.
+    :param k: Number of configs taken from every study. Default is 5.
+    :return: Dictionaries with 'params', 'value' and 'source'.
+    """
+    if isinstance(storage, str) and storage.startswith("sqlite:///"):
+        # Opening a missing SQLite file would create an empty database
+        if not Path(storage[len("sqlite:///") :]).exists():
+            return []
+    existing = set(optuna.get_all_study_names(storage))
+    ranked = []
+    for name in study_names:
+        if name not in existing:
+            continue
+        study = optuna.load_study(study_name=name, storage=storage)
+        trials = [
+            t
+            for t in study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+            if t.value is not None and math.isfinite(t.value) and t.value > 0
+        ]
+        trials.sort(key=lambda t: t.value, reverse=True)
+        ranked.append(
+            [
+                {
+                    "params": dict(t.params),
+                    "value": t.value,
+                    "source": "{}#{}".format(name, t.number),
+                }
+                for t in trials[:k]
+            ]
+        )
+    return [
+        config for rank in zip_longest(*ranked) for config in rank if config is not None
+    ]
+
+
+def registry_configs(
+    registry: ConfigRegistry, model: str, cohorts: Iterable[str]
+) -> List[Dict[str, Any]]:
+    """
+    Collects the registered best configs of a model family on some cohorts.
+
+    :param registry: The best-config registry.
+    :param model: Model family, e.g. 'ebm'.
+    :param cohorts: Cohort keys, most closely related first.
+    :return: Dictionaries with 'params', 'value' and 'source'.
+    """
+    configs = []
+    for cohort in cohorts:
+        entry = registry.get(model, cohort)
+        if entry is not None:
+            configs.append(
+                {
+                    "params": entry["best_params"],
+                    "value": entry["best_value"],
+                    "source": registry.path(model, cohort).name,
+                }
+            )
+    return configs
+
+
+def warm_start(
+    study: optuna.Study, configs: Sequence[Dict[str, Any]], k: int = 5
+) -> int:
+    """
+    Enqueues the first k configs a study has not tried or queued yet.
+
+    The sampler then starts from good regions of the search space instead of
+    random ones. Every enqueued trial keeps its origin in the 'warm_start'
+    user attribute.
+
+    :param study: The study to seed.
+    :param configs: Configs from `registry_configs` and `prior_configs`, best
+        candidates first.
+    :param k: Maximum number of enqueued trials. Default is 5.
+    :return: The number of enqueued trials.
+    """
+    seen = {_key(t.params) for t in study.get_trials(deepcopy=False)}
+    seen.update(
+        _key(t.system_attrs.get("fixed_params", {}))
+        for t in study.get_trials(deepcopy=False, states=(TrialState.WAITING,))
+    )
+    enqueued = 0
+    for config in configs:
+        if enqueued >= k:
+            break
+        key = _key(config["params"])
+        if key in seen:
+            continue
+        seen.add(key)
+        study.enqueue_trial(
+            config["params"], user_attrs={"warm_start": config["source"]}
+        )
+        enqueued += 1
+    return enqueued
@@ -0,0 +1,136 @@
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, Tuple, Union
+
+MANIFEST_FILE = "manifest.json"
+
+
+def save_arrays(
+    directory: Union[str, Path], arrays: Dict[str, np.ndarray], manifest: Dict[str, Any]
+) -> Path:
+    """
+    Atomically writes a directory of `.npy` files plus a JSON manifest.
+
+    The arrays are written into a temporary sibling directory which is renamed
+    into place at the end, so readers never observe a half-written directory.
+    An existing directory at the target location is first renamed aside and
+    only removed after the swap, so a crash never loses both versions.
+
+    :param directory: Target directory.
+    :param arrays: Mapping of file stem to array. Arrays with a numeric, boolean
+        or datetime dtype can later be memory-mapped; object arrays are pickled
+        and listed under 'object_arrays' in the manifest.
+    :param manifest: JSON-serializable metadata stored as `manifest.json`.
+    :return: The path of the written directory.
+    """
+    directory = Path(directory)
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = directory.parent / ".tmp-{}-{}".format(directory.name, uuid.uuid4().hex)
+    tmp_dir.mkdir()
+
+    try:
+        object_arrays = []
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            if array.dtype.hasobject:
+                object_arrays.append(name)
+            np.save(
+                tmp_dir / "{}.npy".format(name),
+                array,
+                allow_pickle=array.dtype.hasobject,
+            )
+        if object_arrays:
+            manifest = dict(manifest, object_arrays=sorted(object_arrays))
+        with open(tmp_dir / MANIFEST_FILE, "w") as f:
+            json.dump(manifest, f)
+
+        old_dir = None
+        if directory.exists():
+            old_dir = directory.parent / ".old-{}-{}".format(
+                directory.name, uuid.uuid4().hex
+            )
+            os.replace(directory, old_dir)
+        try:
+            os.replace(tmp_dir, directory)
+        except BaseException:
+            if old_dir is not None:
+                os.replace(old_dir, directory)
+            raise
+        if old_dir is not None:
+            shutil.rmtree(old_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    return directory
+
+
+def load_manifest(directory: Union[str, Path]) -> Dict[str, Any]:
+    """
+    Reads the JSON manifest of a directory written by `save_arrays`.
+
+    :param directory: Directory written by `save_arrays`.
+    :return: The manifest dictionary.
+    """
+    with open(Path(directory) / MANIFEST_FILE, "r") as f:
+        return json.load(f)
+
+
+def load_array(directory: Union[str, Path], name: str, mmap: bool = True) -> np.ndarray:
+    """
+    Loads one array from a directory written by `save_arrays`.
+
+    :param directory: Directory written by `save_arrays`.
+    :param name: File stem of the array.
+    :param mmap: Whether to memory-map the file read-only instead of reading it
+        into memory. Object arrays are always read into memory. Default is True.
+    :return: The array, as a read-only `np.memmap` when memory-mapped.
+    :raises ValueError: If the file holds pickled data but the manifest does not
+        list it as an object array.
+    """
+    path = Path(directory) / "{}.npy".format(name)
+    try:
+        return np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+    except ValueError:
+        # Object arrays cannot be memory-mapped and have to be unpickled, which
+        # is only allowed for arrays `save_arrays` recorded as such
+        if name not in load_manifest(directory).get("object_arrays", []):
+            raise ValueError(
+                "{} holds pickled data but is not an object array of the "
+                "manifest; refusing to unpickle it".format(path)
+            )
+        return np.load(path, allow_pickle=True)
+
+
+def load_arrays(
+    directory: Union[str, Path], mmap: bool = True
+) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Loads every array and the manifest from a directory written by `save_arrays`.
+
+    :param directory: Directory written by `save_arrays`.
+    :param mmap: Whether to memory-map numeric arrays. Default is True.
+    :return: A tuple of the arrays keyed by file stem and the manifest.
+    """
+    directory = Path(directory)
+    arrays = {
+        path.stem: load_array(directory, path.stem, mmap=mmap)
+        for path in sorted(directory.glob("*.npy"))
+    }
+    return arrays, load_manifest(directory)
+
+
+def directory_size(directory: Union[str, Path]) -> int:
+    """
+    Returns the total size in bytes of the files inside a directory.
+
+    :param directory: Directory to measure.
+    :return: Size in bytes.
+    """
+    return sum(
+        path.stat().st_size for path in Path(directory).rglob("*") if path.is_file()
+    )
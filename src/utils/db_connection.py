@@ -1,7 +1,11 @@
 import json
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
 import psycopg2
+import psycopg2.pool
 from pathlib import Path
-from typing import Tuple, Any
+from typing import Dict, Iterator, List, Optional, Tuple, Any
 
 
 def load_secrets(conf_file: str = "config.json") -> dict:
@@ -22,6 +26,20 @@ def load_secrets(conf_file: str = "config.json") -> dict:
     return secrets["database"]
 
 
+@lru_cache(maxsize=None)
+def load_cached_secrets(conf_file: str = "config.json") -> dict:
+    """
+    Load database secrets once per configuration file and keep them in memory.
+
+    Use `load_cached_secrets.cache_clear()` after editing the configuration file.
+
+    :param conf_file: Path to the JSON file containing database connection details
+        (default is 'config.json').
+    :return: A dictionary containing the database connection details.
+    """
+    return load_secrets(conf_file)
+
+
 def create_connection(conf_file: str = "config.json") -> Tuple[Any, Any]:
     """
     Create a connection to the PostgreSQL database and set the schema.
@@ -44,6 +62,211 @@ def create_connection(conf_file: str = "config.json") -> Tuple[Any, Any]:
     return con, cur
 
 
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of PostgreSQL connections.
+
+    Every pooled connection has its schema set exactly once when it is opened.
+    Connections are health-checked when they are borrowed and replaced
+    transparently if the server dropped them.
+    """
+
+    def __init__(
+        self,
+        conf_file: str = "config.json",
+        max_size: int = 5,
+        health_check: bool = True,
+        timeout: Optional[float] = None,
+    ):
+        """
+        :param conf_file: Path to the JSON file containing database connection
+            details (default is 'config.json').
+        :param max_size: Maximum number of open connections. Default is 5.
+        :param health_check: Whether to run `SELECT 1` on a connection before
+            handing it out. Default is True.
+        :param timeout: Seconds to wait for a free connection when the pool is
+            exhausted. Default is None (wait indefinitely).
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self.conf_file = conf_file
+        self.max_size = max_size
+        self.health_check = health_check
+        self.timeout = timeout
+
+        self._idle: List[Any] = []
+        self._in_use: set = set()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._closed = False
+
+    def _open(self) -> Any:
+        """
+        Open a new connection and set its schema permanently.
+
+        The `SET search_path` is committed so that rolling back a borrower's
+        transaction does not reset the schema.
+        """
+        secrets = load_cached_secrets(self.conf_file)
+
+        con = psycopg2.connect(
+            dbname=secrets["dbname"],
+            user=secrets["user"],
+            host=secrets["host"],
+            password=secrets["password"],
+        )
+        with con.cursor() as cur:
+            cur.execute("SET search_path to {}".format(secrets["schema"]))
+        con.commit()
+
+        return con
+
+    def _is_healthy(self, con: Any) -> bool:
+        """Check that an idle connection is still usable."""
+        if con.closed:
+            return False
+        if not self.health_check:
+            return True
+        try:
+            with con.cursor() as cur:
+                cur.execute("SELECT 1")
+            con.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def getconn(self) -> Any:
+        """
+        Borrow a connection, opening a new one if no healthy idle one exists.
+
+        :return: An open psycopg2 connection with the schema already set.
+        :raises psycopg2.pool.PoolError: If the pool is closed or no connection
+            became available within `timeout` seconds.
+        """
+        if self._closed:
+            raise psycopg2.pool.PoolError("connection pool is closed")
+        if not self._slots.acquire(timeout=self.timeout):
+            raise psycopg2.pool.PoolError("connection pool exhausted")
+
+        try:
+            con = None
+            while con is None:
+                with self._lock:
+                    candidate = self._idle.pop() if self._idle else None
+                if candidate is None:
+                    con = self._open()
+                elif self._is_healthy(candidate):
+                    con = candidate
+                else:
+                    _close_quietly(candidate)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use.add(con)
+
+        return con
+
+    def putconn(self, con: Any, close: bool = False) -> None:
+        """
+        Return a borrowed connection to the pool.
+
+        Any open transaction is rolled back. Broken connections are discarded.
+
+        :param con: The connection obtained from `getconn`.
+        :param close: Whether to close the connection instead of keeping it.
+            Default is False.
+        """
+        with self._lock:
+            if con not in self._in_use:
+                raise psycopg2.pool.PoolError("connection does not belong to pool")
+            self._in_use.discard(con)
+
+        try:
+            if not close and not self._closed and not con.closed:
+                try:
+                    con.rollback()
+                except psycopg2.Error:
+                    close = True
+            if close or self._closed or con.closed:
+                _close_quietly(con)
+            else:
+                with self._lock:
+                    self._idle.append(con)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        Borrow a connection for the duration of a `with` block.
+
+        The connection is discarded instead of reused if the block raised a
+        database error.
+        """
+        con = self.getconn()
+        broken = False
+        try:
+            yield con
+        except psycopg2.Error:
+            broken = True
+            raise
+        finally:
+            self.putconn(con, close=broken)
+
+    def closeall(self) -> None:
+        """Close every idle connection and refuse further borrowing."""
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for con in idle:
+            _close_quietly(con)
+
+
+def _close_quietly(con: Any) -> None:
+    """Close a connection, ignoring errors from already broken sockets."""
+    try:
+        con.close()
+    except psycopg2.Error:
+        pass
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(
+    conf_file: str = "config.json", max_size: int = 5
+) -> ConnectionPool:
+    """
+    Return the shared connection pool for a configuration file, creating it on
+    first use.
+
+    :param conf_file: Path to the JSON file containing database connection details
+        (default is 'config.json').
+    :param max_size: Maximum number of open connections, only used when the pool
+        is created. Default is 5.
+    :return: The process-wide ConnectionPool for `conf_file`.
+    """
+    with _pools_lock:
+        pool = _pools.get(conf_file)
+        if pool is None or pool._closed:
+            pool = ConnectionPool(conf_file=conf_file, max_size=max_size)
+            _pools[conf_file] = pool
+    return pool
+
+
+def close_connection_pools() -> None:
+    """Close all shared connection pools."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.closeall()
+
+
 # # Example usage
 # if __name__ == "__main__":
 #     con, cur = create_connection()
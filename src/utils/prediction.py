@@ -0,0 +1,183 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+
+def positive_class_proba(model: Any, X: Any) -> np.ndarray:
+    """
+    Returns the predicted probability of the positive class.
+
+    Handles both sklearn-style models returning an (n, 2) matrix and pygam
+    models returning a 1-d array.
+
+    :param model: A fitted binary classifier with `predict_proba`.
+    :param X: Features.
+    :return: A 1-d array of positive-class probabilities.
+    """
+    proba = np.asarray(model.predict_proba(X))
+    return proba[:, 1] if proba.ndim == 2 else proba
+
+
+def labels_from_proba(
+    y_pred_prob: np.ndarray, threshold: float = 0.5, classes: Optional[Any] = None
+) -> np.ndarray:
+    """
+    Derives binary labels from positive-class probabilities.
+
+    A sample is labelled positive when its probability is strictly above the
+    threshold, which reproduces `predict` of the wrapped models at 0.5.
+
+    :param y_pred_prob: Positive-class probabilities.
+    :param threshold: Decision threshold. Default is 0.5.
+    :param classes: The model's `classes_`, used to map 0/1 back to the original
+        labels. Default is None (return 0/1).
+    :return: The predicted labels.
+    """
+    positive = (np.asarray(y_pred_prob) > threshold).astype(int)
+    if classes is None:
+        return positive
+    return np.asarray(classes)[positive]
+
+
+def thresholded_accuracy(
+    model: Any,
+    X: Any,
+    y: Any,
+    threshold: float = 0.5,
+    classes: Optional[Any] = None,
+) -> float:
+    """
+    Computes accuracy from a single probability pass at the given threshold.
+
+    :param model: A fitted binary classifier with `predict_proba`.
+    :param X: Features.
+    :param y: True labels.
+    :param threshold: Decision threshold. Default is 0.5.
+    :param classes: The model's `classes_`. Default is None.
+    :return: The fraction of correctly labelled samples.
+    """
+    y_pred = labels_from_proba(positive_class_proba(model, X), threshold, classes)
+    return float(np.mean(y_pred == np.asarray(y)))
+
+
+def contribution_frame(
+    contributions: np.ndarray,
+    names: Sequence[str],
+    X: Any,
+    intercept: Optional[Any] = None,
+) -> pd.DataFrame:
+    """
+    Wraps a matrix of per-sample contributions in a DataFrame labelled like
+    the explained samples.
+
+    :param contributions: An (n_samples, n_columns) array.
+    :param names: One column name per contribution.
+    :param X: The explained features; the index of a DataFrame is kept.
+    :param intercept: Scalar or per-sample intercept added as the first column.
+        Default is None (no intercept column).
+    :return: The contributions as a DataFrame.
+    """
+    index = X.index if isinstance(X, pd.DataFrame) else None
+    frame = pd.DataFrame(contributions, columns=list(names), index=index)
+    if intercept is not None:
+        frame.insert(0, "intercept", intercept)
+    return frame
+
+
+def iter_row_blocks(X: Any, batch_size: int) -> Iterator[Tuple[int, int, Any]]:
+    """
+    Splits features into consecutive row blocks without copying them.
+
+    :param X: A DataFrame, array or memory-mapped array.
+    :param batch_size: Maximum number of rows per block.
+    :return: An iterator of (start, stop, rows) tuples.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+
+    n_rows = len(X)
+    for start in range(0, n_rows, batch_size):
+        stop = min(start + batch_size, n_rows)
+        rows = X.iloc[start:stop] if hasattr(X, "iloc") else X[start:stop]
+        yield start, stop, rows
+
+
+def predict_in_batches(
+    model: Any,
+    X: Any,
+    batch_size: int = 10000,
+    n_workers: int = 1,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Predicts positive-class probabilities block by block into one output buffer.
+
+    Works for every model returned by the `train_*` wrappers. Only `batch_size`
+    rows per worker are scored at a time, so intermediate matrices stay small
+    even for whole cohorts, and `X` may be a memory-mapped array that is never
+    fully loaded.
+
+    :param model: A fitted binary classifier with `predict_proba`.
+    :param X: Features as a DataFrame, array, memory-mapped array, or the path
+        of a `.npy` file, which is memory-mapped.
+    :param batch_size: Number of rows per block. Default is 10000.
+    :param n_workers: Number of threads scoring blocks concurrently. Default is 1.
+    :param out: Preallocated 1-d output array with one entry per row.
+        Default is None (a float64 array is allocated).
+    :return: The positive-class probabilities, i.e. `out` when given.
+    """
+    if isinstance(X, (str, Path)):
+        X = np.load(X, mmap_mode="r")
+
+    n_rows = len(X)
+    if out is None:
+        out = np.empty(n_rows, dtype=np.float64)
+    elif out.shape != (n_rows,):
+        raise ValueError("out has shape {}, expected ({},)".format(out.shape, n_rows))
+
+    def score(block: Tuple[int, int, Any]) -> None:
+        start, stop, rows = block
+        out[start:stop] = positive_class_proba(model, rows)
+
+    blocks = iter_row_blocks(X, batch_size)
+
+    if n_workers <= 1:
+        for block in blocks:
+            score(block)
+        return out
+
+    # Keep at most two blocks per worker in flight to bound memory
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        in_flight = deque()
+        for block in blocks:
+            if len(in_flight) >= 2 * n_workers:
+                in_flight.popleft().result()
+            in_flight.append(executor.submit(score, block))
+        for future in in_flight:
+            future.result()
+
+    return out
+
+
+def iter_predictions(
+    model: Any,
+    batches: Iterable[Any],
+    transform: Optional[Callable[[Any], Any]] = None,
+) -> Iterator[np.ndarray]:
+    """
+    Lazily scores a stream of feature batches, e.g. the chunks yielded by
+    `data_pipeline.extractor.execute_query_in_chunks`.
+
+    :param model: A fitted binary classifier with `predict_proba`.
+    :param batches: Iterable of feature batches.
+    :param transform: Optional preprocessing applied to each batch before
+        scoring, e.g. dropping identifiers and scaling. Default is None.
+    :return: An iterator of positive-class probabilities, one array per batch.
+    """
+    for batch in batches:
+        if transform is not None:
+            batch = transform(batch)
+        yield positive_class_proba(model, batch)
@@ -0,0 +1,380 @@
+import shutil
+import tempfile
+import uuid
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+import numpy as np
+import pandas as pd
+from utils.array_store import load_array, load_manifest, save_arrays
+
+BACKENDS = ("shm", "memmap")
+
+
+def _file_stem(name: str, part: str) -> str:
+    """Names the `.npy` file of one part of a value for the 'memmap' backend."""
+    return "{}__{}".format(name, part)
+
+
+def _plain_array(values: Any, what: str) -> np.ndarray:
+    array = np.asarray(values)
+    if array.dtype.hasobject:
+        raise ValueError(
+            "object arrays cannot be shared; convert string {} to numbers or "
+            "categories first".format(what)
+        )
+    return np.ascontiguousarray(array)
+
+
+def _column_parts(col: pd.Series, i: int, parts: Dict[str, np.ndarray]) -> Any:
+    """Stores one column and returns what is needed to restore its dtype."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        parts["c{}".format(i)] = _plain_array(col.cat.codes, "columns")
+        return {
+            "categories": col.cat.categories.tolist(),
+            "ordered": bool(col.cat.ordered),
+        }
+    parts["c{}".format(i)] = _plain_array(col, "columns")
+    return None
+
+
+def _index_meta(index: pd.Index, parts: Dict[str, np.ndarray]) -> Any:
+    """Stores a non-default index and returns how to rebuild it."""
+    name = None if index.name is None else str(index.name)
+    if isinstance(index, pd.RangeIndex):
+        if index.start == 0 and index.step == 1 and name is None:
+            return None
+        return {
+            "name": name,
+            "start": index.start,
+            "stop": index.stop,
+            "step": index.step,
+        }
+    parts["index"] = _plain_array(index, "indexes")
+    return {"name": name}
+
+
+def _to_parts(value: Any) -> tuple:
+    """
+    Splits a DataFrame, Series or array into plain arrays and the metadata
+    needed to rebuild it with its dtypes and index.
+
+    Frames whose columns share a NumPy dtype are stored as one 2-d array;
+    other frames are stored column by column, so integer and float columns
+    keep their own dtypes. Categorical columns are stored as their codes.
+    """
+    parts: Dict[str, np.ndarray] = {}
+    if isinstance(value, pd.DataFrame):
+        meta = {"kind": "frame", "columns": [str(c) for c in value.columns]}
+        dtypes = set(value.dtypes)
+        if len(dtypes) == 1 and isinstance(next(iter(dtypes)), np.dtype):
+            meta["layout"] = "block"
+            parts["values"] = _plain_array(value.to_numpy(), "columns")
+        else:
+            meta["layout"] = "columns"
+            meta["column_dtypes"] = [
+                _column_parts(value.iloc[:, i], i, parts) for i in range(value.shape[1])
+            ]
+        meta["index"] = _index_meta(value.index, parts)
+    elif isinstance(value, pd.Series):
+        name = None if value.name is None else str(value.name)
+        meta = {"kind": "series", "name": name}
+        meta["dtype"] = _column_parts(value, 0, parts)
+        meta["index"] = _index_meta(value.index, parts)
+    else:
+        meta = {"kind": "array"}
+        parts["values"] = _plain_array(value, "columns")
+
+    meta["parts"] = {
+        part: {"shape": list(array.shape), "dtype": array.dtype.str}
+        for part, array in parts.items()
+    }
+    return parts, meta
+
+
+def _restore_column(codes: np.ndarray, dtype: Any) -> Any:
+    if dtype is None:
+        return codes
+    return pd.Categorical.from_codes(
+        codes, categories=dtype["categories"], ordered=dtype["ordered"]
+    )
+
+
+def _restore_index(parts: Dict[str, np.ndarray], meta: Any) -> Any:
+    if meta is None:
+        return None
+    if "index" in parts:
+        return pd.Index(parts["index"], name=meta["name"], copy=False)
+    return pd.RangeIndex(meta["start"], meta["stop"], meta["step"], name=meta["name"])
+
+
+def _from_parts(parts: Dict[str, np.ndarray], meta: Dict[str, Any]) -> Any:
+    """Wraps shared arrays like the value they were created from, without copying."""
+    if meta["kind"] == "frame":
+        if meta["layout"] == "block":
+            frame = pd.DataFrame(parts["values"], columns=meta["columns"], copy=False)
+        else:
+            frame = pd.DataFrame(
+                {
+                    i: _restore_column(parts["c{}".format(i)], dtype)
+                    for i, dtype in enumerate(meta["column_dtypes"])
+                },
+                copy=False,
+            )
+            frame.columns = meta["columns"]
+        index = _restore_index(parts, meta["index"])
+        if index is not None:
+            frame.index = index
+        return frame
+    if meta["kind"] == "series":
+        return pd.Series(
+            _restore_column(parts["c0"], meta["dtype"]),
+            index=_restore_index(parts, meta["index"]),
+            name=meta["name"],
+            copy=False,
+        )
+    return parts["values"]
+
+
+class SharedDataset:
+    """
+    Feature matrices and labels placed once in shared memory or memory-mapped
+    `.npy` files, for handing a dataset to many worker processes.
+
+    The creating process calls `create` and passes the dataset (or its small
+    `handle`) to the workers, which `attach` read-only, zero-copy views by
+    name. Pickling a SharedDataset pickles only its handle, so it can be used
+    as an argument of process pool tasks and initializers.
+
+    Shared memory segments are only valid while the creator keeps them; call
+    `unlink` (or leave the `with` block) in the creator when all workers are
+    done. With the 'shm' backend, workers should be started by the creating
+    process so they share its resource tracker.
+    """
+
+    def __init__(
+        self,
+        handle: Dict[str, Any],
+        arrays: Dict[str, Dict[str, np.ndarray]],
+        blocks: Optional[List[shared_memory.SharedMemory]] = None,
+        owner: bool = False,
+    ):
+        """
+        Use `create` or `attach` instead of calling this directly.
+
+        :param handle: Backend, location and per-value metadata.
+        :param arrays: Read-only views of the shared arrays of every value.
+        :param blocks: Shared memory blocks backing the views, for 'shm'.
+        :param owner: Whether this process created the data and removes it.
+        """
+        self.handle = handle
+        self._arrays = arrays
+        self._blocks = blocks or []
+        self._owner = owner
+        # Caller-given 'memmap' directory created for this dataset, if any
+        self._created_directory: Optional[Path] = None
+
+    @classmethod
+    def create(
+        cls,
+        data: Dict[str, Any],
+        backend: str = "shm",
+        directory: Optional[Union[str, Path]] = None,
+    ) -> "SharedDataset":
+        """
+        Copies arrays, DataFrames or Series into shared storage once.
+
+        DataFrames and Series keep their names, index and column dtypes, so
+        workers see the same values the creating process had. Frames with a
+        single NumPy dtype are stored as one 2-d array; mixed frames are
+        stored column by column, and categorical columns as their codes.
+
+        :param data: Mapping of name to array, DataFrame or Series, e.g.
+            {'X_train': ..., 'y_train': ...}.
+        :param backend: 'shm' for POSIX shared memory or 'memmap' for
+            memory-mapped `.npy` files. Default is 'shm'.
+        :param directory: Directory the 'memmap' files are written to, in a new
+            subdirectory owned by the dataset. Other files in it are kept, and
+            the directory itself is only removed if the dataset created it.
+            Default is None (the system's temporary directory).
+        :return: The dataset, owned by the calling process.
+        :raises ValueError: For an unknown backend or object-dtype data.
+        """
+        if backend not in BACKENDS:
+            raise ValueError("backend must be one of {}".format(BACKENDS))
+
+        converted = {name: _to_parts(value) for name, value in data.items()}
+        meta = {name: value_meta for name, (_, value_meta) in converted.items()}
+
+        if backend == "memmap":
+            created = None
+            if directory is not None and not Path(directory).exists():
+                created = Path(directory)
+                created.mkdir(parents=True)
+            data_dir = Path(tempfile.mkdtemp(prefix="shared-data-", dir=directory))
+            save_arrays(
+                data_dir,
+                {
+                    _file_stem(name, part): array
+                    for name, (parts, _) in converted.items()
+                    for part, array in parts.items()
+                },
+                {"arrays": meta},
+            )
+            handle = {"backend": backend, "directory": str(data_dir), "arrays": meta}
+            dataset = cls(handle, cls._load_memmaps(handle), owner=True)
+            dataset._created_directory = created
+            return dataset
+
+        blocks = []
+        prefix = "sd_{}".format(uuid.uuid4().hex[:12])
+        try:
+            for name, (parts, value_meta) in converted.items():
+                for part, array in parts.items():
+                    block = shared_memory.SharedMemory(
+                        name="{}_{}".format(prefix, len(blocks)),
+                        create=True,
+                        size=max(array.nbytes, 1),
+                    )
+                    blocks.append(block)
+                    view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+                    view[...] = array
+                    value_meta["parts"][part]["block"] = block.name
+        except BaseException:
+            for block in blocks:
+                block.close()
+                block.unlink()
+            raise
+
+        handle = {"backend": backend, "arrays": meta}
+        by_name = {block.name: block for block in blocks}
+        arrays = {
+            name: {
+                part: cls._view(by_name[part_meta["block"]], part_meta)
+                for part, part_meta in value_meta["parts"].items()
+            }
+            for name, value_meta in meta.items()
+        }
+        return cls(handle, arrays, blocks, owner=True)
+
+    @classmethod
+    def attach(cls, handle: Dict[str, Any]) -> "SharedDataset":
+        """
+        Attaches read-only views of a dataset created in another process.
+
+        :param handle: The `handle` of the created dataset.
+        :return: The attached dataset.
+        """
+        if handle["backend"] == "memmap":
+            return cls(handle, cls._load_memmaps(handle))
+
+        blocks, arrays = [], {}
+        for name, value_meta in handle["arrays"].items():
+            arrays[name] = {}
+            for part, part_meta in value_meta["parts"].items():
+                block = shared_memory.SharedMemory(name=part_meta["block"])
+                blocks.append(block)
+                arrays[name][part] = cls._view(block, part_meta)
+        return cls(handle, arrays, blocks)
+
+    @staticmethod
+    def _view(block: shared_memory.SharedMemory, meta: Dict[str, Any]) -> np.ndarray:
+        view = np.ndarray(
+            tuple(meta["shape"]), dtype=np.dtype(meta["dtype"]), buffer=block.buf
+        )
+        view.flags.writeable = False
+        return view
+
+    @staticmethod
+    def _load_memmaps(handle: Dict[str, Any]) -> Dict[str, Dict[str, np.ndarray]]:
+        directory = handle["directory"]
+        meta = load_manifest(directory)["arrays"]
+        # Plain ndarray views of the maps, so pandas wraps them like any array
+        return {
+            name: {
+                part: np.asarray(
+                    load_array(directory, _file_stem(name, part), mmap=True)
+                )
+                for part in value_meta["parts"]
+            }
+            for name, value_meta in meta.items()
+        }
+
+    def __reduce__(self):
+        return (SharedDataset.attach, (self.handle,))
+
+    def __getitem__(self, name: str) -> Any:
+        """
+        Returns a zero-copy, read-only view of one stored value.
+
+        :param name: Name given at creation.
+        :return: An array, or a DataFrame/Series for values created from them.
+        """
+        return _from_parts(self._arrays[name], self.handle["arrays"][name])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._arrays
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._arrays)
+
+    def array(self, name: str) -> np.ndarray:
+        """
+        Returns the plain shared array of one stored value.
+
+        :param name: Name given at creation.
+        :return: A read-only array.
+        :raises ValueError: For Series and frames stored column by column.
+        """
+        if "values" not in self._arrays[name]:
+            raise ValueError("'{}' is not stored as a single array".format(name))
+        return self._arrays[name]["values"]
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the shared arrays in bytes."""
+        return sum(
+            array.nbytes for parts in self._arrays.values() for array in parts.values()
+        )
+
+    def close(self) -> None:
+        """Releases this process's views; the data stays available to others."""
+        self._arrays = {}
+        for block in self._blocks:
+            try:
+                block.close()
+            except BufferError:
+                # Views handed out earlier are still alive; the mapping is
+                # released when they are garbage collected
+                pass
+        self._blocks = []
+
+    def unlink(self) -> None:
+        """
+        Closes the views and, in the creating process, frees the storage. Only
+        files and directories created by the dataset are removed.
+        """
+        blocks = list(self._blocks)
+        self.close()
+        if not self._owner:
+            return
+        for block in blocks:
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+        if self.handle["backend"] == "memmap":
+            shutil.rmtree(self.handle["directory"], ignore_errors=True)
+            if self._created_directory is not None:
+                try:
+                    self._created_directory.rmdir()
+                except OSError:
+                    # Others wrote to it since
+                    pass
+        self._owner = False
+
+    def __enter__(self) -> "SharedDataset":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.unlink()
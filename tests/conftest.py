@@ -1,3 +1,6 @@
+import numpy as np
+import pandas as pd
+import pytest
 import warnings
 
 
@@ -8,3 +11,23 @@ def pytest_configure(config):
     warnings.filterwarnings("ignore", category=UserWarning)
     warnings.filterwarnings("ignore", category=FutureWarning)
     warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+
+@pytest.fixture
+def cohort():
+    """
+    Fixture of a synthetic cohort whose mortality depends on age and GCS,
+    with an uninformative heart rate.
+    """
+    rng = np.random.default_rng(0)
+    n = 400
+    X = pd.DataFrame(
+        {
+            "age": rng.normal(65, 15, n),
+            "heart_rate": rng.normal(90, 20, n),
+            "gcs": rng.integers(3, 16, n).astype(float),
+        }
+    )
+    logit = 0.05 * (X["age"] - 65) - 0.2 * (X["gcs"] - 9)
+    y = pd.Series((logit + rng.normal(0, 1, n) > 0).astype(int))
+    return X, y
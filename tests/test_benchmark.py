@@ -0,0 +1,68 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+from pathlib import Path
+from ml_models.benchmark import load_best_config, plan_threads, run_benchmark
+
+import warnings
+
+warnings.filterwarnings("ignore")
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+CONFIG_DIR = Path(__file__).resolve().parent.parent / "hyperparameter_tuning_optuna"
+
+
+@pytest.fixture
+def split():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(240, 4)), columns=["a", "b", "c", "d"])
+    y = pd.Series((X["a"] - X["b"] + rng.normal(size=240) > 0).astype(int))
+    return X[:160], y[:160], X[160:], y[160:]
+
+
+def test_load_best_config():
+    job = load_best_config(CONFIG_DIR / "logisticgam_sapsii_best_configs.json")
+    assert job["name"] == "logisticgam_sapsii"
+    assert job["model"] == "logistic_gam"
+    assert job["params"]["terms"] == "auto"
+    assert "terms_option" not in job["params"]
+
+    job = load_best_config(CONFIG_DIR / "xgboost_apsiii_best_configs.json")
+    assert job["model"] == "xgboost"
+    assert job["best_value"] > 0.5
+
+    with pytest.raises(ValueError):
+        load_best_config(CONFIG_DIR / "Optuna_hyperparameter_optimization.db")
+
+
+def test_plan_threads(mocker):
+    mocker.patch("os.cpu_count", return_value=8)
+    assert plan_threads(4) == (4, 2)
+    assert plan_threads(2, max_workers=1) == (1, 8)
+    assert plan_threads(16) == (8, 1)
+
+
+def test_run_benchmark(split):
+    jobs = [
+        {"name": "gam", "model": "logistic_gam", "params": {"max_iter": 20}},
+        {"name": "ebm", "model": "ebm", "params": {"outer_bags": 2}},
+        {"name": "rf", "model": "random_forest", "params": {"n_estimators": 20}},
+        {"name": "xgb", "model": "xgboost", "params": {"n_estimators": 20}},
+        {"name": "broken", "model": "xgboost", "params": {"max_depth": "deep"}},
+    ]
+
+    table = run_benchmark(*split, jobs, max_workers=2, threads_per_job=1)
+
+    assert list(table["name"][:4].sort_values()) == ["ebm", "gam", "rf", "xgb"]
+    succeeded = table[table["error"].isna()]
+    assert len(succeeded) == 4
+    assert (succeeded["roc_auc"] > 0.5).all()
+    assert (succeeded["fit_seconds"] >= 0).all()
+    assert (succeeded["predict_seconds"] > 0).all()
+    assert (table["threads"] == 1).all()
+
+    # Failing jobs are reported instead of aborting the benchmark
+    broken = table.set_index("name").loc["broken"]
+    assert np.isnan(broken["roc_auc"])
+    assert "Error" in broken["error"]
@@ -0,0 +1,81 @@
+import pytest
+import numpy as np
+from sklearn.metrics import roc_auc_score
+import sys
+from pathlib import Path
+from ml_models.bootstrap import (
+    _sort_structure,
+    bootstrap_metrics,
+    delong_roc_ci,
+    delong_roc_test,
+    resample_metrics,
+)
+from ml_models.evalauion_results import compute_metrics
+
+import warnings
+
+warnings.filterwarnings("ignore")
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+
+@pytest.fixture
+def predictions():
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(0, 2, 400)
+    model = np.round(rng.random(400) * 0.6 + 0.3 * y_true, 2)
+    score = rng.random(400) + 0.1 * y_true
+    return y_true, model, score
+
+
+def test_resample_metrics_match_compute_metrics(predictions):
+    y_true, model, _ = predictions
+    rng = np.random.default_rng(1)
+    indices = rng.integers(0, len(y_true), size=(5, len(y_true)))
+    counts = np.stack([np.bincount(row, minlength=len(y_true)) for row in indices])
+
+    resampled = resample_metrics(counts, y_true, *_sort_structure(y_true, model, 0.5))
+
+    for b, rows in enumerate(indices):
+        expected = compute_metrics(y_true[rows], model[rows], 0.5)
+        at_threshold = expected["thresholds"].iloc[0]
+        assert resampled["roc_auc"][b] == pytest.approx(expected["roc_auc"])
+        assert resampled["roc_prc"][b] == pytest.approx(expected["roc_prc"])
+        assert resampled["f1_score"][b] == pytest.approx(at_threshold["f1_score"])
+        assert resampled["test_accuracy"][b] == pytest.approx(at_threshold["accuracy"])
+
+
+def test_bootstrap_metrics(predictions):
+    y_true, model, score = predictions
+    kwargs = dict(n_resamples=250, chunk_size=100, baseline="score", random_state=0)
+
+    table = bootstrap_metrics(y_true, {"model": model, "score": score}, **kwargs)
+
+    assert len(table) == 8
+    assert (table["ci_lower"] <= table["estimate"]).all()
+    assert (table["estimate"] <= table["ci_upper"]).all()
+    auc = table.set_index(["model", "metric"]).loc[("model", "roc_auc")]
+    assert auc["estimate"] == pytest.approx(roc_auc_score(y_true, model))
+    assert auc["p_value"] < 0.05
+    assert table.loc[table["model"] == "score", "p_value"].isna().all()
+
+    # Results do not depend on the number of worker processes
+    parallel = bootstrap_metrics(
+        y_true, {"model": model, "score": score}, n_jobs=2, **kwargs
+    )
+    np.testing.assert_allclose(
+        parallel[["ci_lower", "ci_upper", "p_value"]].to_numpy(),
+        table[["ci_lower", "ci_upper", "p_value"]].to_numpy(),
+    )
+
+
+def test_delong(predictions):
+    y_true, model, score = predictions
+
+    ci = delong_roc_ci(y_true, model)
+    assert ci["roc_auc"] == pytest.approx(roc_auc_score(y_true, model))
+    assert ci["ci_lower"] < ci["roc_auc"] < ci["ci_upper"]
+
+    result = delong_roc_test(y_true, model, score)
+    assert result["roc_auc_b"] == pytest.approx(roc_auc_score(y_true, score))
+    assert result["p_value"] < 0.05
+    assert delong_roc_test(y_true, model, model)["p_value"] == pytest.approx(1.0)
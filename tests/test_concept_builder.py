@@ -0,0 +1,198 @@
+import threading
+import pytest
+import sys
+from pathlib import Path
+from data_pipeline.concept_builder import (
+    ConceptBuilder,
+    build_statement,
+    discover_concepts,
+    parse_dependencies,
+)
+import warnings
+
+warnings.filterwarnings("ignore")
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+CONCEPTS_POSTGRES = (
+    Path(__file__).resolve().parent.parent
+    / "data_engineering"
+    / "mimic-iii"
+    / "concepts_postgres"
+)
+
+
+@pytest.fixture
+def concept_dir(tmp_path):
+    """
+    Fixture writing a small concepts tree:
+    labs_first_day and vitals_first_day feed sapsii, cookbook is ignored.
+    """
+    files = {
+        "firstday/labs_first_day.sql": "SELECT icustay_id FROM labevents",
+        "firstday/vitals_first_day.sql": "SELECT icustay_id FROM chartevents",
+        "severityscores/sapsii.sql": """
+            -- uses labs_first_day and vitals_first_day
+            with vitals as (
+                SELECT * FROM `physionet-data.mimiciii_derived.vitals_first_day`
+            )
+            SELECT * FROM vitals v
+            LEFT JOIN labs_first_day l ON v.icustay_id = l.icustay_id
+        """,
+        "cookbook/heart_rate.sql": "SELECT * FROM vitals_first_day",
+    }
+    for name, sql in files.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(sql)
+    return tmp_path
+
+
+def test_parse_dependencies():
+    """
+    Tests that only concept references outside comments and CTEs are parsed.
+    """
+    sql = """
+        -- FROM ignored_in_comment
+        with sofa as (SELECT * FROM pivoted_sofa)
+        SELECT * FROM `physionet-data.mimiciii_derived.icustay_detail` d
+        INNER JOIN sofa s ON d.icustay_id = s.icustay_id
+    """
+    known = {"pivoted_sofa", "icustay_detail", "sofa", "ignored_in_comment"}
+
+    assert parse_dependencies(sql, known) == {"pivoted_sofa", "icustay_detail"}
+
+
+def test_build_statement_wraps_select_scripts():
+    """
+    Tests that SELECT scripts are wrapped and converted scripts kept as is.
+    """
+    statement = build_statement("sapsii", "SELECT 1;\n")
+    assert statement == "DROP TABLE IF EXISTS sapsii; CREATE TABLE sapsii AS\nSELECT 1;"
+
+    converted = "DROP TABLE IF EXISTS sapsii; CREATE TABLE sapsii AS SELECT 1;"
+    assert build_statement("sapsii", converted) == converted
+
+
+def test_concept_builder_rebuilds_only_stale_concepts(concept_dir):
+    executed = []
+    lock = threading.Lock()
+
+    def execute(name, statement):
+        with lock:
+            executed.append(name)
+
+    builder = ConceptBuilder(concept_dir, execute=execute)
+
+    assert "heart_rate" not in builder.concepts
+    assert builder.dependencies["sapsii"] == {"labs_first_day", "vitals_first_day"}
+
+    # First run builds everything, dependencies before dependents
+    report = builder.build()
+    assert {entry["status"] for entry in report} == {"built"}
+    assert executed[-1] == "sapsii"
+    assert all(entry["seconds"] is not None for entry in report)
+
+    # Nothing changed, nothing to do
+    executed.clear()
+    assert ConceptBuilder(concept_dir, execute=execute).build() == []
+
+    # Changing an upstream concept also rebuilds its dependents
+    (concept_dir / "firstday/labs_first_day.sql").write_text(
+        "SELECT icustay_id, 1 AS x FROM labevents"
+    )
+    builder = ConceptBuilder(concept_dir, execute=execute)
+    assert builder.stale_concepts() == ["labs_first_day", "sapsii"]
+    builder.build()
+    assert executed == ["labs_first_day", "sapsii"]
+
+
+def test_concept_builder_skips_dependents_of_failed_builds(concept_dir):
+    def execute(name, statement):
+        if name == "vitals_first_day":
+            raise RuntimeError("relation chartevents does not exist")
+
+    builder = ConceptBuilder(concept_dir, execute=execute)
+    statuses = {entry["name"]: entry["status"] for entry in builder.build()}
+
+    assert statuses == {
+        "labs_first_day": "built",
+        "vitals_first_day": "failed",
+        "sapsii": "skipped",
+    }
+    # Failed and skipped concepts stay stale for the next run
+    assert builder.stale_concepts() == ["vitals_first_day", "sapsii"]
+
+
+@pytest.mark.parametrize("targets", [None, ["labs_first_day"]])
+def test_concept_builder_keeps_dependents_of_changed_concepts_stale(
+    concept_dir, targets
+):
+    """
+    Tests that a dependent whose rebuild fails or is not selected after an
+    upstream change is still stale for a new builder.
+    """
+    ConceptBuilder(concept_dir, execute=lambda name, statement: None).build()
+    (concept_dir / "firstday/labs_first_day.sql").write_text(
+        "SELECT icustay_id, 1 AS x FROM labevents"
+    )
+
+    def execute(name, statement):
+        if name == "sapsii":
+            raise RuntimeError("column x does not exist")
+
+    report = ConceptBuilder(concept_dir, execute=execute).build(targets)
+    assert {entry["name"] for entry in report if entry["status"] == "built"} == {
+        "labs_first_day"
+    }
+    assert ConceptBuilder(concept_dir, execute=execute).stale_concepts() == ["sapsii"]
+
+
+def test_discover_concepts_resolves_duplicates_with_the_driver(tmp_path):
+    """
+    Tests that the driver script picks the file of a duplicated concept name
+    and that the top-level scripts are not concepts.
+    """
+    for name in ["demographics/weight_durations.sql", "durations/weight_durations.sql"]:
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_text("SELECT 1")
+    (tmp_path / "postgres-functions.sql").write_text("CREATE FUNCTION f() ...")
+    with pytest.raises(ValueError, match="weight_durations"):
+        discover_concepts(tmp_path)
+
+    (tmp_path / "postgres-make-concepts.sql").write_text(
+        "\\echo 'start'\n\\i durations/weight_durations.sql\n"
+    )
+    concepts = discover_concepts(tmp_path)
+    assert concepts == {"weight_durations": tmp_path / "durations/weight_durations.sql"}
+
+
+def test_concept_builder_plans_the_postgres_concepts(tmp_path):
+    """
+    Tests discovery and planning on the repository's converted concepts: the
+    functions script runs first and every concept after its dependencies.
+    """
+    executed = []
+    builder = ConceptBuilder(
+        CONCEPTS_POSTGRES,
+        state_file=tmp_path / "state.json",
+        execute=lambda name, statement: executed.append(name),
+    )
+    assert not any(name.startswith("postgres-") for name in builder.concepts)
+    assert builder.concepts["weight_durations"].parent.name == "durations"
+    assert builder.concepts["urine_output"].parent.name == "fluid_balance"
+    assert {"icustay_detail", "sapsii", "apsiii"} <= set(builder.concepts)
+
+    def assert_dependencies_first(order):
+        position = {name: i for i, name in enumerate(order)}
+        for name, dependencies in builder.dependencies.items():
+            assert all(position[other] < position[name] for other in dependencies)
+
+    order = builder.stale_concepts()
+    assert sorted(order) == sorted(builder.concepts)
+    assert_dependencies_first(order)
+
+    report = builder.build(max_workers=1)
+    assert executed[0] == "postgres-functions"
+    assert sorted(executed[1:]) == sorted(order)
+    assert_dependencies_first(executed[1:])
+    assert {entry["status"] for entry in report} == {"built"}
@@ -1,23 +1,42 @@
+import os
+import threading
+import pytest
+from decimal import Decimal
+import numpy as np
 import pandas as pd
 from unittest.mock import patch, MagicMock
 from pathlib import Path
 import sys
-from data_pipeline.extractor import execute_query
+from sklearn.preprocessing import StandardScaler
+from data_pipeline.extractor import (
+    execute_query,
+    execute_query_in_chunks,
+    extract_concept_tables,
+)
+from data_pipeline.cache import QueryCache, normalize_query
+from data_pipeline.schema import compact_dtypes, fill_missing
+from data_pipeline.transformer import (
+    prepare_chunks,
+    fit_scaler_in_chunks,
+    scale_chunks,
+    join_on_keys,
+)
 import warnings
 
 warnings.filterwarnings("ignore")
 sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
 
 
-@patch("data_pipeline.extractor.create_connection")
+@patch("data_pipeline.extractor.get_connection_pool")
 @patch("pandas.read_sql_query")
-def test_execute_query(mock_read_sql_query, mock_create_connection):
+def test_execute_query(mock_read_sql_query, mock_get_connection_pool):
     """
     Tests the `execute_query` function by mocking the database connection.
     """
-    # Mock the connection object and cursor
+    # Mock the connection object and the pool handing it out
     mock_con = MagicMock()
-    mock_create_connection.return_value = (mock_con, None)
+    mock_pool = mock_get_connection_pool.return_value
+    mock_pool.connection.return_value.__enter__.return_value = mock_con
 
     # Mock DataFrame result
     expected_df = pd.DataFrame({"column1": [1, 2], "column2": ["A", "B"]})
@@ -33,10 +52,287 @@ def test_execute_query(mock_read_sql_query, mock_create_connection):
 
     # Test without providing a connection
     result_df = execute_query(query)
-    mock_create_connection.assert_called_once()
+    mock_pool.connection.assert_called_once()
     mock_read_sql_query.assert_called_with(query, mock_con)
+    mock_pool.connection.return_value.__exit__.assert_called_once()
     pd.testing.assert_frame_equal(result_df, expected_df)
 
 
+def make_streaming_connection(rows, columns):
+    """
+    Builds a mock connection whose named cursor serves `rows` via fetchmany.
+    """
+    mock_con = MagicMock()
+    mock_cur = mock_con.cursor.return_value.__enter__.return_value
+    mock_cur.description = [(column,) for column in columns]
+
+    def fetchmany(size):
+        batch = rows[:size]
+        del rows[:size]
+        return batch
+
+    mock_cur.fetchmany.side_effect = fetchmany
+    return mock_con, mock_cur
+
+
+def test_execute_query_in_chunks():
+    """
+    Tests that `execute_query_in_chunks` streams typed chunks through a named cursor.
+    """
+    rows = [(1, 0.5, "M"), (2, None, "F"), (3, 1.5, "F"), (4, 2.5, "M"), (5, 3.5, "F")]
+    mock_con, mock_cur = make_streaming_connection(
+        list(rows), ["icustay_id", "hr_score", "gender"]
+    )
+
+    chunks = list(
+        execute_query_in_chunks(
+            "SELECT * FROM sapsii;",
+            chunk_size=2,
+            con=mock_con,
+            dtypes={"hr_score": "float32"},
+        )
+    )
+
+    # A server-side cursor is requested by giving it a name
+    assert mock_con.cursor.call_args.kwargs["name"].startswith("chunked_")
+    mock_cur.execute.assert_called_once_with("SELECT * FROM sapsii;")
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert all(chunk["hr_score"].dtype == np.float32 for chunk in chunks)
+    assert chunks[0]["icustay_id"].dtype == np.int64
+    assert np.isnan(chunks[0]["hr_score"].iloc[1])
+
+    full = pd.concat(chunks, ignore_index=True)
+    assert full["icustay_id"].tolist() == [1, 2, 3, 4, 5]
+
+
+def test_chunk_transformations_match_full_frame():
+    """
+    Tests that chunked cleaning and scaling reproduce the in-memory pipeline.
+    """
+    df = pd.DataFrame(
+        {
+            "subject_id": np.arange(10),
+            "age_score": [0, 7, np.nan, 12, 15, 16, 18, np.nan, 7, 12],
+            "hr_score": [0, 2, 4, 7, 11, np.nan, 0, 2, 4, 7],
+        }
+    )
+    chunks = [df.iloc[i : i + 3] for i in range(0, len(df), 3)]
+
+    prepared = list(prepare_chunks(chunks, drop_columns=["subject_id"]))
+    scaler = fit_scaler_in_chunks(prepared)
+    scaled = pd.concat(scale_chunks(prepared, scaler))
+
+    expected_input = df.drop(columns=["subject_id"]).fillna(0)
+    expected = StandardScaler().fit_transform(expected_input)
+
+    assert list(scaled.columns) == ["age_score", "hr_score"]
+    np.testing.assert_allclose(scaled.to_numpy(), expected)
+
+
+def test_query_cache_round_trip(tmp_path):
+    """
+    Tests that cached frames are memory-mapped and keep their dtypes.
+    """
+    df = pd.DataFrame(
+        {
+            "icustay_id": np.array([1, 2, 3], dtype=np.int64),
+            "sapsii_prob": [0.1, np.nan, 0.3],
+            "gender": pd.Categorical(["M", "F", "F"]),
+            "age_score": pd.array([7, None, 12], dtype="Int8"),
+            "ethnicity": ["WHITE", None, "ASIAN"],
+        }
+    )
+    cache = QueryCache(tmp_path, data_version="mimic-iii-1.4")
+    cache.put("SELECT * FROM sapsii;", df)
+
+    cached = cache.get("SELECT *\n  FROM sapsii")
+
+    pd.testing.assert_frame_equal(cached, df)
+
+    # Numeric columns are views on the memory-mapped file
+    values = cached["sapsii_prob"].to_numpy()
+    while values.base is not None and not isinstance(values, np.memmap):
+        values = values.base
+    assert isinstance(values, np.memmap)
+
+    # Keys depend on the data version and schema, not just the query
+    assert (
+        QueryCache(tmp_path, data_version="other").get("SELECT * FROM sapsii") is None
+    )
+    assert normalize_query(" SELECT  1 ;\n") == "SELECT 1"
+
+
+@patch("data_pipeline.extractor.get_connection_pool")
+@patch("pandas.read_sql_query")
+def test_execute_query_with_cache(
+    mock_read_sql_query, mock_get_connection_pool, tmp_path
+):
+    """
+    Tests that `execute_query` only reaches the database on a cache miss.
+    """
+    mock_read_sql_query.return_value = pd.DataFrame({"column1": [1, 2]})
+    cache = QueryCache(tmp_path)
+    query = "SELECT * FROM ADMISSIONS;"
+
+    first = execute_query(query, cache=cache)
+    second = execute_query(query, cache=cache)
+
+    mock_read_sql_query.assert_called_once()
+    mock_get_connection_pool.assert_called_once()
+    pd.testing.assert_frame_equal(first, second)
+
+    assert cache.invalidate(query)
+    assert cache.get(query) is None
+
+
+def test_query_cache_evicts_least_recently_used(tmp_path):
+    """
+    Tests that the cache drops the least recently used entries beyond max_bytes.
+    """
+    df = pd.DataFrame({"value": np.zeros(1000)})
+    cache = QueryCache(tmp_path)
+    cache.put("SELECT 1", df)
+    entry_size = cache.size()
+    cache.max_bytes = int(entry_size * 2.5)
+
+    cache.put("SELECT 2", df)
+    # Touch the first entry so the second becomes least recently used
+    os.utime(tmp_path / cache.key("SELECT 2") / "manifest.json", (1, 1))
+    cache.get("SELECT 1")
+    cache.put("SELECT 3", df)
+
+    assert cache.get("SELECT 1") is not None
+    assert cache.get("SELECT 2") is None
+    assert cache.get("SELECT 3") is not None
+    assert cache.size() <= cache.max_bytes
+
+
+def test_compact_dtypes():
+    """
+    Tests that extracted frames are converted to the declared compact dtypes.
+    """
+    n = 1000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "subject_id": np.arange(n, dtype=np.int64),
+            "age_score": rng.choice([0.0, 7.0, 12.0, np.nan], size=n),
+            "heartrate_mean": rng.normal(80, 10, size=n),
+            "gender": rng.choice(["M", "F"], size=n).astype(object),
+            "ethnicity": rng.choice(["WHITE", "BLACK", None], size=n),
+            "sapsii_prob": [Decimal("0.25")] * n,
+            "mortality": rng.integers(0, 2, size=n),
+        }
+    )
+
+    compact = compact_dtypes(df)
+
+    assert compact["subject_id"].dtype == "Int32"
+    assert compact["age_score"].dtype == "Int16"
+    assert compact["age_score"].isna().sum() == df["age_score"].isna().sum()
+    assert compact["heartrate_mean"].dtype == np.float32
+    assert isinstance(compact["gender"].dtype, pd.CategoricalDtype)
+    assert isinstance(compact["ethnicity"].dtype, pd.CategoricalDtype)
+    assert compact["sapsii_prob"].dtype == np.float32
+    assert compact["mortality"].dtype == "Int8"
+
+    assert compact.memory_usage(deep=True).sum() * 2 < df.memory_usage(deep=True).sum()
+
+    # The input frame is left untouched and fillna keeps the compact dtypes
+    assert df["age_score"].dtype == np.float64
+    assert compact.fillna({"age_score": 0})["age_score"].dtype == "Int16"
+
+    # Chunked extraction keeps undeclared strings as objects
+    chunk = compact_dtypes(df, categorize=False)
+    assert chunk["ethnicity"].dtype == object
+
+
+def test_fill_missing_on_compact_frames():
+    """
+    Tests that NULLs in categorical columns of compact frames can be filled
+    with the notebooks' 0.
+    """
+    df = compact_dtypes(
+        pd.DataFrame(
+            {
+                "gender": ["M", None, "F"],
+                "ethnicity": ["WHITE", "ASIAN", None],
+                "age_score": [7.0, np.nan, 12.0],
+            }
+        )
+    )
+    with pytest.raises(TypeError):
+        df.fillna(0)
+
+    filled = fill_missing(df)
+    assert filled.notna().all().all()
+    assert filled["gender"].tolist() == ["M", 0, "F"]
+    assert filled["ethnicity"].tolist() == ["WHITE", "ASIAN", 0]
+    assert filled["age_score"].dtype == "Int16"
+    assert df["gender"].isna().sum() == 1
+
+    prepared = next(prepare_chunks([df], drop_columns=["age_score"]))
+    pd.testing.assert_frame_equal(prepared, filled.drop(columns="age_score"))
+
+
+@patch("data_pipeline.extractor.execute_query")
+def test_extract_concept_tables_runs_queries_concurrently(mock_execute_query):
+    """
+    Tests that concept queries run at the same time and are joined on their keys.
+    """
+    tables = {
+        "sapsii": pd.DataFrame(
+            {
+                "subject_id": [2, 1],
+                "hadm_id": [20, 10],
+                "icustay_id": [200, 100],
+                "sapsii": [30, 40],
+            }
+        ),
+        "vitals": pd.DataFrame(
+            {
+                "subject_id": [1, 2],
+                "hadm_id": [10, 20],
+                "icustay_id": [100, 200],
+                "heartrate_mean": [80.0, 95.0],
+            }
+        ),
+        "admissions": pd.DataFrame(
+            {"subject_id": [1, 2], "hadm_id": [10, 20], "sapsii": [1, 0]}
+        ),
+    }
+    # Every query waits until all of them are in flight
+    barrier = threading.Barrier(len(tables), timeout=5)
+
+    def run_query(query, cache=None, compact=False):
+        barrier.wait()
+        return tables[query]
+
+    mock_execute_query.side_effect = run_query
+
+    result = extract_concept_tables({name: name for name in tables}, max_workers=3)
+
+    assert mock_execute_query.call_count == 3
+    assert list(result["subject_id"]) == [1, 2]
+    assert list(result["heartrate_mean"]) == [80.0, 95.0]
+    assert list(result["sapsii"]) == [40, 30]
+    # Clashing non-key columns are suffixed with the table name
+    assert list(result["sapsii_admissions"]) == [1, 0]
+
+
+def test_join_on_keys_requires_shared_key():
+    """
+    Tests that joining a table without any common key is rejected.
+    """
+    frames = {
+        "sapsii": pd.DataFrame({"icustay_id": [1]}),
+        "other": pd.DataFrame({"itemid": [1]}),
+    }
+
+    with pytest.raises(ValueError):
+        join_on_keys(frames)
+
+
 # if __name__ == "__main__":
 #     pytest.main()
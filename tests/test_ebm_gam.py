@@ -1,9 +1,14 @@
 import pytest
+import numpy as np
 import pandas as pd
 from interpret.glassbox import ExplainableBoostingClassifier
+from sklearn.metrics import roc_auc_score
 import sys
 from pathlib import Path
+from gams.ebm_scorer import EBMLookupScorer
 from gams.ebm_gam import (
+    compile_ebm_model,
+    staged_decision_function,
     train_ebm_model,
     display_global_explanation_with_full_feature_names,
 )
@@ -82,6 +87,18 @@ def test_train_ebm_model(sample_data):
     assert results["model_summary"]["objective"] == "log_loss"
 
 
+def test_train_ebm_model_single_pass_labels(sample_data):
+    X_train, y_train, X_test = sample_data
+
+    ebm_model, results = train_ebm_model(
+        X_train, y_train, X_test, outer_bags=2, compute_training_accuracy=False
+    )
+
+    # Labels derived from the probabilities match the model's own predict
+    assert list(results["y_pred"]) == list(ebm_model.predict(X_test))
+    assert results["training_accuracy"] is None
+
+
 @pytest.fixture
 def ebm_model():
     # Dummy data and model for testing
@@ -101,5 +118,81 @@ def test_display_global_explanation_with_full_feature_names(ebm_model):
         pytest.fail(f"Displaying global explanation failed with error: {e}")
 
 
+@pytest.fixture
+def mixed_data():
+    # Continuous and categorical features, with interactions and missing values
+    rng = np.random.default_rng(0)
+    n = 300
+    X = pd.DataFrame(
+        {
+            "age": rng.normal(65, 15, n),
+            "heart_rate": rng.normal(90, 20, n),
+            "admission_type": rng.choice(["EMERGENCY", "ELECTIVE", "URGENT"], n),
+        }
+    )
+    logit = 0.05 * (X["age"] - 65) + (X["admission_type"] == "EMERGENCY")
+    y = pd.Series((logit + rng.normal(0, 1, n) > 0.5).astype(int))
+    return X, y
+
+
+def test_compile_ebm_model_reproduces_predict_proba(mixed_data, tmp_path):
+    X, y = mixed_data
+    model = ExplainableBoostingClassifier(outer_bags=2, interactions=2)
+    model.fit(X, y)
+    scorer = compile_ebm_model(model)
+
+    X_new = X.copy()
+    X_new.loc[0, "age"] = np.nan
+    X_new.loc[1, "admission_type"] = "NEWBORN"  # unseen category
+    X_new.loc[2, "heart_rate"] = np.inf
+
+    expected = model.predict_proba(X_new)
+    np.testing.assert_allclose(scorer.predict_proba(X_new), expected, rtol=1e-10)
+    assert list(scorer.predict(X_new)) == list(model.predict(X_new))
+    np.testing.assert_allclose(
+        scorer.eval_terms(X_new).sum(axis=1) + scorer.intercept,
+        scorer.decision_function(X_new),
+    )
+
+    # Reordered columns are selected by name
+    np.testing.assert_allclose(
+        scorer.predict_proba(X_new[X_new.columns[::-1]]), expected, rtol=1e-10
+    )
+    # Frames without exactly the training columns are rejected
+    with pytest.raises(ValueError):
+        scorer.predict_proba(X_new.rename(columns={"age": "years"}))
+    with pytest.raises(ValueError):
+        scorer.predict_proba(X_new.assign(extra=0.0))
+
+    # Saved artifacts load without interpret and score identically
+    loaded = EBMLookupScorer.load(scorer.save(tmp_path / "ebm"))
+    np.testing.assert_allclose(loaded.predict_proba(X_new), expected, rtol=1e-10)
+    assert loaded.term_names == list(model.term_names_)
+
+
+def test_train_ebm_model_reports_staged_bags(mixed_data):
+    X, y = mixed_data
+    log = []
+
+    model, results = train_ebm_model(
+        X[:200],
+        y[:200],
+        X[200:],
+        y_test=y[200:],
+        outer_bags=3,
+        max_rounds=200,
+        n_jobs=1,
+        progress_callback=lambda step, value: log.append((step, value)),
+    )
+
+    assert [step for step, _ in log] == [0, 1, 2]
+    staged = staged_decision_function(model, X[200:])
+    np.testing.assert_allclose(staged[-1], model.decision_function(X[200:]))
+    assert log[-1][1] == pytest.approx(roc_auc_score(y[200:], results["y_pred_prob"]))
+
+    with pytest.raises(ValueError):
+        train_ebm_model(X, y, X, progress_callback=print)
+
+
 if __name__ == "__main__":
     pytest.main()
@@ -0,0 +1,94 @@
+import pytest
+import numpy as np
+import matplotlib
+from sklearn import metrics
+import sys
+from pathlib import Path
+from ml_models.evalauion_results import (
+    compute_metrics,
+    evaluate_model,
+    plot_evaluation,
+)
+
+import warnings
+
+warnings.filterwarnings("ignore")
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+matplotlib.use("Agg")
+
+
+@pytest.fixture
+def scores():
+    # Rounded scores produce many ties
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(0, 2, 500)
+    y_pred_prob = np.round(rng.random(500) * 0.6 + 0.3 * y_true, 2)
+    return y_true, y_pred_prob
+
+
+def test_compute_metrics_matches_sklearn(scores):
+    y_true, y_pred_prob = scores
+    thresholds = [0.2, 0.5, 0.7]
+
+    result = compute_metrics(y_true, y_pred_prob, thresholds)
+
+    precision, recall, _ = metrics.precision_recall_curve(y_true, y_pred_prob)
+    assert result["roc_auc"] == pytest.approx(
+        metrics.roc_auc_score(y_true, y_pred_prob)
+    )
+    assert result["roc_prc"] == pytest.approx(metrics.auc(recall, precision))
+
+    table = result["thresholds"]
+    assert list(table["threshold"]) == thresholds
+    for row, threshold in zip(table.itertuples(), thresholds):
+        y_pred = (y_pred_prob > threshold).astype(int)
+        confusion = metrics.confusion_matrix(y_true, y_pred)
+        assert [[row.tn, row.fp], [row.fn, row.tp]] == confusion.tolist()
+        assert row.accuracy == pytest.approx(metrics.accuracy_score(y_true, y_pred))
+        assert row.f1_score == pytest.approx(metrics.f1_score(y_true, y_pred))
+        assert row.precision == pytest.approx(
+            metrics.precision_score(y_true, y_pred, zero_division=0)
+        )
+
+
+def test_compute_metrics_requires_both_classes():
+    with pytest.raises(ValueError):
+        compute_metrics([1, 1, 1], [0.2, 0.5, 0.9])
+
+
+def test_evaluate_model_headless(scores, mocker):
+    y_true, y_pred_prob = scores
+    y_pred = (y_pred_prob > 0.5).astype(int)
+    show = mocker.patch("matplotlib.pyplot.show")
+
+    result = evaluate_model(
+        y_true, y_pred, y_pred_prob, plot=False, include_report=False, thresholds=0.5
+    )
+
+    show.assert_not_called()
+    assert result["classification_report"] is None
+    assert result["test_accuracy"] == pytest.approx(
+        metrics.accuracy_score(y_true, y_pred)
+    )
+    assert result["f1_score"] == pytest.approx(metrics.f1_score(y_true, y_pred))
+    np.testing.assert_array_equal(
+        result["confusion_matrix"], metrics.confusion_matrix(y_true, y_pred)
+    )
+    assert result["thresholds"]["tp"].iloc[0] == result["confusion_matrix"][1, 1]
+
+
+def test_evaluate_model_plots_on_request(scores, mocker):
+    y_true, y_pred_prob = scores
+    y_pred = (y_pred_prob > 0.5).astype(int)
+    show = mocker.patch("matplotlib.pyplot.show")
+
+    result = evaluate_model(y_true, y_pred, y_pred_prob)
+
+    show.assert_called_once()
+    assert isinstance(result["classification_report"], str)
+
+    figure = plot_evaluation(
+        y_true, y_pred_prob, result["confusion_matrix"], show=False
+    )
+    assert len(figure.axes) >= 2
+    assert show.call_count == 1
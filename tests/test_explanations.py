@@ -0,0 +1,84 @@
+import numpy as np
+from interpret.glassbox import ExplainableBoostingClassifier
+from pygam import LogisticGAM, l, s, te
+import sys
+from pathlib import Path
+from gams.ebm_gam import compile_ebm_model
+from gams.explanations import (
+    _ebm_term_names,
+    explain_ebm_batch,
+    explain_logistic_gam_batch,
+    term_feature_names,
+)
+
+import warnings
+
+warnings.filterwarnings("ignore")
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+
+def test_explain_ebm_batch_matches_explain_local(cohort):
+    X, y = cohort
+    model = ExplainableBoostingClassifier(
+        interactions=[(0, 1)], outer_bags=2, max_rounds=200, random_state=0
+    )
+    model.fit(X.to_numpy(), y)
+    names = list(X.columns)
+
+    contributions = explain_ebm_batch(model, X.to_numpy(), feature_names=names)
+    assert contributions.shape == (len(X), len(model.term_features_))
+    assert list(contributions.columns) == [
+        "age",
+        "heart_rate",
+        "gcs",
+        "age & heart_rate",
+    ]
+
+    local = model.explain_local(X.to_numpy()[:5], y[:5])
+    for i in range(5):
+        np.testing.assert_allclose(
+            contributions.iloc[i].to_numpy(), local.data(i)["scores"], rtol=1e-10
+        )
+
+    # The compiled scorer gives the same matrix and the rows add up
+    scorer = compile_ebm_model(model)
+    with_intercept = explain_ebm_batch(
+        scorer, X.to_numpy(), feature_names=names, include_intercept=True
+    )
+    np.testing.assert_allclose(
+        with_intercept.sum(axis=1), model.decision_function(X.to_numpy()), rtol=1e-10
+    )
+
+    # Column indexes work as names, too
+    by_index = explain_ebm_batch(scorer, X.to_numpy(), feature_names=X.columns)
+    assert list(by_index.columns) == list(contributions.columns)
+
+
+def test_term_feature_names_are_cached():
+    _ebm_term_names.cache_clear()
+    names = ["age", "heart_rate"]
+    assert term_feature_names([(0,), (0, 1)], names) == ["age", "age & heart_rate"]
+    term_feature_names([(0,), (0, 1)], names)
+    assert _ebm_term_names.cache_info().hits == 1
+
+
+def test_explain_logistic_gam_batch_matches_partial_dependence(cohort):
+    X, y = cohort
+    model = LogisticGAM(s(0) + l(1) + te(s(0), s(2))).fit(X, y)
+
+    contributions = explain_logistic_gam_batch(model, X)
+    assert list(contributions.columns) == ["s(age)", "l(heart_rate)", "te(age, gcs)"]
+    for term_idx, column in enumerate(contributions.columns):
+        np.testing.assert_allclose(
+            contributions[column],
+            model.partial_dependence(term_idx, X.to_numpy()),
+            rtol=1e-8,
+            atol=1e-10,
+        )
+
+    with_intercept = explain_logistic_gam_batch(model, X, include_intercept=True)
+    logits = np.log(model.predict_mu(X) / (1 - model.predict_mu(X)))
+    np.testing.assert_allclose(with_intercept.sum(axis=1), logits, rtol=1e-8)
+    assert explain_logistic_gam_batch(model, X.to_numpy()).columns[0] == (
+        "s(feature_0000)"
+    )
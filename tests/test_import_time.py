@@ -0,0 +1,65 @@
+import pytest
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import warnings
+
+warnings.filterwarnings("ignore")
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+# Visualization, explanation and other-model packages a core import must not load
+HEAVY = ("matplotlib", "interpret", "pygam", "xgboost", "sklearn", "scipy", "dash")
+
+# Wall-clock budgets depend on the machine, so they are only checked on request
+CHECK_TIMES = os.environ.get("CHECK_IMPORT_TIME", "") not in ("", "0")
+
+# Core training/scoring module -> (seconds budget, packages it may load)
+BUDGETS = {
+    "ml_models.artifacts": (1.0, ()),
+    "gams.ebm_scorer": (1.0, ()),
+    "gams.gam_scorer": (1.0, ()),
+    "ml_models.tree_scorer": (1.0, ()),
+    "ml_models.evalauion_results": (2.0, ()),
+    "ml_models.benchmark": (2.0, ()),
+    "gams.ebm_gam": (2.0, ()),
+    "serving.server": (2.0, ()),
+    "ml_models.random_forest": (4.0, ("sklearn", "scipy")),
+    "ml_models.xgb_model": (4.0, ("xgboost", "sklearn", "scipy")),
+    "gams.logistic_gam": (4.0, ("pygam", "scipy")),
+    "tuning.objectives": (5.0, ("sklearn", "scipy")),
+}
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+loaded = sorted({{name.split(".")[0] for name in sys.modules}})
+print(json.dumps({{"seconds": seconds, "loaded": loaded}}))
+"""
+
+
+@pytest.mark.parametrize("module", sorted(BUDGETS))
+def test_core_import_time(module):
+    budget, allowed = BUDGETS[module]
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(module=module)],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    unexpected = set(HEAVY).intersection(result["loaded"]) - set(allowed)
+    assert not unexpected, "{} imports {}".format(module, sorted(unexpected))
+    if CHECK_TIMES:
+        assert result["seconds"] < budget, "{} took {:.2f}s".format(
+            module, result["seconds"]
+        )
@@ -1,10 +1,11 @@
 import pytest
 import pandas as pd
 import numpy as np
-from pygam import LogisticGAM
+from pygam import LogisticGAM, f, l, s, te
 import sys
 from pathlib import Path
-from gams.logistic_gam import train_logistic_gam_model
+from gams.gam_scorer import GAMSplineScorer
+from gams.logistic_gam import compile_logistic_gam_model, train_logistic_gam_model
 import warnings
 
 warnings.filterwarnings("ignore")
@@ -15,6 +16,7 @@ sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
 
 @pytest.fixture
 def sample_data():
+    np.random.seed(0)
     X_train = pd.DataFrame(np.random.randn(100, 5))
     y_train = pd.Series(np.random.randint(0, 2, size=100))
     X_test = pd.DataFrame(np.random.randn(20, 5))
@@ -42,5 +44,88 @@ def test_train_logistic_gam_model(sample_data):
     assert len(results["y_pred"]) == len(X_test)
 
 
+def test_train_logistic_gam_model_single_pass_labels(sample_data):
+    X_train, y_train, X_test = sample_data
+
+    model, results = train_logistic_gam_model(
+        X_train, y_train, X_test, verbose=False, include_summary=False
+    )
+
+    # Labels derived from the probabilities match the model's own predict
+    np.testing.assert_array_equal(results["y_pred"], model.predict(X_test))
+    assert results["training_accuracy"] == model.score(X_train, y_train)
+
+    _, results = train_logistic_gam_model(
+        X_train,
+        y_train,
+        X_test,
+        verbose=False,
+        include_summary=False,
+        compute_training_accuracy=False,
+    )
+    assert results["training_accuracy"] is None
+
+
+def test_train_logistic_gam_model_reports_deviance(sample_data):
+    X_train, y_train, X_test = sample_data
+    log = []
+
+    gam_model, _ = train_logistic_gam_model(
+        X_train,
+        y_train,
+        X_test,
+        verbose=False,
+        include_summary=False,
+        progress_callback=lambda step, value: log.append((step, value)),
+    )
+
+    assert [step for step, _ in log] == list(range(len(log)))
+    np.testing.assert_allclose([value for _, value in log], gam_model.logs_["deviance"])
+    assert "progress" not in [str(c) for c in gam_model.callbacks]
+
+
+@pytest.mark.parametrize(
+    "terms",
+    [
+        None,
+        s(0, spline_order=2, n_splines=7) + s(1, basis="cp") + f(2, coding="dummy"),
+        te(0, 3) + s(1, by=3) + f(2) + l(3),
+    ],
+)
+def test_compile_logistic_gam_model_reproduces_predict_proba(terms, tmp_path):
+    rng = np.random.default_rng(0)
+    X = np.column_stack(
+        [
+            rng.normal(0, 1, 300),
+            rng.uniform(0, 10, 300),
+            rng.integers(0, 4, 300),
+            rng.normal(5, 2, 300),
+        ]
+    )
+    y = (np.sin(X[:, 0]) + 0.2 * X[:, 1] + rng.normal(0, 1, 300) > 0.8).astype(int)
+    model = LogisticGAM(terms, max_iter=30).fit(X, y)
+    scorer = compile_logistic_gam_model(model)
+
+    # Include values outside the knot range, where splines extrapolate
+    X_new = X.copy()
+    X_new[:3, 0] = [-10.0, 10.0, 0.0]
+    X_new[3:5, 1] = [-3.0, 13.0]
+
+    expected = model.predict_proba(X_new)
+    np.testing.assert_allclose(scorer.predict_proba(X_new), expected, rtol=1e-10)
+    np.testing.assert_array_equal(scorer.predict(X_new), model.predict(X_new))
+    for term_idx, term in enumerate(model.terms):
+        if not term.isintercept:
+            np.testing.assert_allclose(
+                scorer.partial_dependence(X_new, term_idx),
+                model.partial_dependence(term_idx, X_new),
+                atol=1e-10,
+            )
+
+    # Saved artifacts load without pygam and score identically
+    loaded = GAMSplineScorer.load(scorer.save(tmp_path / "gam"))
+    np.testing.assert_allclose(loaded.predict_proba(X_new), expected, rtol=1e-10)
+
+
 if __name__ == "__main__":
     pytest.main()
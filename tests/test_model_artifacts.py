@@ -0,0 +1,79 @@
+import pytest
+import json
+import numpy as np
+import pandas as pd
+import sys
+from pathlib import Path
+from gams.ebm_gam import train_ebm_model
+from gams.logistic_gam import train_logistic_gam_model
+from ml_models.artifacts import load_metadata, load_model, save_model
+from ml_models.random_forest import train_random_forest_model
+from ml_models.xgb_model import train_xgboost_model
+from utils.prediction import positive_class_proba
+
+import warnings
+
+warnings.filterwarnings("ignore")
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+
+@pytest.fixture
+def sample_data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(300, 4)), columns=["age", "hr", "bp", "gcs"])
+    y = pd.Series((X["age"] - X["gcs"] + rng.normal(size=300) > 0).astype(int))
+    return X[:200], y[:200], X[200:]
+
+
+@pytest.mark.parametrize(
+    "train, params",
+    [
+        (train_logistic_gam_model, {"verbose": False, "include_summary": False}),
+        (train_ebm_model, {"outer_bags": 2, "max_rounds": 100, "n_jobs": 1}),
+        (train_random_forest_model, {"n_estimators": 20, "random_state": 0}),
+        (train_xgboost_model, {"n_estimators": 20}),
+    ],
+)
+def test_save_and_load_model(sample_data, tmp_path, train, params):
+    X_train, y_train, X_test = sample_data
+    model, results = train(X_train, y_train, X_test, **params)
+
+    directory = save_model(
+        model,
+        tmp_path / "model",
+        model_summary=results["model_summary"],
+        feature_names=list(X_train.columns),
+    )
+    scorer = load_model(directory)
+    np.testing.assert_allclose(
+        positive_class_proba(scorer, X_test.to_numpy()),
+        results["y_pred_prob"],
+        atol=1e-6,
+    )
+
+    metadata = load_metadata(directory)
+    assert metadata["model_type"] == type(model).__name__
+    assert metadata["feature_names"] == ["age", "hr", "bp", "gcs"]
+    assert metadata["version"] == 1
+    assert isinstance(metadata["model_summary"], type(results["model_summary"]))
+
+
+def test_load_model_rejects_unknown_artifacts(sample_data, tmp_path):
+    X_train, y_train, X_test = sample_data
+    model, _ = train_random_forest_model(X_train, y_train, X_test, n_estimators=5)
+    directory = save_model(model, tmp_path / "forest")
+
+    manifest_path = directory / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    manifest["version"] = 99
+    manifest_path.write_text(json.dumps(manifest))
+    with pytest.raises(ValueError, match="version 99"):
+        load_model(directory)
+
+    manifest["format"] = "pickle"
+    manifest_path.write_text(json.dumps(manifest))
+    with pytest.raises(ValueError):
+        load_model(directory)
+
+    with pytest.raises(TypeError):
+        save_model(object(), tmp_path / "object")
@@ -0,0 +1,90 @@
+import pytest
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+import sys
+from pathlib import Path
+from ml_models.random_forest import (
+    compile_random_forest_model,
+    train_random_forest_model,
+)
+from ml_models.tree_scorer import TreeEnsembleScorer
+
+import warnings
+
+warnings.filterwarnings("ignore")
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+
+@pytest.fixture
+def sample_data():
+    rng = np.random.default_rng(0)
+    X_train = pd.DataFrame(rng.normal(size=(60, 3)), columns=["a", "b", "c"])
+    y_train = pd.Series((X_train["a"] + rng.normal(size=60) > 0).astype(int))
+    X_test = pd.DataFrame(rng.normal(size=(20, 3)), columns=["a", "b", "c"])
+    return X_train, y_train, X_test
+
+
+def test_train_random_forest_model(sample_data):
+    X_train, y_train, X_test = sample_data
+
+    rf_model, results = train_random_forest_model(
+        X_train, y_train, X_test, n_estimators=20, random_state=0
+    )
+
+    assert isinstance(rf_model, RandomForestClassifier)
+    for key in ["y_pred", "y_pred_prob", "model_summary", "training_accuracy"]:
+        assert key in results
+
+    # Labels derived from the probabilities match the model's own predict
+    np.testing.assert_array_equal(results["y_pred"], rf_model.predict(X_test))
+    assert results["training_accuracy"] == rf_model.score(X_train, y_train)
+
+
+def test_train_random_forest_model_without_training_accuracy(sample_data):
+    X_train, y_train, X_test = sample_data
+
+    _, results = train_random_forest_model(
+        X_train,
+        y_train,
+        X_test,
+        n_estimators=20,
+        random_state=0,
+        compute_training_accuracy=False,
+        threshold=1.0,
+    )
+
+    assert results["training_accuracy"] is None
+    assert (results["y_pred"] == 0).all()
+
+
+def test_compile_random_forest_model_reproduces_predict_proba(tmp_path):
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(400, 5)), columns=list("abcde"))
+    y = (X["a"] + X["b"] * X["c"] + rng.normal(size=400) > 0).astype(int)
+    X.iloc[::9, 2] = np.nan
+    model = RandomForestClassifier(n_estimators=30, random_state=0).fit(X, y)
+
+    scorer = compile_random_forest_model(model)
+    X_new = X.sample(frac=1.0, random_state=0)
+    expected = model.predict_proba(X_new)
+    np.testing.assert_allclose(scorer.predict_proba(X_new), expected, atol=1e-6)
+    np.testing.assert_array_equal(scorer.predict(X_new), model.predict(X_new))
+    # Columns are reordered by name
+    np.testing.assert_allclose(
+        scorer.predict_proba(X_new[list("edcba")]), expected, atol=1e-6
+    )
+    # Frames without exactly the training columns are rejected
+    with pytest.raises(ValueError):
+        scorer.predict_proba(X_new.rename(columns={"e": "f"}))
+    with pytest.raises(ValueError):
+        scorer.predict_proba(X_new.assign(f=0.0))
+    # Arrays are taken in training column order
+    np.testing.assert_allclose(
+        scorer.predict_proba(X_new.to_numpy()), expected, atol=1e-6
+    )
+
+    loaded = TreeEnsembleScorer.load(scorer.save(tmp_path / "forest"))
+    assert isinstance(loaded.nodes["threshold"], np.memmap)
+    assert loaded.nodes["threshold"].dtype == np.float32
+    np.testing.assert_allclose(loaded.predict_proba(X_new), expected, atol=1e-6)
@@ -0,0 +1,265 @@
+import pytest
+import http.client
+import json
+import socket
+import threading
+import time
+import numpy as np
+import pandas as pd
+import sys
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from gams.ebm_gam import train_ebm_model
+from ml_models.artifacts import save_model
+from ml_models.random_forest import train_random_forest_model
+from serving.batcher import LatencyStats, MicroBatcher
+from serving.server import ScoringService, make_server
+from utils.prediction import positive_class_proba
+
+import warnings
+
+warnings.filterwarnings("ignore")
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def request(connection, method, path, body=None):
+    payload = None if body is None else json.dumps(body)
+    connection.request(method, path, body=payload)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+@pytest.fixture(scope="module")
+def models(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(300, 3)), columns=["age", "hr", "gcs"])
+    y = pd.Series((X["age"] - X["gcs"] + rng.normal(size=300) > 0).astype(int))
+    directory = tmp_path_factory.mktemp("artifacts")
+    ebm, _ = train_ebm_model(
+        X[:200], y[:200], X[200:], outer_bags=2, max_rounds=100, n_jobs=1
+    )
+    forest, _ = train_random_forest_model(
+        X[:200], y[:200], X[200:], n_estimators=10, random_state=0
+    )
+    return {
+        "X": X[200:],
+        "ebm": ebm,
+        "forest": forest,
+        "paths": {
+            "ebm": save_model(ebm, directory / "ebm"),
+            "forest": save_model(forest, directory / "forest"),
+        },
+    }
+
+
+@pytest.fixture
+def server(models):
+    service = ScoringService(models["paths"], max_batch_size=16, max_latency_ms=20)
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def test_micro_batcher_coalesces_and_isolates_failures():
+    calls = []
+
+    def handler(items):
+        calls.append(len(items))
+        if "bad" in items:
+            raise ValueError("bad item")
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(handler, max_batch_size=4, max_latency_ms=200)
+    futures = [batcher.submit(i) for i in range(6)]
+    assert [future.result(5) for future in futures] == [0, 2, 4, 6, 8, 10]
+    assert calls == [4, 2]
+
+    calls.clear()
+    futures = [batcher.submit(item) for item in (1, "bad", 3)]
+    assert futures[0].result(5) == 2 and futures[2].result(5) == 6
+    with pytest.raises(ValueError, match="bad item"):
+        futures[1].result(5)
+    assert calls == [3, 1, 1, 1]
+    batcher.close()
+
+    stats = batcher.stats.snapshot()
+    assert stats["requests"] == 9 and stats["errors"] == 1
+    assert stats["p50_ms"] <= stats["p99_ms"]
+    with pytest.raises(RuntimeError):
+        batcher.submit(1)
+
+
+def test_latency_stats_percentiles():
+    stats = LatencyStats(window=100)
+    assert stats.snapshot()["p50_ms"] is None
+    for _ in range(3):
+        stats.record(list(np.linspace(0.001, 0.1, 50)))
+    snapshot = stats.snapshot()
+    assert snapshot["requests"] == 150 and snapshot["batches"] == 3
+    assert snapshot["mean_batch_size"] == 50
+    assert snapshot["p50_ms"] == pytest.approx(50.5, abs=1)
+    assert snapshot["p99_ms"] == pytest.approx(99.0, abs=1)
+
+
+def test_server_scores_concurrent_requests_in_batches(models, server):
+    X = models["X"]
+    port = server.server_address[1]
+
+    def score(i):
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        features = {name: float(value) for name, value in X.iloc[i].items()}
+        result = request(
+            connection,
+            "POST",
+            "/models/ebm/predict",
+            {"features": features, "contributions": 2},
+        )
+        connection.close()
+        return result
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        responses = list(executor.map(score, range(48)))
+
+    expected = positive_class_proba(models["ebm"], X[:48])
+    for i, (status, body) in enumerate(responses):
+        assert status == 200
+        assert body["probability"] == pytest.approx(expected[i], abs=1e-6)
+        assert body["label"] == int(expected[i] > 0.5)
+        assert len(body["contributions"]) == 2
+        values = [abs(term["value"]) for term in body["contributions"]]
+        assert values == sorted(values, reverse=True)
+
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    status, body = request(connection, "GET", "/metrics")
+    metrics = body["models"]["ebm"]
+    assert status == 200
+    assert metrics["requests"] == 48 and metrics["errors"] == 0
+    assert metrics["batches"] < 48
+    assert metrics["p99_ms"] >= metrics["p50_ms"] > 0
+    assert body["models"]["forest"]["requests"] == 0
+
+
+def test_server_rejects_invalid_requests(models, server):
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+    status, body = request(connection, "GET", "/health")
+    assert status == 200 and body["models"] == ["ebm", "forest"]
+
+    status, body = request(
+        connection, "POST", "/models/ebm/predict", {"features": {"age": 1.0}}
+    )
+    assert status == 400 and "missing features" in body["error"]
+    status, body = request(
+        connection,
+        "POST",
+        "/models/forest/predict",
+        {"features": [0.0, 0.0, 0.0], "contributions": 3},
+    )
+    assert status == 400 and "contributions" in body["error"]
+    for contributions in ([1], {"k": 1}, -1, 1.5, "2"):
+        status, body = request(
+            connection,
+            "POST",
+            "/models/ebm/predict",
+            {"features": [0.0, 0.0, 0.0], "contributions": contributions},
+        )
+        assert status == 400 and "non-negative integer" in body["error"]
+    status, _ = request(connection, "POST", "/models/svm/predict", {"features": []})
+    assert status == 404
+    status, _ = request(connection, "POST", "/predict", {"features": [0.0] * 3})
+    assert status == 404
+
+    status, body = request(
+        connection, "POST", "/models/forest/predict", {"features": [0.0, 0.0, 0.0]}
+    )
+    assert status == 200
+    assert body["probability"] == pytest.approx(
+        positive_class_proba(models["forest"], np.zeros((1, 3)))[0]
+    )
+
+    # A body of negative length cannot be read
+    connection.putrequest("POST", "/predict")
+    connection.putheader("Content-Length", "-1")
+    connection.endheaders()
+    response = connection.getresponse()
+    assert response.status == 400
+    assert "Content-Length" in json.loads(response.read())["error"]
+
+
+class NaNModel:
+    def predict_proba(self, X):
+        proba = np.full((len(X), 2), 0.5)
+        proba[np.isnan(X).any(axis=1)] = np.nan
+        return proba
+
+
+def test_server_rejects_non_finite_probabilities():
+    service = ScoringService({"nan": NaNModel()}, max_latency_ms=1)
+    endpoint = service.endpoints["nan"]
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+        status, body = request(connection, "POST", "/predict", {"features": [None]})
+        assert status == 400 and "non-finite" in body["error"]
+        status, body = request(connection, "POST", "/predict", {"features": [1.0]})
+        assert status == 200 and body["probability"] == 0.5
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+    assert endpoint.stats.snapshot()["errors"] == 1
+
+
+def test_server_on_unix_socket(models, tmp_path):
+    service = ScoringService({"forest": models["forest"]}, max_latency_ms=1)
+    path = str(tmp_path / "scoring.sock")
+    server = make_server(service, unix_socket=path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        connection = UnixHTTPConnection(path)
+        started = time.perf_counter()
+        status, body = request(
+            connection, "POST", "/predict", {"features": [0.5, None, -1.0]}
+        )
+        assert time.perf_counter() - started < 5
+        assert status == 200
+        assert body["probability"] == pytest.approx(
+            positive_class_proba(models["forest"], np.array([[0.5, np.nan, -1.0]]))[0]
+        )
+        status, body = request(connection, "GET", "/models")
+        assert body["models"][0]["scorer"] == "TreeEnsembleScorer"
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+    assert not Path(path).exists()
+
+    # Other files at the socket path are never removed
+    Path(path).write_text("keep")
+    with pytest.raises(FileExistsError):
+        make_server(service, unix_socket=path)
+    assert Path(path).read_text() == "keep"
+
+    # A socket left behind by a killed server is replaced
+    Path(path).unlink()
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    make_server(service, unix_socket=path).server_close()
+    assert not Path(path).exists()
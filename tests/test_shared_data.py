@@ -0,0 +1,106 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from utils.shared_data import SharedDataset
+
+import warnings
+
+warnings.filterwarnings("ignore")
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+
+def _column_sums(dataset):
+    # Runs in a worker process, which attaches the dataset when unpickling it
+    X = dataset["X_train"]
+    return X.to_numpy().sum(axis=0).tolist(), X.to_numpy().flags.writeable
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(50, 3)), columns=["a", "b", "c"])
+    y = pd.Series(rng.integers(0, 2, 50), name="mortality")
+    return {"X_train": X, "y_train": y, "weights": np.arange(5.0)}
+
+
+@pytest.mark.parametrize("backend", ["shm", "memmap"])
+def test_shared_dataset_round_trip(data, backend, tmp_path):
+    directory = tmp_path / "data" if backend == "memmap" else None
+    with SharedDataset.create(data, backend=backend, directory=directory) as shared:
+        pd.testing.assert_frame_equal(shared["X_train"], data["X_train"])
+        pd.testing.assert_series_equal(shared["y_train"], data["y_train"])
+        np.testing.assert_array_equal(shared["weights"], data["weights"])
+        assert set(shared) == {"X_train", "y_train", "weights"}
+        assert shared.nbytes == 50 * 3 * 8 + 50 * 8 + 5 * 8
+        with pytest.raises(ValueError):
+            shared.array("weights")[0] = 1.0
+
+        attached = SharedDataset.attach(shared.handle)
+        assert np.shares_memory(attached.array("weights"), attached["weights"])
+        pd.testing.assert_frame_equal(attached["X_train"], data["X_train"])
+        attached.close()
+
+    if backend == "memmap":
+        assert not directory.exists()
+    else:
+        with pytest.raises(FileNotFoundError):
+            SharedDataset.attach(shared.handle)
+
+
+def test_shared_dataset_keeps_user_directories(data, tmp_path):
+    (tmp_path / "results.csv").write_text("auc\n0.8\n")
+    shared = SharedDataset.create(data, backend="memmap", directory=tmp_path)
+    data_dir = Path(shared.handle["directory"])
+    assert data_dir.parent == tmp_path
+    shared.unlink()
+
+    assert not data_dir.exists()
+    assert [path.name for path in tmp_path.iterdir()] == ["results.csv"]
+    assert (tmp_path / "results.csv").read_text() == "auc\n0.8\n"
+
+
+def test_shared_dataset_in_worker_processes(data):
+    expected = data["X_train"].to_numpy().sum(axis=0)
+    with SharedDataset.create(data) as shared:
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(_column_sums, [shared] * 2))
+
+    for sums, writeable in results:
+        np.testing.assert_allclose(sums, expected)
+        assert not writeable
+
+
+def _frame_in_worker(dataset):
+    return dataset["X_test"]
+
+
+@pytest.mark.parametrize("backend", ["shm", "memmap"])
+def test_shared_dataset_keeps_dtypes_and_index(backend):
+    X = pd.DataFrame(
+        {
+            "age": np.array([70, 55, 81], dtype=np.int16),
+            "heart_rate": np.array([90.5, 110.0, 72.25], dtype=np.float32),
+            "gender": pd.Categorical(["M", "F", "M"]),
+        },
+        index=pd.Index([101, 205, 309], name="icustay_id"),
+    )
+    y = pd.Series([0, 1, 0], index=pd.RangeIndex(10, 13, name="row"), name="mortality")
+    with SharedDataset.create({"X_test": X, "y": y}, backend=backend) as shared:
+        pd.testing.assert_frame_equal(shared["X_test"], X)
+        pd.testing.assert_series_equal(shared["y"], y)
+        with pytest.raises(ValueError):
+            shared.array("X_test")
+
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            in_worker = executor.submit(_frame_in_worker, shared).result()
+        pd.testing.assert_frame_equal(in_worker, X)
+
+
+def test_shared_dataset_rejects_object_columns():
+    with pytest.raises(ValueError):
+        SharedDataset.create({"X": pd.DataFrame({"a": ["x", "y"]})})
+    with pytest.raises(ValueError):
+        SharedDataset.create({"X": np.zeros(2)}, backend="disk")
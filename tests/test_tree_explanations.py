@@ -0,0 +1,95 @@
+import pytest
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+import sys
+from pathlib import Path
+from ml_models.explanations import explain_random_forest_batch, explain_xgboost_batch
+
+import warnings
+
+warnings.filterwarnings("ignore")
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+
+def test_explain_xgboost_batch_sums_to_margin(cohort):
+    X, y = cohort
+    model = XGBClassifier(n_estimators=300, max_depth=3, early_stopping_rounds=5)
+    model.fit(X[:300], y[:300], eval_set=[(X[300:], y[300:])], verbose=False)
+    assert model.best_iteration < 299
+
+    contributions = explain_xgboost_batch(
+        model, X, include_intercept=True, chunk_size=64
+    )
+    assert list(contributions.columns) == ["intercept", "age", "heart_rate", "gcs"]
+    assert contributions.index.equals(X.index)
+
+    margin = model.predict(X, output_margin=True)
+    np.testing.assert_allclose(contributions.sum(axis=1), margin, atol=1e-4)
+    np.testing.assert_allclose(
+        contributions.drop(columns="intercept").to_numpy(),
+        explain_xgboost_batch(model, X.to_numpy()).to_numpy(),
+    )
+
+
+def test_explain_random_forest_batch_sums_to_proba(cohort):
+    X, y = cohort
+    model = RandomForestClassifier(n_estimators=20, max_depth=5, random_state=0)
+    model.fit(X, y)
+
+    contributions = explain_random_forest_batch(
+        model, X, include_intercept=True, chunk_size=150
+    )
+    assert contributions.shape == (len(X), 4)
+    np.testing.assert_allclose(
+        contributions.sum(axis=1), model.predict_proba(X)[:, 1], atol=1e-10
+    )
+
+    parallel = explain_random_forest_batch(model, X, n_jobs=2, chunk_size=150)
+    np.testing.assert_allclose(
+        parallel.to_numpy(), contributions.drop(columns="intercept").to_numpy()
+    )
+
+
+def test_explain_random_forest_batch_subsamples_background(cohort, mocker):
+    X, y = cohort
+    model = RandomForestClassifier(n_estimators=10, max_depth=4, random_state=0)
+    model.fit(X, y)
+
+    import shap
+
+    spy = mocker.spy(shap, "TreeExplainer")
+    contributions = explain_random_forest_batch(
+        model,
+        X[:50],
+        background=X,
+        n_background=40,
+        feature_names=["a", "b", "c"],
+        include_intercept=True,
+    )
+    assert spy.call_args.kwargs["feature_perturbation"] == "interventional"
+    assert spy.call_args.kwargs["data"].shape == (40, 3)
+    assert list(contributions.columns) == ["intercept", "a", "b", "c"]
+    np.testing.assert_allclose(
+        contributions.sum(axis=1), model.predict_proba(X[:50])[:, 1], atol=1e-6
+    )
+
+
+@pytest.mark.parametrize("model_type", ["xgboost", "random_forest"])
+def test_tree_explanations_reorder_training_columns(cohort, model_type):
+    X, y = cohort
+    if model_type == "xgboost":
+        model, explain = XGBClassifier(n_estimators=20), explain_xgboost_batch
+    else:
+        model = RandomForestClassifier(n_estimators=10, random_state=0)
+        explain = explain_random_forest_batch
+    model.fit(X, y)
+
+    shuffled = explain(model, X[["gcs", "age", "heart_rate"]])
+    assert list(shuffled.columns) == ["age", "heart_rate", "gcs"]
+    np.testing.assert_allclose(shuffled.to_numpy(), explain(model, X).to_numpy())
+
+    with pytest.raises(ValueError):
+        explain(model, X.rename(columns={"gcs": "motor"}))
+    with pytest.raises(ValueError):
+        explain(model, X.to_numpy()[:, :2])
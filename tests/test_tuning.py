@@ -0,0 +1,174 @@
+import pytest
+import numpy as np
+import pandas as pd
+import optuna
+import sys
+from pathlib import Path
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+from ml_models import xgb_model
+from tuning.data import TuningData, subsample_indices
+from tuning.objectives import (
+    DEFAULT_FIDELITIES,
+    DEFAULT_PARAMS,
+    MAX_RESOURCE,
+    PROGRESS_SIGNS,
+    SUGGESTERS,
+    fidelity_step,
+    make_objective,
+)
+
+import warnings
+
+warnings.filterwarnings("ignore")
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+
+@pytest.fixture
+def cohort():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(
+        rng.normal(size=(300, 15)) * 5 + 1, columns=list("abcdefghijklmno")
+    )
+    y = pd.Series((X["a"] - X["b"] + rng.normal(size=300) * 5 > 0).astype(int))
+    return X, y
+
+
+def test_tuning_data_matches_notebook_split(cohort):
+    X, y = cohort
+    x_train, x_valid, y_train, y_valid = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    scaler = StandardScaler()
+    x_train = scaler.fit_transform(x_train)
+    x_valid = scaler.transform(x_valid)
+
+    data = TuningData.prepare(X, y)
+    X_train, y_train_, X_valid, y_valid_ = data.fold(0)
+
+    np.testing.assert_allclose(X_train, x_train)
+    np.testing.assert_allclose(X_valid, x_valid)
+    np.testing.assert_array_equal(y_train_, y_train)
+    np.testing.assert_array_equal(y_valid_, y_valid)
+    assert not X_train.flags.writeable
+    assert data.feature_names == list(X.columns)
+
+
+def test_tuning_data_folds_and_sharing(cohort):
+    X, y = cohort
+    data = TuningData.prepare(X, y, n_splits=3)
+    assert len(data) == 3
+    assert sum(len(fold[3]) for fold in data) == len(y)
+
+    shared = data.share()
+    try:
+        for expected, fold in zip(data, shared):
+            for a, b in zip(expected, fold):
+                np.testing.assert_array_equal(a, b)
+                assert not b.flags.writeable
+        assert shared.nbytes == data.nbytes
+    finally:
+        shared.unlink()
+
+
+@pytest.mark.parametrize("model", sorted(SUGGESTERS))
+def test_objective_reuses_folds(cohort, model, mocker):
+    X, y = cohort
+    data = TuningData.prepare(X, y, n_splits=2)
+    split = mocker.spy(TuningData, "prepare")
+    fixed = {"n_estimators": 20} if model in ("random_forest", "xgboost") else {}
+    if model == "ebm":
+        fixed = {"max_rounds": 50, "outer_bags": 1, "n_jobs": 1}
+    if model == "logistic_gam":
+        fixed = {"max_iter": 10}
+
+    sampler = optuna.samplers.TPESampler(seed=0)
+    study = optuna.create_study(direction="maximize", sampler=sampler)
+    study.enqueue_trial(DEFAULT_PARAMS[model])
+    if model == "logistic_gam":
+        # A single custom term can leave out the informative features
+        study.enqueue_trial({"terms_option": "auto"}, skip_if_exists=False)
+    study.optimize(make_objective(model, data, fixed_params=fixed), n_trials=2)
+
+    assert split.call_count == 0
+    for trial in study.trials:
+        assert "error" not in trial.user_attrs
+        assert len(trial.user_attrs["fold_scores"]) == 2
+        assert 0.5 < trial.value <= 1.0
+
+
+class PruneAfterTwoSteps(optuna.pruners.BasePruner):
+    def prune(self, study, trial):
+        return len(trial.intermediate_values) >= 2
+
+
+@pytest.mark.parametrize("model", sorted(SUGGESTERS))
+def test_objective_reports_progress_for_pruning(cohort, model):
+    X, y = cohort
+    data = TuningData.prepare(X, y)
+    fixed = {
+        "logistic_gam": {"max_iter": 10},
+        "ebm": {"max_rounds": 50, "outer_bags": 3, "n_jobs": 1},
+        "random_forest": {"n_estimators": 20},
+        "xgboost": {"n_estimators": 20},
+    }[model]
+
+    study = optuna.create_study(direction="maximize", pruner=PruneAfterTwoSteps())
+    study.enqueue_trial(DEFAULT_PARAMS[model])
+    study.optimize(make_objective(model, data, fixed_params=fixed), n_trials=1)
+
+    trial = study.trials[0]
+    if model in PROGRESS_SIGNS:
+        assert trial.state == optuna.trial.TrialState.PRUNED
+        assert sorted(trial.intermediate_values) == [0, 1]
+    else:
+        assert trial.state == optuna.trial.TrialState.COMPLETE
+
+
+def test_subsample_indices_are_stratified():
+    y = np.array([0] * 90 + [1] * 10)
+    index = subsample_indices(y, 0.2)
+    assert len(index) == 20
+    assert y[index].sum() == 2
+    assert len(subsample_indices(y, 0.01)) == 4
+    assert len(subsample_indices(y, 1.0)) == 100
+
+
+def test_multi_fidelity_objective(cohort, mocker):
+    X, y = cohort
+    data = TuningData.prepare(X, y)
+    train = mocker.spy(xgb_model, "train_xgboost_model")
+    objective = make_objective(
+        "xgboost", data, fixed_params={"n_jobs": 1}, fidelities=DEFAULT_FIDELITIES
+    )
+
+    study = optuna.create_study(direction="maximize")
+    study.enqueue_trial(DEFAULT_PARAMS["xgboost"])
+    study.optimize(objective, n_trials=1)
+    trial = study.trials[0]
+    steps = [fidelity_step(f) for f in DEFAULT_FIDELITIES] + [MAX_RESOURCE]
+    assert sorted(trial.intermediate_values) == steps == [11, 33, 100]
+    assert trial.intermediate_values[MAX_RESOURCE] == trial.value
+
+    # Rounds and training rows grow with the fidelity
+    budgets = [call.kwargs["n_estimators"] for call in train.call_args_list]
+    rows = [len(call.args[0]) for call in train.call_args_list]
+    assert budgets == [11, 33, 100]
+    assert rows[0] < rows[1] < rows[2] == len(data.fold(0)[0])
+
+    # The full fidelity scores like the plain objective
+    study = optuna.create_study(direction="maximize")
+    study.enqueue_trial(DEFAULT_PARAMS["xgboost"])
+    study.optimize(make_objective("xgboost", data, fixed_params={"n_jobs": 1}), 1)
+    assert study.trials[0].value == pytest.approx(trial.value)
+
+    # A pruned trial never trains at full fidelity
+    train.reset_mock()
+    study = optuna.create_study(direction="maximize", pruner=PruneAfterTwoSteps())
+    study.optimize(objective, n_trials=1)
+    assert study.trials[0].state == optuna.trial.TrialState.PRUNED
+    assert len(train.call_args_list) == 2
+
+    with pytest.raises(ValueError):
+        make_objective("xgboost", data, fidelities=[0.5, 1.0])
@@ -0,0 +1,130 @@
+import pytest
+import numpy as np
+import pandas as pd
+import optuna
+import sys
+from pathlib import Path
+from optuna.trial import TrialState
+from tuning.cohorts import balance_cohort, prepare_cohort
+from tuning.executor import STUDIES, main, open_storage, run_study
+
+import warnings
+
+warnings.filterwarnings("ignore")
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+
+@pytest.fixture
+def cohort():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(200, 4)), columns=list("abcd"))
+    y = pd.Series((X["a"] - X["b"] + rng.normal(size=200) > 0).astype(int))
+    return X, y
+
+
+def test_study_names_match_the_notebooks():
+    assert len(STUDIES) == 16
+    assert STUDIES["Case 2: EBM_SAPSII"] == {
+        "model": "ebm",
+        "score": "sapsii",
+        "balanced": False,
+    }
+    assert STUDIES["Case 16: XGBoost_APSIII_Balanced_Data"]["balanced"]
+
+
+def test_prepare_cohort_balances_like_the_notebooks():
+    df = pd.DataFrame(
+        {
+            "subject_id": range(10),
+            "hadm_id": range(10),
+            "icustay_id": range(10),
+            "sapsii": range(10),
+            "sapsii_prob": np.linspace(0, 1, 10),
+            "age": [np.nan] + list(range(9)),
+            "mortality": [1, 1] + [0] * 8,
+        }
+    )
+    X, y = prepare_cohort(df, "sapsii")
+    assert list(X.columns) == ["age"]
+    assert X["age"].iloc[0] == 0
+
+    X, y = prepare_cohort(df, "sapsii", balanced=True)
+    assert y.value_counts().to_dict() == {0: 4, 1: 4}
+    assert len(balance_cohort(df)) == 8
+
+
+def test_run_study_in_parallel_and_resume(cohort, tmp_path):
+    X, y = cohort
+    storage = tmp_path / "journal.log"
+    name = "Case 4: XGBoost_SAPSII"
+
+    study = run_study(name, X, y, n_trials=3, n_workers=2, storage=storage, seed=0)
+    finished = study.get_trials(states=(TrialState.COMPLETE, TrialState.PRUNED))
+    assert len(finished) >= 3
+    # The notebook default trial runs first
+    assert study.trials[0].params["n_estimators"] == 100
+
+    # Simulate a worker killed during a trial
+    interrupted = optuna.load_study(study_name=name, storage=open_storage(storage))
+    trial = interrupted.ask()
+    trial.suggest_float("learning_rate", 0.01, 0.3)
+
+    # Without the flag, a running trial may belong to another active run
+    study = run_study(name, X, y, n_trials=len(finished) + 1, storage=storage)
+    assert study.trials[trial.number].state == TrialState.RUNNING
+
+    study = run_study(
+        name, X, y, n_trials=len(finished) + 2, storage=storage, retry_interrupted=True
+    )
+    states = {t.number: t.state for t in study.trials}
+    assert states[trial.number] == TrialState.FAIL
+    retried = [t for t in study.trials if t.user_attrs.get("retry_of") == trial.number]
+    assert len(retried) == 1
+    assert retried[0].params["learning_rate"] == trial.params["learning_rate"]
+    assert retried[0].state in (TrialState.COMPLETE, TrialState.PRUNED)
+
+
+def test_run_study_with_multi_fidelity(cohort, tmp_path):
+    X, y = cohort
+    study = run_study(
+        "Case 3: Random_Forest_SAPSII",
+        X,
+        y,
+        n_trials=4,
+        storage=tmp_path / "journal.log",
+        seed=0,
+        fidelities=(1 / 9, 1 / 3),
+    )
+    complete = study.get_trials(states=(TrialState.COMPLETE,))
+    assert all(100 in t.intermediate_values for t in complete)
+    assert study.best_value > 0.5
+
+
+def test_main_with_csv_cohort(cohort, tmp_path, capsys):
+    X, y = cohort
+    X.assign(mortality=y).to_csv(tmp_path / "cohort.csv", index=False)
+
+    argv = [
+        "my study",
+        "--model",
+        "random_forest",
+        "--data",
+        str(tmp_path / "cohort.csv"),
+        "--storage",
+        str(tmp_path / "journal.log"),
+        "--n-trials",
+        "2",
+        "--registry",
+        str(tmp_path),
+        "--cohort",
+        "sapsii",
+    ]
+    main(argv)
+    assert "Best ROC-AUC score" in capsys.readouterr().out
+    # Publishing to the registry is opt-in
+    path = tmp_path / "random_forest_sapsii_best_configs.json"
+    assert not path.exists()
+
+    main(argv + ["--publish"])
+    assert path.exists()
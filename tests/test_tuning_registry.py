@@ -0,0 +1,102 @@
+import pytest
+import json
+import numpy as np
+import pandas as pd
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from tuning.registry import ConfigRegistry, cohort_key, dataset_fingerprint
+
+import warnings
+
+warnings.filterwarnings("ignore")
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+
+def _publish(directory, value):
+    return ConfigRegistry(directory).publish(
+        "xgboost", "sapsii", {"max_depth": int(value * 100) % 10 + 1}, value
+    )
+
+
+def test_publish_keeps_the_best_config(tmp_path):
+    registry = ConfigRegistry(tmp_path)
+    assert registry.get("ebm", "sapsii") is None
+
+    assert registry.publish("ebm", "sapsii", {"max_bins": 128}, 0.80, "Case 2")
+    assert not registry.publish("ebm", "sapsii", {"max_bins": 64}, 0.79)
+    assert registry.get("ebm", "sapsii")["best_params"] == {"max_bins": 128}
+
+    assert registry.publish("ebm", "sapsii", {"max_bins": 256}, 0.81, fit_seconds=2)
+    entry = registry.get("ebm", "sapsii")
+    assert entry["best_value"] == 0.81
+    assert entry["fit_seconds"] == 2
+    assert registry.publish("ebm", "sapsii", {"max_bins": 64}, 0.5, force=True)
+
+    # The notebooks' files stay readable
+    path = tmp_path / "ebm_sapsii_best_configs.json"
+    assert registry.path("ebm", "sapsii") == path
+    with open(path) as f:
+        assert set(json.load(f)) >= {"best_params", "best_value"}
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_publish_skips_configs_tuned_on_other_data(tmp_path):
+    registry = ConfigRegistry(tmp_path)
+    assert registry.publish("ebm", "sapsii", {"max_bins": 128}, 0.80, fingerprint="a")
+    assert not registry.publish("ebm", "sapsii", {"max_bins": 64}, 0.9, fingerprint="b")
+    assert registry.get("ebm", "sapsii")["dataset_fingerprint"] == "a"
+
+    # Unknown fingerprints are compared by score
+    assert registry.publish("ebm", "sapsii", {"max_bins": 64}, 0.85)
+    assert registry.publish(
+        "ebm", "sapsii", {"max_bins": 32}, 0.7, "Case 2", "b", force=True
+    )
+    assert registry.get("ebm", "sapsii")["dataset_fingerprint"] == "b"
+
+
+def test_concurrent_publishes_keep_the_maximum(tmp_path):
+    values = list(np.linspace(0.6, 0.9, 16))
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        stored = list(executor.map(_publish, [tmp_path] * 16, values))
+    assert any(stored)
+    entry = ConfigRegistry(tmp_path).get("xgboost", "sapsii")
+    assert entry["best_value"] == pytest.approx(0.9)
+
+
+def test_legacy_configs_are_looked_up():
+    registry = ConfigRegistry()
+    params = registry.train_params("logistic_gam", cohort_key("sapsii"))
+    assert "terms_option" not in params
+    with pytest.raises(KeyError):
+        registry.train_params("ebm", "unknown_cohort")
+    with pytest.raises(KeyError):
+        registry.path("svm", "sapsii")
+
+
+def test_train_best(tmp_path, mocker):
+    registry = ConfigRegistry(tmp_path)
+    registry.publish("random_forest", "apsiii", {"n_estimators": 10}, 0.7)
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(60, 3)), columns=list("abc"))
+    y = pd.Series((X["a"] > 0).astype(int))
+
+    model, results = registry.train_best(
+        "random_forest", "apsiii", X, y, X, n_jobs=1, random_state=0
+    )
+    assert model.n_estimators == 10
+    assert len(results["y_pred_prob"]) == 60
+
+    # Unchanged files are served from the cache
+    load = mocker.spy(json, "load")
+    registry.get("random_forest", "apsiii")
+    assert load.call_count == 0
+
+
+def test_dataset_fingerprint():
+    X = pd.DataFrame({"a": [1.0, 2.0], "b": [3, 4]})
+    y = pd.Series([0, 1])
+    assert dataset_fingerprint(X, y) == dataset_fingerprint(X.copy(), y.copy())
+    assert dataset_fingerprint(X, y) != dataset_fingerprint(X, 1 - y)
+    assert dataset_fingerprint(X, y) != dataset_fingerprint(X.astype(float), y)
+    assert dataset_fingerprint(X.to_numpy()) != dataset_fingerprint(X)
@@ -0,0 +1,110 @@
+import pytest
+import numpy as np
+import pandas as pd
+import optuna
+import sys
+from pathlib import Path
+from optuna.distributions import IntDistribution
+from optuna.trial import create_trial
+from tuning.executor import open_storage, related_studies, run_study
+from tuning.registry import ConfigRegistry
+from tuning.warm_start import (
+    NOTEBOOK_STORAGE,
+    prior_configs,
+    registry_configs,
+    warm_start,
+)
+
+import warnings
+
+warnings.filterwarnings("ignore")
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+
+def _study(storage, name, depths, values):
+    study = optuna.create_study(study_name=name, storage=storage, direction="maximize")
+    for depth, value in zip(depths, values):
+        study.add_trial(
+            create_trial(
+                params={"max_depth": depth},
+                distributions={"max_depth": IntDistribution(1, 10)},
+                value=value,
+            )
+        )
+    return study
+
+
+def test_prior_configs_alternate_between_studies(tmp_path):
+    storage = open_storage(tmp_path / "journal.log")
+    _study(storage, "a", [1, 2, 3], [0.70, 0.90, 0.80])
+    _study(storage, "b", [4, 5], [0.60, 0.0])
+
+    configs = prior_configs(storage, ["a", "missing", "b"], k=2)
+    assert [c["params"]["max_depth"] for c in configs] == [2, 4, 3]
+    assert configs[0]["source"] == "a#1"
+
+    missing = tmp_path / "missing.db"
+    assert prior_configs("sqlite:///{}".format(missing), ["a"]) == []
+    assert not missing.exists()
+
+
+def test_warm_start_skips_tried_configs(tmp_path):
+    storage = open_storage(tmp_path / "journal.log")
+    study = _study(storage, "a", [1], [0.7])
+    configs = [{"params": {"max_depth": d}, "source": str(d)} for d in [1, 2, 2, 3, 4]]
+
+    assert warm_start(study, configs, k=2) == 2
+    assert warm_start(study, configs, k=5) == 1
+    study.optimize(lambda t: t.suggest_int("max_depth", 1, 10) / 10, n_trials=3)
+    assert [t.user_attrs.get("warm_start") for t in study.trials] == [
+        None,
+        "2",
+        "3",
+        "4",
+    ]
+
+
+def test_registry_configs(tmp_path):
+    registry = ConfigRegistry(tmp_path)
+    registry.publish("ebm", "apsiii", {"max_bins": 64}, 0.8)
+    configs = registry_configs(registry, "ebm", ["sapsii", "apsiii"])
+    assert configs == [
+        {
+            "params": {"max_bins": 64},
+            "value": 0.8,
+            "source": "ebm_apsiii_best_configs.json",
+        }
+    ]
+
+
+def test_related_studies():
+    assert related_studies("Case 2: EBM_SAPSII") == [
+        "Case 2: EBM_SAPSII",
+        "Case 6: EBM_SAPSII_Balanced_Data",
+        "Case 10: EBM_APSIII",
+        "Case 14: EBM_APSIII_Balanced_Data",
+    ]
+
+
+@pytest.mark.skipif(
+    not Path(NOTEBOOK_STORAGE[len("sqlite:///") :]).exists(),
+    reason="notebook database missing",
+)
+def test_run_study_warm_started_from_notebooks(tmp_path):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(200, 4)), columns=list("abcd"))
+    y = pd.Series((X["a"] + rng.normal(size=200) > 0).astype(int))
+
+    study = run_study(
+        "Case 4: XGBoost_SAPSII",
+        X,
+        y,
+        n_trials=3,
+        storage=tmp_path / "journal.log",
+        warm_start_trials=2,
+    )
+    sources = [t.user_attrs.get("warm_start") for t in study.trials[:3]]
+    assert sources[0] is None
+    assert sources[1].startswith("Case 4: XGBoost_SAPSII#")
+    assert sources[2].startswith("Case 8: XGBoost_SAPSII_Balanced_Data#")
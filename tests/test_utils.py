@@ -1,8 +1,20 @@
 import pytest
 import sys
 import json
+import psycopg2.pool
+import numpy as np
 from pathlib import Path
-from utils.db_connection import load_secrets, create_connection
+from sklearn.linear_model import LogisticRegression
+from utils.db_connection import (
+    load_secrets,
+    load_cached_secrets,
+    create_connection,
+    ConnectionPool,
+    get_connection_pool,
+    close_connection_pools,
+)
+from utils.array_store import load_array, load_manifest, save_arrays
+from utils.prediction import predict_in_batches, iter_predictions
 
 import warnings
 
@@ -83,3 +95,159 @@ def test_create_connection(mocker, setup_test_config):
     # Ensure that the connection and cursor returned by the function are the mocks
     assert con == mock_connection.return_value
     assert cur == mock_cursor
+
+
+@pytest.fixture
+def mock_connect(mocker):
+    """
+    Fixture that patches psycopg2.connect to return fresh, open mock connections.
+    """
+
+    def make_connection(**kwargs):
+        con = mocker.MagicMock()
+        con.closed = 0
+        return con
+
+    load_cached_secrets.cache_clear()
+    yield mocker.patch("psycopg2.connect", side_effect=make_connection)
+    load_cached_secrets.cache_clear()
+
+
+def test_connection_pool_reuses_connections(mock_connect, setup_test_config):
+    """
+    Test that a returned connection is reused and its schema is set only once.
+    """
+    pool = ConnectionPool(conf_file=str(TEST_CONFIG_PATH), max_size=2)
+
+    with pool.connection() as con:
+        first = con
+    with pool.connection() as con:
+        second = con
+
+    assert first is second
+    mock_connect.assert_called_once()
+
+    cursor = first.cursor.return_value.__enter__.return_value
+    cursor.execute.assert_any_call(
+        f"SET search_path to {TEST_CONFIG_DATA['database']['schema']}"
+    )
+    set_calls = [c for c in cursor.execute.call_args_list if "SET" in c.args[0]]
+    assert len(set_calls) == 1
+    first.commit.assert_called_once()
+
+
+def test_connection_pool_replaces_broken_connections(mock_connect, setup_test_config):
+    """
+    Test that a connection closed by the server is replaced on checkout.
+    """
+    pool = ConnectionPool(conf_file=str(TEST_CONFIG_PATH), max_size=1)
+
+    con = pool.getconn()
+    pool.putconn(con)
+    con.closed = 1
+
+    replacement = pool.getconn()
+
+    assert replacement is not con
+    assert mock_connect.call_count == 2
+    con.close.assert_called_once()
+
+
+def test_connection_pool_is_bounded(mock_connect, setup_test_config):
+    """
+    Test that borrowing beyond max_size times out instead of opening more
+    connections.
+    """
+    pool = ConnectionPool(conf_file=str(TEST_CONFIG_PATH), max_size=1, timeout=0.01)
+
+    con = pool.getconn()
+    with pytest.raises(psycopg2.pool.PoolError):
+        pool.getconn()
+
+    pool.putconn(con)
+    assert pool.getconn() is con
+    mock_connect.assert_called_once()
+
+
+def test_get_connection_pool_is_shared(setup_test_config):
+    """
+    Test that the shared pool is created once per configuration file.
+    """
+    pool = get_connection_pool(conf_file=str(TEST_CONFIG_PATH))
+
+    assert get_connection_pool(conf_file=str(TEST_CONFIG_PATH)) is pool
+
+    close_connection_pools()
+    assert get_connection_pool(conf_file=str(TEST_CONFIG_PATH)) is not pool
+    close_connection_pools()
+
+
+@pytest.fixture
+def fitted_classifier():
+    """
+    Fixture providing a fitted classifier and a feature matrix to score.
+    """
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(1003, 4))
+    y = (X[:, 0] + rng.normal(size=1003) > 0).astype(int)
+    return LogisticRegression().fit(X, y), X
+
+
+@pytest.mark.parametrize("n_workers", [1, 3])
+def test_predict_in_batches(fitted_classifier, n_workers):
+    """
+    Test that batched scoring fills a preallocated buffer with the same
+    probabilities as a single predict_proba call.
+    """
+    model, X = fitted_classifier
+    out = np.full(len(X), -1.0, dtype=np.float32)
+
+    result = predict_in_batches(model, X, batch_size=100, n_workers=n_workers, out=out)
+
+    assert result is out
+    np.testing.assert_allclose(out, model.predict_proba(X)[:, 1], rtol=1e-6)
+
+
+def test_predict_in_batches_from_memmap(fitted_classifier, tmp_path):
+    """
+    Test scoring a memory-mapped .npy file and a stream of batches.
+    """
+    model, X = fitted_classifier
+    path = tmp_path / "features.npy"
+    np.save(path, X)
+    expected = model.predict_proba(X)[:, 1]
+
+    np.testing.assert_allclose(
+        predict_in_batches(model, path, batch_size=256), expected
+    )
+
+    batches = (X[start : start + 400] for start in range(0, len(X), 400))
+    streamed = np.concatenate(list(iter_predictions(model, batches)))
+    np.testing.assert_allclose(streamed, expected)
+
+    with pytest.raises(ValueError):
+        predict_in_batches(model, X, out=np.empty(3))
+
+
+def test_save_arrays_replaces_directories_and_records_object_arrays(tmp_path):
+    """
+    Test that rewriting a directory swaps it atomically and that only arrays
+    recorded as object arrays are unpickled.
+    """
+    directory = tmp_path / "store"
+    save_arrays(directory, {"a": np.arange(3)}, {"version": 1})
+    save_arrays(
+        directory,
+        {"a": np.arange(4), "names": np.array(["x", None], dtype=object)},
+        {"version": 2},
+    )
+
+    assert [path.name for path in tmp_path.iterdir()] == ["store"]
+    assert load_manifest(directory) == {"version": 2, "object_arrays": ["names"]}
+    np.testing.assert_array_equal(load_array(directory, "a"), np.arange(4))
+    assert list(load_array(directory, "names")) == ["x", None]
+
+    # A pickled file the manifest does not list is refused
+    np.save(directory / "payload.npy", np.array([{}], dtype=object))
+    with pytest.raises(ValueError, match="refusing to unpickle"):
+        load_array(directory, "payload")
@@ -1,9 +1,11 @@
 import pytest
+import numpy as np
 import pandas as pd
 import xgboost as xgb
 import sys
 from pathlib import Path
-from ml_models.xgb_model import train_xgboost_model
+from ml_models.tree_scorer import TreeEnsembleScorer
+from ml_models.xgb_model import compile_xgboost_model, train_xgboost_model
 
 import warnings
 
@@ -40,5 +42,78 @@ def test_train_xgboost_model(sample_data):
     assert results["training_accuracy"] > 0  # Some reasonable accuracy
 
 
+def test_train_xgboost_model_single_pass_labels(sample_data):
+    X_train, y_train, X_test = sample_data
+
+    xgb_model, results = train_xgboost_model(
+        X_train, y_train, X_test, compute_training_accuracy=False
+    )
+
+    # Labels derived from the probabilities match the model's own predict
+    np.testing.assert_array_equal(results["y_pred"], xgb_model.predict(X_test))
+    assert results["training_accuracy"] is None
+
+    _, results = train_xgboost_model(X_train, y_train, X_test, threshold=0.0)
+    assert (results["y_pred"] == 1).all()
+
+
+def test_train_xgboost_model_reports_rounds(sample_data):
+    X_train, y_train, X_test = sample_data
+    y_test = pd.Series([0, 1])
+    log = []
+
+    xgb_model, _ = train_xgboost_model(
+        X_train,
+        y_train,
+        X_test,
+        y_test=y_test,
+        n_estimators=5,
+        progress_callback=lambda step, value: log.append((step, value)),
+    )
+
+    assert [step for step, _ in log] == list(range(5))
+    assert all(0.0 <= value <= 1.0 for _, value in log)
+    assert xgb_model.get_params()["callbacks"] is None
+
+    # Raising from the callback stops the training
+    class Stop(Exception):
+        pass
+
+    def stop(step, value):
+        if step == 2:
+            raise Stop
+
+    with pytest.raises(Stop):
+        train_xgboost_model(
+            X_train, y_train, X_test, y_test=y_test, progress_callback=stop
+        )
+
+
+@pytest.mark.parametrize("early_stopping_rounds", [None, 3])
+def test_compile_xgboost_model_reproduces_predict_proba(
+    early_stopping_rounds, tmp_path
+):
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(400, 5)), columns=list("abcde"))
+    y = (X["a"] + X["b"] * X["c"] + rng.normal(size=400) > 0).astype(int)
+    X.iloc[::9, 2] = np.nan
+    model = xgb.XGBClassifier(
+        n_estimators=60, max_depth=4, early_stopping_rounds=early_stopping_rounds
+    )
+    model.fit(X[:300], y[:300], eval_set=[(X[300:], y[300:])], verbose=False)
+
+    scorer = compile_xgboost_model(model)
+    expected = model.predict_proba(X)
+    np.testing.assert_allclose(scorer.predict_proba(X), expected, atol=1e-6)
+    np.testing.assert_allclose(
+        scorer.decision_function(X), model.predict(X, output_margin=True), atol=1e-5
+    )
+    if early_stopping_rounds:
+        assert scorer.n_trees == model.best_iteration + 1
+
+    loaded = TreeEnsembleScorer.load(scorer.save(tmp_path / "xgb"))
+    np.testing.assert_allclose(loaded.predict_proba(X), expected, atol=1e-6)
+
+
 # if __name__ == "__main__":
 #     pytest.main()